@@ -0,0 +1,57 @@
+"""
+Benchmark: aggregate functions over array-backed ranges of growing size.
+
+For every size the time per call should grow linearly, and the peak memory allocated by a call
+(measured with `tracemalloc`) should stay constant. MIN/MAX/PRODUCT over mixed ranges build a
+selector mask once per range; it is cached on the range, so it is not part of the peak.
+
+Run with `python benchmarks/bench_aggregates.py`.
+"""
+
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mvin import TokenArray  # noqa: E402
+from mvin.functions.excel_lib import DEFAULT_FUNCTIONS  # noqa: E402
+
+NAMES = ["SUM(", "COUNT(", "COUNTA(", "AVERAGE(", "MIN(", "MAX(", "PRODUCT("]
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def ranges(size):
+    numeric = TokenArray.from_numbers([1.0 + (i % 7) * 1e-7 for i in range(size)])
+    mixed = TokenArray.column(
+        [None if i % 10 == 0 else ("text" if i % 10 == 1 else 1.0) for i in range(size)]
+    )
+    return {"numeric": numeric, "mixed": mixed}
+
+
+def peak_allocation(func, arg):
+    func(arg)  # warm up caches (selector masks)
+    tracemalloc.start()
+    func(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    print(f"{'function':<10}{'range':<9}{'cells':>10}{'ms/call':>10}{'ns/cell':>9}{'peak B':>9}")
+    for size in SIZES:
+        for label, values in ranges(size).items():
+            for name in NAMES:
+                func = DEFAULT_FUNCTIONS[name][1]
+                seconds = min(timeit.repeat(lambda: func(values), number=3, repeat=3)) / 3
+                peak = peak_allocation(func, values)
+                print(
+                    f"{name[:-1]:<10}{label:<9}{size:>10}{seconds * 1e3:>10.2f}"
+                    f"{seconds / size * 1e9:>9.1f}{peak:>9}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Benchmark: common subexpression elimination on formulas that repeat a subexpression.
+
+Each formula is compiled twice: with the default `optimize=True`, which computes every repeated
+pure subtree once per evaluation, and with `optimize=False`, which recomputes every copy. The
+formulas have no constant sub-expressions, so constant folding does not affect the comparison.
+The `stack` backend is listed as the baseline.
+
+Run with `python benchmarks/bench_cse.py`.
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mvin import TokenArray, TokenNumber, TokenString  # noqa: E402
+from mvin.tokenizer import get_interpreter_from_string  # noqa: E402
+
+FORMULAS = {
+    "LEN twice": "=IF(LEN(A1) > B1, LEFT(A1, LEN(A1) - B1), A1)",
+    "SEARCH x3": '=IF(ISERROR(SEARCH("x", A1)), 0, SEARCH("x", A1) + LEN(A1) - SEARCH("x", A1))',
+    "SUMIFS x2": '=IF(SUMIFS(R1, R2, "item 3") > 0, SUMIFS(R1, R2, "item 3") / B1, 0)',
+    "nested x4": "=MAX(SUM(C1, LEN(A1)) * SUM(C1, LEN(A1)), SUM(C1, LEN(A1)) + SUM(C1, LEN(A1)))",
+}
+
+INPUTS = {
+    "A1": TokenString("abcdefgh" * 4 + "x"),
+    "B1": TokenNumber(3),
+    "C1": TokenNumber(2),
+    "R1": TokenArray.column(list(range(1000))),
+    "R2": TokenArray.column([f"item {i % 10}" for i in range(1000)]),
+}
+
+
+def main(number=5000):
+    print(f"{'formula':<14}{'variant':<12}{'usec/eval':>10}")
+    for label, formula in FORMULAS.items():
+        variants = (
+            ("shared", get_interpreter_from_string(formula)),
+            ("recompute", get_interpreter_from_string(formula, optimize=False)),
+            ("stack", get_interpreter_from_string(formula, backend="stack")),
+        )
+        expected = variants[0][1](INPUTS)
+        for name, run in variants:
+            assert run(INPUTS) == expected
+            seconds = min(timeit.repeat(lambda: run(INPUTS), number=number, repeat=3))
+            print(f"{label:<14}{name:<12}{seconds / number * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,82 @@
+"""
+Benchmark: lazy `IF` against an eager `IF` that receives both branches evaluated.
+
+The formula is `IF(ISERROR(SEARCH("x", A1)), LEN(A1 & A1 & A1), SEARCH("x", A1) * 2)`, the
+shape used by conditional-formatting rules. With the lazy calling convention only one branch
+runs per evaluation. The `stack` backend evaluates every argument before the call, so it
+is listed as the baseline only.
+
+Run with `python benchmarks/bench_lazy.py`.
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mvin import BaseToken, TokenNumber, TokenString  # noqa: E402
+from mvin.functions.excel_lib import DEFAULT_FUNCTIONS, excel_if  # noqa: E402
+from mvin.interpreter import get_interpreter  # noqa: E402
+
+
+class T(BaseToken):
+    def __init__(self, value, token_type, subtype):
+        super().__init__()
+        self._value = value
+        self._type = token_type
+        self._subtype = subtype
+
+
+def eager_if(logical_test, value_if_true, value_if_false):
+    # Same semantics as excel_if, but with the arguments evaluated up front
+    return excel_if(
+        None,
+        lambda context: logical_test,
+        lambda context: value_if_true,
+        lambda context: value_if_false,
+    )
+
+
+def formula(if_name):
+    def search():
+        return [
+            T("SEARCH(", "FUNC", "OPEN"),
+            TokenString("x"),
+            T(",", "SEP", "ARG"),
+            T("A1", "OPERAND", "RANGE"),
+            T(")", "FUNC", "CLOSE"),
+        ]
+
+    concat = T("&", "OPERATOR-INFIX", "")
+    return (
+        [T(if_name, "FUNC", "OPEN"), T("ISERROR(", "FUNC", "OPEN")]
+        + search()
+        + [T(")", "FUNC", "CLOSE"), T(",", "SEP", "ARG"), T("LEN(", "FUNC", "OPEN")]
+        + [T("A1", "OPERAND", "RANGE"), concat, T("A1", "OPERAND", "RANGE"), concat]
+        + [T("A1", "OPERAND", "RANGE"), T(")", "FUNC", "CLOSE"), T(",", "SEP", "ARG")]
+        + search()
+        + [T("*", "OPERATOR-INFIX", ""), TokenNumber(2)]
+        + [T(")", "FUNC", "CLOSE")]
+    )
+
+
+def main(number=20000):
+    functions = dict(DEFAULT_FUNCTIONS)
+    functions["EAGER_IF("] = (DEFAULT_FUNCTIONS["IF("][0], eager_if)
+    rows = [{"A1": TokenString("abcdefgh" * 4)}, {"A1": TokenString("abcx")}]
+
+    print(f"{'variant':<22}{'backend':<10}{'usec/eval':>10}")
+    for backend in ("compiled", "stack"):
+        for label, name in (("lazy IF", "IF("), ("eager IF", "EAGER_IF(")):
+            run = get_interpreter(formula(name), proposed_functions=functions, backend=backend)
+            assert run is not None
+            assert [run(row) for row in rows] == [96, 8]
+            seconds = min(
+                timeit.repeat(lambda: [run(row) for row in rows], number=number, repeat=3)
+            )
+            print(f"{label:<22}{backend:<10}{seconds / number / len(rows) * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
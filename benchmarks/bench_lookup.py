@@ -0,0 +1,52 @@
+"""
+Benchmark: many exact and approximate VLOOKUPs against the same table.
+
+The first lookup of a column builds its hash (exact) or sorted (approximate) index; every later
+lookup is O(1) or O(log n). A naive linear scan is timed on a fraction of the lookups for
+reference.
+
+Run with `python benchmarks/bench_lookup.py [rows] [lookups]`.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mvin import TOKEN_FALSE, TOKEN_TRUE, TokenArray, TokenNumber  # noqa: E402
+from mvin.functions.excel_lib import excel_vlookup  # noqa: E402
+
+
+def naive_vlookup(table, key, column):
+    for row in range(table.rows):
+        if table.value_at(row * table.cols) == key:
+            return table.token(row, column - 1)
+    return None
+
+
+def main(rows=100_000, lookups=100_000):
+    table = TokenArray.from_numbers(
+        [value for row in range(rows) for value in (row * 2, row * 3)], cols=2
+    )
+    keys = [TokenNumber((i * 7919) % (rows * 2)) for i in range(lookups)]
+    column = TokenNumber(2)
+
+    print(f"{rows} rows, {lookups} lookups")
+    for label, flag in (("exact", TOKEN_FALSE), ("approximate", TOKEN_TRUE)):
+        start = time.perf_counter()
+        for key in keys:
+            excel_vlookup(key, table, column, flag)
+        seconds = time.perf_counter() - start
+        print(f"{label:<14}{seconds:>8.3f} s  {seconds / lookups * 1e6:>8.2f} us/lookup")
+
+    sample = keys[:100]
+    start = time.perf_counter()
+    for key in sample:
+        naive_vlookup(table, key.value, 2)
+    seconds = time.perf_counter() - start
+    print(f"{'naive scan':<14}{seconds:>8.3f} s  {seconds / len(sample) * 1e6:>8.2f} us/lookup")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,74 @@
+"""
+Benchmark: `Engine.calculate` against `ParallelCalculator` with a growing number of workers.
+
+The workbook consists of many independent report blocks (one weakly connected component each)
+of chained formulas. Run with `python benchmarks/bench_parallel.py [blocks] [chain]`.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mvin import BaseToken, TokenNumber, TokenString  # noqa: E402
+from mvin.engine import Engine  # noqa: E402
+from mvin.parallel import ParallelCalculator  # noqa: E402
+
+
+class T(BaseToken):
+    def __init__(self, value, token_type, subtype):
+        super().__init__()
+        self._value = value
+        self._type = token_type
+        self._subtype = subtype
+
+
+def build(blocks, chain):
+    engine = Engine()
+    inputs = {}
+    for block in range(blocks):
+        inputs[f"R{block}!A0"] = TokenNumber(block)
+        for row in range(1, chain):
+            previous = T(f"R{block}!A{row - 1}", "OPERAND", "RANGE")
+            engine.set_formula(
+                f"R{block}!A{row}",
+                [
+                    T("LEN(", "FUNC", "OPEN"),
+                    previous,
+                    T("&", "OPERATOR-INFIX", ""),
+                    TokenString("xy"),
+                    T(")", "FUNC", "CLOSE"),
+                    T("*", "OPERATOR-INFIX", ""),
+                    previous,
+                ],
+            )
+    return engine, inputs
+
+
+def timed(calculate, inputs, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        calculate(inputs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(blocks=400, chain=50):
+    engine, inputs = build(blocks, chain)
+    serial = timed(engine.calculate, inputs)
+    print(f"{len(engine)} formulas in {blocks} components, {os.cpu_count()} CPUs")
+    print(f"{'workers':<10}{'seconds':>10}{'speedup':>10}")
+    print(f"{'serial':<10}{serial:>10.3f}{1:>10.2f}")
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        with ParallelCalculator(engine, max_workers=workers) as calculator:
+            calculator.calculate(inputs)  # warm up: start and initialize the workers
+            seconds = timed(calculator.calculate, inputs)
+        print(f"{workers:<10}{seconds:>10.3f}{serial / seconds:>10.2f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
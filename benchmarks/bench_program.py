@@ -0,0 +1,55 @@
+"""
+Benchmark: cold start of many formulas, parsed vs. loaded from a `ProgramCache`.
+
+Compiles `formulas` distinct formulas three ways: tokenize + parse (`get_interpreter_from_string`),
+`loads` of serialized programs kept in memory, and a restarted `ProgramCache` reading them from
+disk.
+
+Run with `python benchmarks/bench_program.py [formulas]`.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mvin.program import ProgramCache, dumps, loads  # noqa: E402
+from mvin.tokenizer import get_interpreter_from_string, tokenize  # noqa: E402
+
+
+def corpus(count):
+    return [
+        f'=IF(SUM(A{i}, B{i}, {i}) > C{i}, VLOOKUP(A{i}, D1:E100, 2, FALSE), "n/a") & "x"'
+        for i in range(count)
+    ]
+
+
+def timed(label, func, formulas):
+    start = time.perf_counter()
+    for formula in formulas:
+        func(formula)
+    seconds = time.perf_counter() - start
+    print(f"{label:<24}{seconds:>8.3f} s  {seconds / len(formulas) * 1e6:>8.2f} us/formula")
+
+
+def main(formulas=20_000):
+    texts = corpus(formulas)
+    print(f"{formulas} formulas")
+    timed("tokenize + parse", get_interpreter_from_string, texts)
+
+    programs = {text: dumps(tokenize(text)) for text in texts}
+    size = sum(len(data) for data in programs.values()) / len(programs)
+    timed(f"loads ({size:.0f} B/program)", lambda text: loads(programs[text]), texts)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for text in texts:
+            ProgramCache(directory).get_interpreter(text)
+        restarted = ProgramCache(directory)
+        timed("ProgramCache from disk", restarted.get_interpreter, texts)
+        assert restarted.misses == 0
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
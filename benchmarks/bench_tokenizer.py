@@ -0,0 +1,108 @@
+"""
+Benchmark: tokenizing a corpus of workbook formulas.
+
+Times `mvin.tokenizer.tokenize` against openpyxl's `Tokenizer` followed by the usual adaptation
+of every openpyxl token into an mvin token; the openpyxl column is skipped when openpyxl is not
+installed. Also times tokenize + `get_interpreter` for the whole corpus.
+
+Run with `python benchmarks/bench_tokenizer.py [repeat]`.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mvin import BaseToken  # noqa: E402
+from mvin.interpreter import get_interpreter  # noqa: E402
+from mvin.tokenizer import tokenize  # noqa: E402
+
+CORPUS = [
+    "=A1+B1",
+    "=SUM(A1:A100)",
+    "=SUM($B$2:$B$500)/COUNT($B$2:$B$500)",
+    '=IF(C2>=100,"High",IF(C2>=50,"Medium","Low"))',
+    "=VLOOKUP(A2,Prices!$A$2:$D$1000,3,FALSE)",
+    "=IFERROR(INDEX(Data!B:B,MATCH(A2,Data!A:A,0)),0)",
+    '=SUMIFS(Sales!C:C,Sales!A:A,A2,Sales!B:B,">="&DATE_START)',
+    "=COUNTIFS('Raw data'!$D$2:$D$5000,\"Closed\",'Raw data'!$E$2:$E$5000,\">0\")",
+    '=AVERAGEIFS(D2:D200,B2:B200,"North*")',
+    "=-B7*(1+Rate)^-Years",
+    '=AND(A2<>"",OR(B2>0,C2<0),NOT(ISERROR(D2)))',
+    '=LEFT(A2,LEN(A2)-4)&" ("&RIGHT(B2,3)&")"',
+    '=_xlfn.XLOOKUP(H2,Table1[Key],Table1[Value],"missing")',
+    "=CHOOSE(MONTH_INDEX,Q1,Q1,Q1,Q2,Q2,Q2,Q3,Q3,Q3,Q4,Q4,Q4)",
+    "=MAX(0,MIN(100,(E2-F2)/F2*100))",
+    '=IF(ISERROR(SEARCH("total",A2)),B2*1.2,#N/A)',
+    "=PRODUCT(B2:B13)^(1/12)-1",
+    "=HLOOKUP(B$1,Rates!$A$1:$Z$3,2,TRUE)*$A2",
+]
+
+
+class AdaptedToken(BaseToken):
+    def __init__(self, value, token_type, subtype) -> None:
+        super().__init__()
+        self._value = value
+        self._type = token_type
+        self._subtype = subtype
+
+
+def openpyxl_tokenize(formula, tokenizer_cls):
+    tokens = []
+    for item in tokenizer_cls(formula).items:
+        if item.type == "WHITE-SPACE":
+            continue
+        value = item.value
+        if item.subtype == "NUMBER":
+            value = float(value) if "." in value or "E" in value.upper() else int(value)
+        elif item.subtype == "TEXT":
+            value = value[1:-1].replace('""', '"')
+        elif item.subtype == "LOGICAL":
+            value = value.upper() == "TRUE"
+        elif item.type == "PAREN":
+            tokens.append(AdaptedToken(value, "OPERATOR-INFIX", item.subtype))
+            continue
+        tokens.append(AdaptedToken(value, item.type, item.subtype))
+    return tokens
+
+
+def timed(label, func, formulas, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for formula in formulas:
+            func(formula)
+    seconds = time.perf_counter() - start
+    per_formula = seconds / (repeat * len(formulas)) * 1e6
+    print(f"{label:<28}{seconds:>8.3f} s  {per_formula:>8.2f} us/formula")
+
+
+def main(repeat=2_000):
+    print(f"{len(CORPUS)} formulas x {repeat}")
+    timed("mvin tokenize", tokenize, CORPUS, repeat)
+    try:
+        from openpyxl.formula import Tokenizer
+    except ImportError:
+        print(f"{'openpyxl + adapt':<28}  (openpyxl not installed, skipped)")
+    else:
+        timed("openpyxl + adapt", lambda f: openpyxl_tokenize(f, Tokenizer), CORPUS, repeat)
+
+    parsable = [formula for formula in CORPUS if _parses(formula)]
+    timed(
+        f"tokenize + parse ({len(parsable)})",
+        lambda f: get_interpreter(tokenize(f)),
+        parsable,
+        max(1, repeat // 10),
+    )
+
+
+def _parses(formula):
+    try:
+        get_interpreter(tokenize(formula))
+    except SyntaxError:
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
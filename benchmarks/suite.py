@@ -0,0 +1,245 @@
+"""
+Benchmark suite: parse, compile and evaluate hot paths, with JSON results and regression gates.
+
+Scenarios (select them with `-k SUBSTRING`, list them with `--list`):
+
+    parse/*      tokens -> RPN (`_infix_to_rpn`) for short, medium and 5k-token formulas
+    setup/*      `get_interpreter` cost: parse + compile, and an `InterpreterCache` hit
+    evaluate/*   single-row evaluation: compiled and stack backends, profiled, positional,
+                 a repeated subexpression with and without sharing, and raw vs token values
+    ops/*        one operator call through `REGISTERED_OPS`
+    functions/*  one direct call of each `DEFAULT_FUNCTIONS` entry
+
+Each scenario is timed `--repeat` times; every repetition runs enough loops to take at least
+`--min-time` seconds. The best time per call is reported and compared.
+
+    python benchmarks/suite.py --json results.json
+    python benchmarks/suite.py --compare baseline.json --threshold 0.15
+    python benchmarks/suite.py --compare baseline.json --current results.json
+
+With `--compare`, the run exits with status 1 when a scenario is slower than the baseline by
+more than the threshold (a fraction: 0.15 means 15%).
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mvin import (  # noqa: E402
+    REGISTERED_OPS,
+    TOKEN_EMPTY,
+    TOKEN_FALSE,
+    TOKEN_TRUE,
+    FunctionRegistry,
+    TokenArray,
+    TokenNumber,
+    TokenString,
+    __version__,
+    is_lazy,
+)
+from mvin.functions.excel_lib import DEFAULT_FUNCTIONS  # noqa: E402
+from mvin.interpreter import InterpreterCache, _infix_to_rpn, get_interpreter  # noqa: E402
+from mvin.profiling import ProfileStats  # noqa: E402
+from mvin.tokenizer import tokenize  # noqa: E402
+
+SHORT = "=A1 + B1 * 2"
+MEDIUM = '=IF(AND(A1 > 0, B1 <> ""), LEFT(B1, LEN(B1) - 1) & "-" & A1 * 2, SUM(A1, C1, 3))'
+LONG = "=" + " + ".join(f"A{i} * {i % 7 + 1}" for i in range(1250))  # 4999 tokens
+FORMULAS = {"short": SHORT, "medium": MEDIUM, "5k": LONG}
+
+INPUTS = {"A1": TokenNumber(3), "B1": TokenString("hello"), "C1": TokenNumber(4)}
+INPUTS.update({f"A{i}": TokenNumber(i) for i in range(1250)})
+
+TABLE = TokenArray.from_numbers([value for row in range(1000) for value in (row, row * 2)], 2)
+COLUMN = TokenArray.column(list(range(1000)))
+WORDS = TokenArray.column([f"item {i % 10}" for i in range(1000)])
+
+# Arguments of each built-in function (all of them, defaults included)
+FUNCTION_ARGS = {
+    "NOT(": [TOKEN_FALSE],
+    "ISERROR(": [TokenNumber(1)],
+    "SEARCH(": [TokenString("fox"), TokenString("The quick brown fox"), TokenNumber(1)],
+    "FIND(": [TokenString("fox"), TokenString("The quick brown fox"), TokenNumber(1)],
+    "LEFT(": [TokenString("hello world"), TokenNumber(5)],
+    "RIGHT(": [TokenString("hello world"), TokenNumber(5)],
+    "LEN(": [TokenString("hello world")],
+    "IF(": [TOKEN_TRUE, TokenNumber(1), TokenNumber(2)],
+    "IFERROR(": [TokenNumber(1), TokenNumber(2)],
+    "AND(": [TOKEN_TRUE, TOKEN_TRUE, TOKEN_FALSE],
+    "OR(": [TOKEN_FALSE, TOKEN_FALSE, TOKEN_TRUE],
+    "CHOOSE(": [TokenNumber(2), TokenNumber(10), TokenNumber(20), TokenNumber(30)],
+    "SUM(": [COLUMN],
+    "COUNT(": [COLUMN],
+    "COUNTA(": [COLUMN],
+    "AVERAGE(": [COLUMN],
+    "MIN(": [COLUMN],
+    "MAX(": [COLUMN],
+    "PRODUCT(": [TokenNumber(2), TokenNumber(3), TokenNumber(4)],
+    "SUMIFS(": [COLUMN, WORDS, TokenString("item 3")],
+    "COUNTIFS(": [COLUMN, TokenString(">500")],
+    "AVERAGEIFS(": [COLUMN, WORDS, TokenString("item*")],
+    "VLOOKUP(": [TokenNumber(500), TABLE, TokenNumber(2), TOKEN_FALSE],
+    "HLOOKUP(": [TokenNumber(1), TokenArray.from_values([[0, 1, 2], [5, 6, 7]]), TokenNumber(2)]
+    + [TOKEN_FALSE],
+    "MATCH(": [TokenNumber(500), COLUMN, TokenNumber(0)],
+    "XLOOKUP(": [TokenNumber(500), COLUMN, COLUMN, TOKEN_EMPTY, TokenNumber(0), TokenNumber(1)],
+    "INDEX(": [TABLE, TokenNumber(500), TokenNumber(2)],
+}
+
+OPERANDS = {"&": (TokenString("abc"), TokenString("def"))}
+
+
+def scenarios():
+    """Returns {name: zero-argument callable} for every scenario."""
+    functions = FunctionRegistry.of(DEFAULT_FUNCTIONS)
+    found = {}
+
+    for label, formula in FORMULAS.items():
+        tokens = tokenize(formula)
+        found[f"parse/{label}"] = lambda tokens=tokens: _infix_to_rpn(tokens, functions)
+        found[f"setup/{label}"] = lambda tokens=tokens: get_interpreter(tokens)
+        for backend in ("compiled", "stack"):
+            run = get_interpreter(tokens, backend=backend)
+            inputs = {key: INPUTS[key] for key in run.inputs}
+            found[f"evaluate/{label}-{run.backend}"] = lambda run=run, inputs=inputs: run(inputs)
+
+    cache = InterpreterCache()
+    medium = tokenize(MEDIUM)
+    found["setup/medium-cache-hit"] = lambda: cache.get_interpreter(medium)
+    profiled = get_interpreter(medium, profile=ProfileStats())
+    found["evaluate/medium-profiled"] = lambda: profiled(INPUTS)
+    repeated = tokenize('=IF(ISERROR(SEARCH("l", B1)), 0, SEARCH("l", B1) * SEARCH("l", B1))')
+    for label, optimize in (("shared", True), ("recompute", False)):
+        run = get_interpreter(repeated, optimize=optimize)
+        found[f"evaluate/repeated-{label}"] = lambda run=run: run(INPUTS)
+    search = get_interpreter(tokenize('=SEARCH("b?own", B1) + SEARCH("QUICK", B1)'))
+    found["evaluate/search-constant"] = lambda: search({"B1": TokenString("the quick brown fox")})
+    positional = get_interpreter(medium)
+    values = tuple(INPUTS[key] for key in positional.input_order)
+    found["evaluate/medium-positional"] = lambda: positional.call_tuple(values)
+    numeric = get_interpreter(
+        tokenize("=(A1 * 2 + C1 / 3 - A1 ^ 2) * (A1 - C1) + IF(A1 > C1, A1, C1)")
+    )
+    raw_inputs = {"A1": 3, "C1": 4}
+    found["evaluate/numeric-token"] = lambda: numeric({"A1": TokenNumber(3), "C1": TokenNumber(4)})
+    found["evaluate/numeric-raw"] = lambda: numeric.evaluate_raw(raw_inputs)
+
+    for key, op in REGISTERED_OPS.items():
+        a, b = OPERANDS.get(key, (TokenNumber(7), TokenNumber(3)))
+        found[f"ops/{key}"] = lambda op=op, a=a, b=b: op(a, b)
+
+    for name, (_, func) in DEFAULT_FUNCTIONS.items():
+        if name not in FUNCTION_ARGS:
+            continue
+        args = FUNCTION_ARGS[name]
+        if is_lazy(func):
+            thunks = [lambda context, token=token: token for token in args]
+            found[f"functions/{name[:-1]}"] = lambda f=func, t=thunks: f(None, *t)
+        else:
+            found[f"functions/{name[:-1]}"] = lambda f=func, a=args: f(*a)
+    return found
+
+
+def measure(func, repeat, min_time):
+    """Returns (best seconds per call, loops per repetition)."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best, loops
+
+
+def run_suite(pattern, repeat, min_time):
+    results = {}
+    for name, func in scenarios().items():
+        if pattern and pattern not in name:
+            continue
+        seconds, loops = measure(func, repeat, min_time)
+        results[name] = {"seconds": seconds, "loops": loops, "repeat": repeat}
+        print(f"{name:<32}{seconds * 1e6:>12.3f} us")
+    return {
+        "mvin": __version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold):
+    """Prints current vs baseline times; returns the regressed scenario names."""
+    regressions = []
+    print(f"{'scenario':<32}{'baseline us':>14}{'current us':>14}{'change':>10}")
+    for name, entry in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:<32}{'-':>14}{entry['seconds'] * 1e6:>14.3f}{'new':>10}")
+            continue
+        change = entry["seconds"] / before["seconds"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:<32}{before['seconds'] * 1e6:>14.3f}"
+            f"{entry['seconds'] * 1e6:>14.3f}{change:>+10.1%}{flag}"
+        )
+    for name in baseline["results"]:
+        if name not in current["results"]:
+            print(f"{name:<32}  (not measured)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-k", dest="pattern", default="", help="run scenarios containing this")
+    parser.add_argument("--list", action="store_true", help="list scenario names and exit")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per repetition")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="baseline results to compare with")
+    parser.add_argument("--current", help="compare these results instead of running")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(name for name in scenarios() if args.pattern in name))
+        return 0
+
+    if args.current:
+        with open(args.current) as file:
+            current = json.load(file)
+    else:
+        current = run_suite(args.pattern, args.repeat, args.min_time)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(current, file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} scenario(s) regressed by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,21 +11,41 @@ Classes:
     TokenString: Token class for string values.
     TokenNumber: Token class for numeric values.
     TokenFunc: Token class for function names.
+    TokenFuncClose: Token class for the closing parenthesis of a function call.
+    TokenSeparator: Token class for argument separators.
+    TokenPrefixOperator: Token class for unary prefix operators.
+    TokenReference: Token class for references (cells, ranges, names), i.e. input keys.
     TokenError: Token class for error values.
     TokenErrorTypes: Enum class for different types of token errors.
+    TokenArray: Token class for array (range) values with compact, array-backed storage.
+
+    Tokens use `__slots__`; the built-in ones keep `type`/`subtype` as class constants.
 
 Functions:
     register_op: Decorator to register operator functions with multiple names.
     register_numeric_op: Decorator to register numeric operator functions with multiple names.
+    pure, volatile: Decorators marking callables as pure (foldable) or volatile.
+    is_pure: Returns whether a callable is marked as pure.
+    lazy, is_lazy: Marks (checks) functions taking their arguments as thunks.
+    by_reference, is_by_reference: Marks (checks) functions reading references as ranges.
+    specialize_with, get_specializer: Attach (get) a compile-time specializer of a function.
 
 Constants:
     REGISTERED_OPS: Dictionary to store registered operations.
+    TOKEN_TRUE, TOKEN_FALSE, TOKEN_EMPTY: Shared immutable token instances.
+
+Registries (see `mvin.registry`):
+    Registry, OperatorRegistry, FunctionRegistry: Immutable, versioned map snapshots.
+    RegistryDict: Mutable dict handing out cached snapshots of its content.
 """
 
 from abc import ABCMeta, abstractmethod
+from array import array
 from enum import Enum
 from importlib.metadata import PackageNotFoundError, version
-from typing import Any, Callable, Dict, Tuple, Union
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple, TypeVar, Union
+
+from mvin.registry import FunctionRegistry, OperatorRegistry, Registry, RegistryDict
 
 try:
     __version__ = version("mvin")
@@ -38,6 +58,8 @@ class Token(metaclass=ABCMeta):
     Abstract base class for all tokens.
     """
 
+    __slots__ = ()
+
     @property
     @abstractmethod
     def type(self) -> str:
@@ -60,8 +82,13 @@ class Token(metaclass=ABCMeta):
 class BaseToken(Token):
     """
     Base class implementing the Token interface.
+
+    Instances keep their state in slots. Subclasses that do not declare `__slots__`
+    (e.g. third-party tokens) still work and get a regular instance `__dict__`.
     """
 
+    __slots__ = ("_value", "_type", "_subtype")
+
     def __init__(self) -> None:
         super().__init__()
         self._value: Any = None
@@ -88,16 +115,28 @@ class BaseToken(Token):
         return f"Token<v:{self.value} t:{self.type} s:{self.subtype} >"
 
 
+# Built-in tokens store `type`/`subtype` as class-level constants (overriding the
+# BaseToken properties) and only keep their value per instance.
+
+
 class TokenBool(BaseToken):
     """
     Token class for boolean values.
+
+    Use `TokenBool.of(value)` to get the shared `TOKEN_TRUE`/`TOKEN_FALSE` instances.
     """
 
+    __slots__ = ()
+    type = "OPERAND"
+    subtype = "LOGICAL"
+
     def __init__(self, value: bool) -> None:
-        super().__init__()
         self._value = value
-        self._type = "OPERAND"
-        self._subtype = "LOGICAL"
+
+    @staticmethod
+    def of(value: bool) -> "TokenBool":
+        """Returns the shared token for `value`."""
+        return TOKEN_TRUE if value else TOKEN_FALSE
 
 
 class TokenString(BaseToken):
@@ -105,11 +144,12 @@ class TokenString(BaseToken):
     Token class for string values.
     """
 
+    __slots__ = ()
+    type = "OPERAND"
+    subtype = "TEXT"
+
     def __init__(self, value: str) -> None:
-        super().__init__()
         self._value = value
-        self._type = "OPERAND"
-        self._subtype = "TEXT"
 
 
 class TokenNumber(BaseToken):
@@ -117,11 +157,12 @@ class TokenNumber(BaseToken):
     Token class for numeric values.
     """
 
+    __slots__ = ()
+    type = "OPERAND"
+    subtype = "NUMBER"
+
     def __init__(self, value: Union[float, int]) -> None:
-        super().__init__()
         self._value = value
-        self._type = "OPERAND"
-        self._subtype = "NUMBER"
 
 
 class TokenFunc(BaseToken):
@@ -129,11 +170,66 @@ class TokenFunc(BaseToken):
     Token class for function names.
     """
 
+    __slots__ = ()
+    type = "FUNC"
+    subtype = "OPEN"
+
     def __init__(self, func_name: str) -> None:
-        super().__init__()
         self._value = func_name
-        self._type = "FUNC"
-        self._subtype = "OPEN"
+
+
+class TokenFuncClose(BaseToken):
+    """
+    Token class for the closing parenthesis of a function call.
+    """
+
+    __slots__ = ()
+    type = "FUNC"
+    subtype = "CLOSE"
+
+    def __init__(self) -> None:
+        self._value = ")"
+
+
+class TokenSeparator(BaseToken):
+    """
+    Token class for argument separators.
+    """
+
+    __slots__ = ()
+    type = "SEP"
+    subtype = "ARG"
+
+    def __init__(self, separator: str = ",") -> None:
+        self._value = separator
+
+
+class TokenPrefixOperator(BaseToken):
+    """
+    Token class for unary prefix operators (`+x`, `-x`).
+    """
+
+    __slots__ = ()
+    type = "OPERATOR-PREFIX"
+    subtype = ""
+
+    def __init__(self, operator: str) -> None:
+        self._value = operator
+
+
+class TokenReference(BaseToken):
+    """
+    Token class for references (`A1`, `Sheet1!A1:B10`, defined names, ...).
+
+    The value is the reference text; interpreters read it from their inputs.
+    """
+
+    __slots__ = ()
+    type = "OPERAND"
+    subtype = "RANGE"
+
+    def __init__(self, reference: str) -> None:
+        self._value = reference
 
 
 class TokenOperator(BaseToken):
@@ -141,11 +237,12 @@ class TokenOperator(BaseToken):
     Token class for operators.
     """
 
+    __slots__ = ()
+    type = "OPERATOR-INFIX"
+    subtype = ""
+
     def __init__(self, operator: str) -> None:
-        super().__init__()
         self._value = operator
-        self._type = "OPERATOR-INFIX"
-        self._subtype = ""
 
 
 class TokenParen(BaseToken):
@@ -153,25 +250,33 @@ class TokenParen(BaseToken):
     Token class for operators.
     """
 
+    __slots__ = ()
+    type = "OPERATOR-INFIX"
+
     def __init__(self, subtype: str) -> None:
-        super().__init__()
         self._value = "(" if subtype == "OPEN" else ")"
-        self._type = "OPERATOR-INFIX"
         self._subtype = "OPEN" if subtype == "OPEN" else "CLOSE"
 
 
 class TokenEmpty(BaseToken):
     """
     Token class for empty value.
+
+    `TOKEN_EMPTY` is a shared instance.
     """
 
+    __slots__ = ()
+    type = "OPERAND"
+    subtype = "EMPTY"
+
     def __init__(self) -> None:
-        super().__init__()
         self._value = None
-        self._type = "OPERAND"
-        self._subtype = "EMPTY"
 
 
+TOKEN_TRUE = TokenBool(True)
+TOKEN_FALSE = TokenBool(False)
+TOKEN_EMPTY = TokenEmpty()
+
 TokenErrorTypes = Enum(
     "TokenErrorTypes",
     [
@@ -193,13 +298,16 @@ Enum class for different types of token errors.
 class TokenError(BaseToken):
     """
     Token class for error values.
+
+    Use `TokenError.of(error_type)` to get a shared, message-less error token.
     """
 
+    __slots__ = ("_message",)
+    type = "OPERAND"
+    subtype = "ERROR"
+
     def __init__(self, error_type: TokenErrorTypes, message: str) -> None:
-        super().__init__()
         self._value = error_type.value
-        self._type = "OPERAND"
-        self._subtype = "ERROR"
         self._message = message
 
     @property
@@ -207,9 +315,301 @@ class TokenError(BaseToken):
         """Returns the error message."""
         return self._message
 
+    @staticmethod
+    def of(error_type: TokenErrorTypes) -> "TokenError":
+        """Returns the shared error token (with an empty message) for `error_type`."""
+        return _SHARED_ERRORS[error_type]
+
+
+_SHARED_ERRORS: Dict[Any, TokenError] = {
+    error_type: TokenError(error_type, "") for error_type in TokenErrorTypes
+}
+
+
+def _array_cell(value: Any) -> Tuple[int, float, Any]:
+    # Returns (kind, number, other) for a Python value or an operand token
+    if isinstance(value, Token):
+        subtype = value.subtype
+        if subtype == "NUMBER":
+            return _array_cell(value.value)
+        if subtype == "TEXT":
+            return TokenArray.TEXT, 0.0, value.value
+        if subtype == "LOGICAL":
+            return TokenArray.LOGICAL, 0.0, bool(value.value)
+        if subtype == "ERROR":
+            return TokenArray.ERROR, 0.0, value
+        if subtype == "EMPTY":
+            return TokenArray.EMPTY, 0.0, None
+        raise ValueError(f"Unsupported token for an array cell: {value}")
+    if value is None:
+        return TokenArray.EMPTY, 0.0, None
+    if isinstance(value, bool):
+        return TokenArray.LOGICAL, 0.0, value
+    if isinstance(value, (int, float)):
+        return TokenArray.NUMBER, float(value), None
+    if isinstance(value, str):
+        return TokenArray.TEXT, 0.0, value
+    raise ValueError(f"Unsupported value for an array cell: {value!r}")
+
+
+def _error_value(cell: Any) -> Any:
+    return cell.value if isinstance(cell, Token) else cell
+
+
+class TokenArray(BaseToken):
+    """
+    Token class for array (range) values.
+
+    Cells are stored row-major in compact containers instead of one token per cell:
+
+    - `numbers`: an `array('d')` with the value of every numeric cell (0.0 elsewhere),
+    - `kinds`: a `bytearray` with the kind of every cell (`TokenArray.EMPTY`, `NUMBER`,
+      `TEXT`, `LOGICAL` or `ERROR`),
+    - a sparse map of cell index to the text, boolean or error token of other cells.
+
+    Numbers are stored as floats. `value` materializes the cells as a list of rows of
+    plain values (error cells as their error string); `token(row, col)` builds the token
+    of a single cell. Arrays can be modified with `set`, which bumps `version` and drops
+    everything functions cached in `index_cache`.
+    """
+
+    __slots__ = (
+        "_rows",
+        "_cols",
+        "_numbers",
+        "_kinds",
+        "_others",
+        "_version",
+        "_index_cache",
+    )
+    type = "OPERAND"
+    subtype = "ARRAY"
+
+    EMPTY = 0
+    NUMBER = 1
+    TEXT = 2
+    LOGICAL = 3
+    ERROR = 4
+
+    def __init__(
+        self,
+        rows: int,
+        cols: int,
+        numbers: Union["array[float]", None] = None,
+        kinds: Union[bytearray, None] = None,
+        others: Union[Dict[int, Any], None] = None,
+    ) -> None:
+        """
+        Creates a `rows` x `cols` array from its storage; see `from_values` and
+        `from_numbers` for the usual constructors. Without storage, every cell is empty.
+
+        Raises:
+            ValueError: If the dimensions and the storage lengths do not match.
+        """
+        size = rows * cols
+        if rows < 0 or cols < 0:
+            raise ValueError(f"Invalid array dimensions {rows}x{cols}")
+        self._value = None
+        self._rows = rows
+        self._cols = cols
+        self._numbers = array("d", bytes(8 * size)) if numbers is None else numbers
+        self._kinds = bytearray(size) if kinds is None else kinds
+        self._others: Dict[int, Any] = {} if others is None else others
+        if len(self._numbers) != size or len(self._kinds) != size:
+            raise ValueError(
+                f"Storage of {len(self._numbers)} numbers and {len(self._kinds)} kinds "
+                f"does not match {rows}x{cols} cells"
+            )
+        self._version = 0
+        self._index_cache: Dict[Any, Any] = {}
+
+    @classmethod
+    def from_values(cls, rows: Sequence[Sequence[Any]]) -> "TokenArray":
+        """
+        Creates an array from rows of Python values (`int`/`float`, `str`, `bool`, None
+        for empty cells) or operand tokens.
+
+        Raises:
+            ValueError: If the rows have different lengths or a value is not supported.
+        """
+        cols = len(rows[0]) if rows else 0
+        numbers = array("d")
+        kinds = bytearray()
+        others: Dict[int, Any] = {}
+        index = 0
+        for row in rows:
+            if len(row) != cols:
+                raise ValueError(f"Expected {cols} cells per row, but found {len(row)}")
+            for value in row:
+                kind, number, other = _array_cell(value)
+                numbers.append(number)
+                kinds.append(kind)
+                if other is not None:
+                    others[index] = other
+                index += 1
+        return cls(len(rows), cols, numbers, kinds, others)
+
+    @classmethod
+    def column(cls, values: Sequence[Any]) -> "TokenArray":
+        """Creates a single-column array; see `from_values`."""
+        return cls.from_values([[value] for value in values])
+
+    @classmethod
+    def from_numbers(cls, numbers: Sequence[float], cols: int = 1) -> "TokenArray":
+        """
+        Creates an all-numeric array (row-major) without going through per-cell values.
+
+        Raises:
+            ValueError: If the numbers do not fill complete rows of `cols` cells.
+        """
+        if cols < 1 or len(numbers) % cols:
+            raise ValueError(f"{len(numbers)} numbers do not fill rows of {cols} cells")
+        storage = array("d", numbers)
+        return cls(
+            len(storage) // cols,
+            cols,
+            storage,
+            bytearray([TokenArray.NUMBER]) * len(storage),
+        )
 
-# Dictionary to store registered operations
-REGISTERED_OPS: Dict[str, Callable[[Token, Token], Token]] = {}
+    @property
+    def rows(self) -> int:
+        """Returns the number of rows."""
+        return self._rows
+
+    @property
+    def cols(self) -> int:
+        """Returns the number of columns."""
+        return self._cols
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """Returns `(rows, cols)`."""
+        return (self._rows, self._cols)
+
+    def __len__(self) -> int:
+        return self._rows * self._cols
+
+    @property
+    def numbers(self) -> memoryview:
+        """Returns a read-only view of the numeric storage (0.0 for other cells)."""
+        return memoryview(self._numbers).toreadonly()
+
+    @property
+    def kinds(self) -> memoryview:
+        """Returns a read-only view of the kind of every cell, row-major."""
+        return memoryview(self._kinds).toreadonly()
+
+    @property
+    def version(self) -> int:
+        """Returns a counter incremented by every modification."""
+        return self._version
+
+    @property
+    def index_cache(self) -> Dict[Any, Any]:
+        """
+        Returns a dict where functions can keep indexes built from this array. It is
+        cleared whenever the array is modified.
+        """
+        return self._index_cache
+
+    def count(self, kind: int) -> int:
+        """Returns the number of cells of the given kind."""
+        return self._kinds.count(kind)
+
+    def mask(self, *kinds: int) -> bytes:
+        """
+        Returns one byte per cell: 1 where the cell is of one of `kinds`, 0 elsewhere.
+        Suitable as the selector of `itertools.compress`; cached until the next `set`.
+        """
+        key = ("mask", kinds)
+        cached = self._index_cache.get(key)
+        if cached is None:
+            table = bytes(1 if kind in kinds else 0 for kind in range(256))
+            cached = bytes(self._kinds.translate(table))
+            self._index_cache[key] = cached
+        return cached
+
+    def first_error(self) -> Union[Token, None]:
+        """Returns the first error cell (row-major), or None."""
+        index = self._kinds.find(TokenArray.ERROR)
+        return None if index < 0 else self._others[index]
+
+    def token_at(self, index: int) -> Token:
+        """Returns the token of the cell at row-major `index`."""
+        kind = self._kinds[index]
+        if kind == TokenArray.NUMBER:
+            return TokenNumber(self._numbers[index])
+        if kind == TokenArray.TEXT:
+            return TokenString(self._others[index])
+        if kind == TokenArray.LOGICAL:
+            return TokenBool.of(self._others[index])
+        if kind == TokenArray.ERROR:
+            return self._others[index]
+        return TOKEN_EMPTY
+
+    def token(self, row: int, col: int = 0) -> Token:
+        """Returns the token of the cell at (`row`, `col`), both 0-based."""
+        return self.token_at(self._index(row, col))
+
+    def tokens(self) -> Iterator[Token]:
+        """Iterates over the tokens of every cell, row-major."""
+        return (self.token_at(index) for index in range(len(self)))
+
+    def set(self, row: int, col: int, value: Any) -> None:
+        """
+        Sets the cell at (`row`, `col`) to a Python value or operand token.
+
+        Raises:
+            IndexError: If the cell is outside the array.
+            ValueError: If the value is not supported.
+        """
+        index = self._index(row, col)
+        kind, number, other = _array_cell(value)
+        self._numbers[index] = number
+        self._kinds[index] = kind
+        if other is None:
+            self._others.pop(index, None)
+        else:
+            self._others[index] = other
+        self._version += 1
+        self._index_cache.clear()
+
+    def _index(self, row: int, col: int) -> int:
+        if not (0 <= row < self._rows and 0 <= col < self._cols):
+            raise IndexError(
+                f"Cell ({row}, {col}) is outside a {self._rows}x{self._cols} array"
+            )
+        return row * self._cols + col
+
+    def value_at(self, index: int) -> Any:
+        """
+        Returns the plain value of the cell at row-major `index`: a float, str or bool,
+        None for empty cells and the error token for error cells.
+        """
+        kind = self._kinds[index]
+        if kind == TokenArray.NUMBER:
+            return self._numbers[index]
+        return self._others.get(index)
+
+    @property
+    def value(self) -> List[List[Any]]:
+        """Returns the cells as a list of rows of plain values (errors as strings)."""
+        cols = self._cols
+        rows = [
+            [self.value_at(row * cols + col) for col in range(cols)]
+            for row in range(self._rows)
+        ]
+        if TokenArray.ERROR in self._kinds:
+            rows = [[_error_value(cell) for cell in row] for row in rows]
+        return rows
+
+    def __repr__(self) -> str:
+        return f"Token<v:{self._rows}x{self._cols} t:{self.type} s:{self.subtype} >"
+
+
+# Dictionary to store registered operations (snapshot with `OperatorRegistry.of`)
+REGISTERED_OPS: Dict[str, Callable[[Token, Token], Token]] = RegistryDict()
 
 
 def register_op(*names):
@@ -269,6 +669,137 @@ def register_numeric_op(
     return decorator
 
 
+_F = TypeVar("_F", bound=Callable)
+
+
+def pure(func: _F) -> _F:
+    """
+    Decorator marking a function callable as pure: same arguments, same result and no
+    side effects. Only pure functions are evaluated at compile time (constant folding)
+    or shared between identical sub-expressions.
+
+    Args:
+        func: The function callable.
+
+    Returns:
+        The same callable, marked as pure.
+    """
+    func.__mvin_pure__ = True  # type: ignore[attr-defined]
+    return func
+
+
+def volatile(func: _F) -> _F:
+    """
+    Decorator marking a function or operator callable as volatile (e.g. `NOW()`), so it
+    is always evaluated when the formula is.
+
+    Args:
+        func: The function or operator callable.
+
+    Returns:
+        The same callable, marked as volatile.
+    """
+    func.__mvin_pure__ = False  # type: ignore[attr-defined]
+    return func
+
+
+def is_pure(func: Callable, default: bool = False) -> bool:
+    """
+    Returns whether `func` was marked with `pure` (True) or `volatile` (False).
+
+    Unmarked callables get `default`: the interpreter assumes operators are pure and
+    functions are not.
+    """
+    return getattr(func, "__mvin_pure__", default)
+
+
+def lazy(func: _F) -> _F:
+    """
+    Decorator marking a function callable as lazy.
+
+    A lazy function is called as `func(context, *args)`: instead of tokens, every
+    argument is a callable and `arg(context)` evaluates it (returning a token or None for
+    an empty argument). With the compiled backend, arguments that are never called are
+    never evaluated, which lets conditional functions such as `IF` skip their untaken
+    branches. The stack backend evaluates every argument first and passes the results
+    wrapped in thunks, so both backends return the same values.
+
+    Args:
+        func: The function callable.
+
+    Returns:
+        The same callable, marked as lazy.
+    """
+    func.__mvin_lazy__ = True  # type: ignore[attr-defined]
+    return func
+
+
+def is_lazy(func: Callable) -> bool:
+    """Returns whether `func` was marked with `lazy`."""
+    return getattr(func, "__mvin_lazy__", False)
+
+
+def by_reference(func: _F) -> _F:
+    """
+    Decorator marking a function callable as taking references like ranges.
+
+    Excel treats a value that comes from a cell reference (`SUM(A1, A2)`) differently from
+    the same value typed into the formula (`SUM("abc", 2)`): aggregates skip referenced
+    text, logicals and empty cells. Both backends pass a marked function every text,
+    logical or empty argument that is a reference as a 1x1 `TokenArray`, so the function
+    handles it like a range cell. Referenced numbers and errors, and every other argument,
+    are passed unchanged.
+
+    Args:
+        func: The function callable.
+
+    Returns:
+        The same callable, marked as taking references.
+    """
+    func.__mvin_by_reference__ = True  # type: ignore[attr-defined]
+    return func
+
+
+def is_by_reference(func: Callable) -> bool:
+    """Returns whether `func` was marked with `by_reference`."""
+    return getattr(func, "__mvin_by_reference__", False)
+
+
+def specialize_with(
+    specializer: Callable[[Tuple[Any, ...]], Union[Callable, None]],
+) -> Callable[[_F], _F]:
+    """
+    Decorator factory attaching a compile-time specializer to a function callable.
+
+    When the compiled backend builds a call with at least one constant argument, it calls
+    `specializer(constants)`. `constants` has one entry per argument: the constant token,
+    or None for an argument computed at evaluation time. A returned callable replaces the
+    function for that call site and is called with all the arguments, as the function
+    would be; None keeps the function. Specializers precompute the work that depends on
+    the constant arguments only, they must not change the results. Lazy functions are
+    never specialized.
+
+    Args:
+        specializer: Called once per call site with constant arguments.
+
+    Returns:
+        A decorator that marks the function and returns it unchanged.
+    """
+
+    def decorator(func: _F) -> _F:
+        func.__mvin_specialize__ = specializer  # type: ignore[attr-defined]
+        return func
+
+    return decorator
+
+
+def get_specializer(
+    func: Callable,
+) -> Union[Callable[[Tuple[Any, ...]], Union[Callable, None]], None]:
+    """Returns the specializer attached with `specialize_with`, or None."""
+    return getattr(func, "__mvin_specialize__", None)
+
+
 __all__ = [
     "__version__",
     "Token",
@@ -277,12 +808,33 @@ __all__ = [
     "TokenString",
     "TokenNumber",
     "TokenFunc",
+    "TokenFuncClose",
+    "TokenSeparator",
+    "TokenPrefixOperator",
+    "TokenReference",
     "TokenOperator",
     "TokenParen",
     "TokenEmpty",
+    "TOKEN_TRUE",
+    "TOKEN_FALSE",
+    "TOKEN_EMPTY",
     "TokenErrorTypes",
     "TokenError",
+    "TokenArray",
     "REGISTERED_OPS",
     "register_op",
     "register_numeric_op",
+    "pure",
+    "volatile",
+    "is_pure",
+    "lazy",
+    "is_lazy",
+    "by_reference",
+    "is_by_reference",
+    "specialize_with",
+    "get_specializer",
+    "Registry",
+    "OperatorRegistry",
+    "FunctionRegistry",
+    "RegistryDict",
 ]
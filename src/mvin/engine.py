@@ -0,0 +1,411 @@
+"""
+This module defines a workbook-level engine that evaluates many formulas that refer to each
+other.
+
+Every formula is registered under a cell reference (the key other formulas use in their
+`RANGE` operands). The engine builds the dependency graph from each interpreter's `inputs`,
+rejects circular references and evaluates the formulas in topological order, handing the
+result tokens of one formula directly to the formulas that depend on it.
+
+The engine keeps the last value of every cell, so after `set_value` a `recalc` only
+re-evaluates the formulas downstream of the changed cells.
+
+Classes:
+    Engine: Dependency-graph engine for a set of formulas.
+"""
+
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from mvin import REGISTERED_OPS, Token, TokenArray, TokenError, TokenErrorTypes
+from mvin.functions.excel_lib import DEFAULT_FUNCTIONS
+from mvin.interpreter import InterpreterCache, get_interpreter
+
+
+class Engine:
+    """
+    Dependency-graph engine for a set of formulas keyed by cell reference.
+
+    Formulas are compiled with `get_interpreter` (through `cache` when one is given). Cells
+    that are referenced but have no formula are leaf inputs and must be provided when
+    calculating.
+
+    `calculate` evaluates every formula. Afterwards, `set_value` changes leaf cells and
+    `recalc` re-evaluates only their transitive dependents, in dependency order, and stops
+    propagating along a path as soon as a recomputed value equals the previous one.
+
+    A formula that fails to evaluate does not abort the calculation: like
+    `run.evaluate_batch`, its result becomes a `#REF!` (missing input) or `#VALUE!`
+    `TokenError`, which then flows into its dependents.
+    """
+
+    def __init__(
+        self,
+        proposed_functions: Mapping[
+            str, Tuple[Union[Sequence, None], Callable]
+        ] = DEFAULT_FUNCTIONS,
+        registered_ops: Mapping[str, Callable[[Token, Token], Token]] = REGISTERED_OPS,
+        cache: Union[InterpreterCache, None] = None,
+    ) -> None:
+        self._functions = proposed_functions
+        self._ops = registered_ops
+        self._cache = cache
+        self._formulas: Dict[str, Any] = {}
+        self._sources: Dict[str, Sequence[Token]] = {}
+        self._precedents: Dict[str, Set[str]] = {}
+        self._dependents: Dict[str, Set[str]] = {}
+        self._order: Union[List[Tuple[str, Callable[[Any], Token]]], None] = None
+        self._position: Dict[str, int] = {}
+        self._values: Dict[str, Any] = {}
+        self._stale: Set[str] = set()  # formulas that must be evaluated on recalc
+        self._changed: Set[str] = set()  # leaf cells changed since the last recalc
+
+    @property
+    def proposed_functions(
+        self,
+    ) -> Mapping[str, Tuple[Union[Sequence, None], Callable]]:
+        """Returns the function map formulas are compiled with."""
+        return self._functions
+
+    @property
+    def registered_ops(self) -> Mapping[str, Callable[[Token, Token], Token]]:
+        """Returns the operator map formulas are compiled with."""
+        return self._ops
+
+    def __contains__(self, ref: object) -> bool:
+        return ref in self._formulas
+
+    def __len__(self) -> int:
+        return len(self._formulas)
+
+    def set_formula(self, ref: str, formula: Union[Sequence[Token], Callable]) -> None:
+        """
+        Registers (or replaces) the formula of cell `ref`.
+
+        Args:
+            ref: The cell reference other formulas use to refer to this cell.
+            formula: Infix tokens, or an interpreter returned by `get_interpreter`.
+
+        Raises:
+            SyntaxError: If the tokens cannot be parsed.
+            TypeError: If `formula` is neither tokens nor an interpreter.
+        """
+        run: Any = formula
+        if isinstance(formula, Sequence):
+            run = get_interpreter(
+                formula, self._functions, self._ops, cache=self._cache
+            )
+        if not hasattr(run, "evaluate_token"):
+            raise TypeError(
+                f"Expected tokens or an interpreter for `{ref}`, but found {formula!r}"
+            )
+
+        self._unlink(ref)
+        precedents = set(run.inputs)
+        self._formulas[ref] = run
+        if isinstance(formula, Sequence):
+            self._sources[ref] = formula
+        else:
+            self._sources.pop(ref, None)
+        self._precedents[ref] = precedents
+        for precedent in precedents:
+            self._dependents.setdefault(precedent, set()).add(ref)
+        self._order = None
+        self._stale.add(ref)
+
+    def remove_formula(self, ref: str) -> None:
+        """
+        Removes the formula of cell `ref`; it becomes a leaf input again.
+
+        Raises:
+            KeyError: If `ref` has no formula.
+        """
+        if ref not in self._formulas:
+            raise KeyError(ref)
+        self._unlink(ref)
+        del self._formulas[ref]
+        self._sources.pop(ref, None)
+        self._order = None
+        self._stale.discard(ref)
+        self._values.pop(ref, None)
+        self._changed.add(ref)
+
+    def _unlink(self, ref: str) -> None:
+        for precedent in self._precedents.pop(ref, ()):
+            dependents = self._dependents[precedent]
+            dependents.discard(ref)
+            if not dependents:
+                del self._dependents[precedent]
+
+    def source(self, ref: str) -> Union[Sequence[Token], None]:
+        """
+        Returns the tokens the formula of `ref` was registered with, or None when it
+        was registered as an interpreter.
+
+        Raises:
+            KeyError: If `ref` has no formula.
+        """
+        if ref not in self._formulas:
+            raise KeyError(ref)
+        return self._sources.get(ref)
+
+    def precedents(self, ref: str) -> Set[str]:
+        """Returns the references the formula of `ref` reads directly."""
+        return set(self._precedents.get(ref, ()))
+
+    def dependents(self, ref: str) -> Set[str]:
+        """Returns the formulas that read `ref` directly."""
+        return set(self._dependents.get(ref, ()))
+
+    def leaves(self) -> Set[str]:
+        """Returns the referenced cells that have no formula (the engine's inputs)."""
+        return {ref for ref in self._dependents if ref not in self._formulas}
+
+    def order(self) -> List[str]:
+        """
+        Returns the formula cells in evaluation (topological) order.
+
+        Raises:
+            ValueError: If the formulas contain a circular reference.
+        """
+        return [ref for ref, _ in self._evaluation_order()]
+
+    def components(self) -> List[List[str]]:
+        """
+        Returns the weakly connected components of the dependency graph.
+
+        Each component lists its formula cells in evaluation order; formulas of different
+        components never read each other's results, so components can be evaluated
+        independently. Components are ordered by their first formula in `order()`.
+
+        Raises:
+            ValueError: If the formulas contain a circular reference.
+        """
+        order = self.order()
+
+        # Union-find over formula cells and the cells they read
+        parent: Dict[str, str] = {}
+
+        def find(ref: str) -> str:
+            root = parent.setdefault(ref, ref)
+            while root != parent[root]:
+                root = parent[root]
+            while parent[ref] != root:
+                parent[ref], ref = root, parent[ref]
+            return root
+
+        for ref in order:
+            root = find(ref)
+            for precedent in self._precedents[ref]:
+                other = find(precedent)
+                if other != root:
+                    parent[other] = root
+
+        components: Dict[str, List[str]] = {}
+        for ref in order:
+            components.setdefault(find(ref), []).append(ref)
+        return list(components.values())
+
+    def _evaluation_order(self) -> List[Tuple[str, Callable[[Any], Token]]]:
+        if self._order is None:
+            self._order = [
+                (ref, _cell_evaluator(self._formulas[ref]))
+                for ref in self._topological_sort(self._formulas)
+            ]
+            self._position = {ref: index for index, (ref, _) in enumerate(self._order)}
+        return self._order
+
+    def _topological_sort(self, refs: Iterable[str]) -> List[str]:
+        # Kahn's algorithm restricted to `refs`, in registration order for ties
+        selected = set(refs)
+        pending = {
+            ref: len(self._precedents[ref] & selected)
+            for ref in self._formulas
+            if ref in selected
+        }
+        ready = [ref for ref, count in pending.items() if count == 0]
+        ready.reverse()
+        ordered: List[str] = []
+        while ready:
+            ref = ready.pop()
+            ordered.append(ref)
+            for dependent in self._dependents.get(ref, ()):
+                if dependent in pending:
+                    pending[dependent] -= 1
+                    if pending[dependent] == 0:
+                        ready.append(dependent)
+        if len(ordered) != len(pending):
+            raise ValueError(
+                f"Circular reference: {' -> '.join(self._find_cycle(pending))}"
+            )
+        return ordered
+
+    def _find_cycle(self, pending: Mapping[str, int]) -> List[str]:
+        # Walk precedents among the unresolved cells until a cell repeats
+        ref = next(ref for ref, count in pending.items() if count > 0)
+        path: List[str] = []
+        seen: Dict[str, int] = {}
+        while ref not in seen:
+            seen[ref] = len(path)
+            path.append(ref)
+            ref = next(
+                precedent
+                for precedent in sorted(self._precedents[ref])
+                if pending.get(precedent, 0) > 0
+            )
+        cycle = path[seen[ref] :] + [ref]
+        cycle.reverse()  # report in dependency direction: A1 -> B1 means B1 reads A1
+        return cycle
+
+    def value(self, ref: str) -> Token:
+        """
+        Returns the current value of cell `ref` (a leaf value or a formula result).
+
+        Raises:
+            KeyError: If `ref` has no value yet.
+        """
+        return self._values[ref]
+
+    def set_value(self, ref: str, token: Token) -> None:
+        """
+        Sets the value of leaf cell `ref`; the next `recalc` updates its dependents.
+
+        Raises:
+            ValueError: If `ref` has a formula (use `remove_formula` first).
+        """
+        if ref in self._formulas:
+            raise ValueError(
+                f"Cell `{ref}` has a formula, remove it before setting a value"
+            )
+        previous = self._values.get(ref)
+        self._values[ref] = token
+        if previous is None or not _same_value(previous, token):
+            self._changed.add(ref)
+
+    def calculate(
+        self, inputs: Union[Mapping[str, Token], None] = None
+    ) -> Dict[str, Token]:
+        """
+        Evaluates every formula in dependency order.
+
+        Args:
+            inputs: Tokens for the leaf cells, added to the values already set. A formula
+                cell listed here is still recalculated; its formula wins.
+
+        Returns:
+            The result token of every formula cell, in evaluation order.
+
+        Raises:
+            ValueError: If the formulas contain a circular reference.
+        """
+        order = self._evaluation_order()
+        values = self._values
+        if inputs is not None:
+            values.update(inputs)
+        for ref, evaluate_token in order:
+            values[ref] = _evaluate_cell(evaluate_token, values)
+        self._stale.clear()
+        self._changed.clear()
+        return {ref: values[ref] for ref, _ in order}
+
+    def recalc(self) -> Dict[str, Token]:
+        """
+        Re-evaluates the formulas affected by `set_value`, `set_formula` and
+        `remove_formula` since the last calculation.
+
+        Only transitive dependents of the changed cells are considered, in dependency
+        order. A formula is only evaluated when one of its precedents actually changed,
+        so propagation stops where a recomputed value equals the previous one.
+
+        Returns:
+            The formula cells whose value changed, mapped to their new value.
+
+        Raises:
+            ValueError: If the formulas contain a circular reference.
+        """
+        order = self._evaluation_order()
+        position = self._position
+        changed = self._changed
+        stale = self._stale
+
+        # Transitive dependents of everything that changed, then sorted topologically
+        affected = set(stale)
+        frontier = list(changed | stale)
+        dependents = self._dependents
+        while frontier:
+            for dependent in dependents.get(frontier.pop(), ()):
+                if dependent not in affected:
+                    affected.add(dependent)
+                    frontier.append(dependent)
+
+        values = self._values
+        precedents = self._precedents
+        results: Dict[str, Token] = {}
+        for index in sorted(position[ref] for ref in affected):
+            ref, evaluate_token = order[index]
+            if ref not in stale and changed.isdisjoint(precedents[ref]):
+                continue  # every precedent kept its value: early cutoff
+            value = _evaluate_cell(evaluate_token, values)
+            previous = values.get(ref)
+            values[ref] = value
+            if ref in stale or previous is None or not _same_value(previous, value):
+                changed.add(ref)
+                results[ref] = value
+
+        stale.clear()
+        changed.clear()
+        return results
+
+
+def _same_value(a: Token, b: Token) -> bool:
+    # Results with the same subtype, value class and value are interchangeable for
+    # dependents (1, 1.0 and True compare equal but render differently). Arrays can be
+    # modified in place (`TokenArray.set`), so even the same array may have changed
+    if isinstance(a, TokenArray) or isinstance(b, TokenArray):
+        return False
+    return a is b or (
+        a.subtype == b.subtype
+        and a.value.__class__ is b.value.__class__
+        and a.value == b.value
+    )
+
+
+def _cell_evaluator(run: Any) -> Callable[[Mapping[str, Any]], Token]:
+    # `run.evaluate_token` reading the sheet values. The compiled backend looks up its
+    # references in the mapping it gets; the stack backend copies that mapping on every
+    # call, so it gets only the values of its own inputs instead of the whole sheet
+    evaluate_token: Callable[[Any], Token] = run.evaluate_token
+    if getattr(run, "backend", None) != "stack":
+        return evaluate_token
+    keys = tuple(run.inputs)
+
+    def evaluate_own_inputs(values: Mapping[str, Any]) -> Token:
+        return evaluate_token({key: values[key] for key in keys if key in values})
+
+    return evaluate_own_inputs
+
+
+def _evaluate_cell(
+    evaluate_token: Callable[[Any], Token], values: Mapping[str, Any]
+) -> Token:
+    try:
+        return evaluate_token(values)
+    except KeyError as e:
+        return TokenError(TokenErrorTypes.REF, str(e.args[0]))
+    except Exception as e:
+        return TokenError(TokenErrorTypes.VALUE, str(e))
+
+
+__all__ = [
+    "Engine",
+]
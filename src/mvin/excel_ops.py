@@ -37,7 +37,7 @@ def excel_op_eq(a: Token, b: Token) -> Token:
             return b
 
         if a.type == "OPERAND" and b.type == "OPERAND":
-            return TokenBool(a.subtype == b.subtype and a.value == b.value)
+            return TokenBool.of(a.subtype == b.subtype and a.value == b.value)
     return TokenError(
         TokenErrorTypes.VALUE,
         f"Expected 2 values but, at most 1 argument was a value (a:{a} b:{b})",
@@ -48,7 +48,7 @@ def excel_op_eq(a: Token, b: Token) -> Token:
 def excel_op_neq(a: Token, b: Token) -> Token:
     possible_eq = excel_op_eq(a, b)
     if possible_eq and possible_eq.subtype == "LOGICAL":
-        return TokenBool(not possible_eq.value)
+        return TokenBool.of(not possible_eq.value)
     return possible_eq
 
 
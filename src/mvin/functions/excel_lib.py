@@ -1,7 +1,38 @@
-import logging
-from typing import Callable, Dict, List, Tuple, Union
+import math
+import re
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from itertools import chain, compress
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Pattern,
+    Sequence,
+    Tuple,
+    Union,
+)
 
-from mvin import Token, TokenBool, TokenError, TokenErrorTypes, TokenNumber, TokenString
+from mvin import (
+    TOKEN_EMPTY,
+    TOKEN_FALSE,
+    TOKEN_TRUE,
+    RegistryDict,
+    Token,
+    TokenArray,
+    TokenBool,
+    TokenError,
+    TokenErrorTypes,
+    TokenNumber,
+    TokenString,
+    by_reference,
+    lazy,
+    pure,
+    specialize_with,
+)
 
 
 def _coerce_excel_int(value: Union[int, float]) -> Union[int, None]:
@@ -14,30 +45,73 @@ def _coerce_excel_int(value: Union[int, float]) -> Union[int, None]:
     return None
 
 
+@pure
 def excel_not(token: Token) -> Token:
     if token is not None and token.type == "OPERAND":
         if token.subtype == "LOGICAL":
-            return TokenBool(not token.value)
+            return TokenBool.of(not token.value)
         elif token.subtype == "NUMBER":
-            return TokenBool(not (token.value != 0))
+            return TokenBool.of(not (token.value != 0))
     return TokenError(
         TokenErrorTypes.VALUE,
         f"Expected boolean or number and found {token}",
     )
 
 
+@pure
 def excel_iserror(token: Token) -> Token:
-    return TokenBool(token is not None and token.subtype == "ERROR")
+    return TokenBool.of(token is not None and token.subtype == "ERROR")
 
 
-def excel_search(
-    find_text: Union[Token, None],
-    within_text: Union[Token, None],
-    start_num: Union[Token, None],
-) -> Token:
-    logging.debug(
-        f"excel_lib.excel_search: calling with (find_text= {find_text}, within_text={within_text}, start_num= {start_num} )"
+def _text_argument(token: Union[Token, None], argument: str) -> Union[str, Token]:
+    # The text of a TEXT/NUMBER/LOGICAL argument (empty for None), or the error to return
+    if token is None:
+        return ""
+    if token.subtype == "ERROR":
+        return token
+    if token.subtype == "TEXT":
+        return token.value
+    if token.subtype == "NUMBER":
+        return str(token.value)
+    if token.subtype == "LOGICAL":
+        return "TRUE" if token.value else "FALSE"
+    return TokenError(
+        TokenErrorTypes.VALUE,
+        f"Unsupported value type for {argument} argument: {token}",
     )
+
+
+@lru_cache(maxsize=1024)
+def _search_matcher(find_text: str) -> Callable[[str, int], int]:
+    # Case-insensitive SEARCH pattern -> `find(text, start)` returning an index or -1.
+    # Wildcard patterns become a regex. Plain patterns are lowered once and ASCII text is
+    # scanned with `str.find`; other text goes through a case-insensitive regex, whose
+    # positions are those of the original text even where lowering changes its length.
+    if re.search(r"[*?~]", find_text):
+        search = _wildcard_regex(find_text).search
+    else:
+        folded = find_text.lower()
+        search = re.compile(re.escape(find_text), re.IGNORECASE).search
+        if folded.isascii():
+
+            def find_plain(text: str, start: int) -> int:
+                if text.isascii():
+                    return text.lower().find(folded, start)
+                match = search(text, start)
+                return -1 if match is None else match.start()
+
+            return find_plain
+
+    def find_pattern(text: str, start: int) -> int:
+        match = search(text, start)
+        return -1 if match is None else match.start()
+
+    return find_pattern
+
+
+def _within_text_argument(within_text: Union[Token, None]) -> Union[str, Token]:
+    # The text SEARCH and FIND scan, or the error to return. It is checked before
+    # find_text, so that error comes first when both arguments are errors
     if within_text is None:
         return TokenError(TokenErrorTypes.VALUE, "Argument within_text cannot be None")
     if within_text.type != "OPERAND":
@@ -45,44 +119,32 @@ def excel_search(
             TokenErrorTypes.VALUE,
             f"Expected value for within_text argument, but found: {within_text}",
         )
+    if within_text.subtype == "TEXT":
+        return within_text.value
+    return _text_argument(within_text, "within_text")
 
-    within_text_value = ""
-    if within_text.subtype == "ERROR":
-        return within_text
-    elif within_text.subtype == "TEXT":
-        within_text_value = within_text.value
-    elif within_text.subtype == "NUMBER":
-        within_text_value = str(within_text.value)
-    elif within_text.subtype == "LOGICAL":
-        within_text_value = "TRUE" if within_text.value else "FALSE"
-    else:
-        return TokenError(
-            TokenErrorTypes.VALUE,
-            f"Unsupported value type for within_text argument: {within_text}",
-        )
 
-    find_text_value = ""
-    if find_text is not None:
-        if find_text.subtype == "ERROR":
-            return find_text
-        elif find_text.subtype == "TEXT":
-            find_text_value = find_text.value
-        elif find_text.subtype == "NUMBER":
-            find_text_value = str(find_text.value)
-        elif find_text.subtype == "LOGICAL":
-            find_text_value = "TRUE" if find_text.value else "FALSE"
-        else:
-            return TokenError(
-                TokenErrorTypes.VALUE,
-                f"Unsupported value type for find_text argument: {find_text}",
-            )
+def _find_text_argument(find_text: Union[Token, None]) -> Union[str, Token]:
+    if find_text is not None and find_text.subtype == "TEXT":
+        return find_text.value
+    return _text_argument(find_text, "find_text")
+
 
+def _find_in(
+    find_text_value: str,
+    matcher: Callable[[str, int], int],
+    within_text_value: str,
+    start_num: Union[Token, None],
+) -> Token:
+    # Shared by SEARCH and FIND once both texts are known: validate start_num, scan
     start_num_value = 0
     if start_num is not None:
         if start_num.subtype == "ERROR":
             return start_num
         elif start_num.subtype == "NUMBER":
-            coerced_start_num = _coerce_excel_int(start_num.value)
+            coerced_start_num = start_num.value
+            if coerced_start_num.__class__ is not int:
+                coerced_start_num = _coerce_excel_int(coerced_start_num)
             if coerced_start_num is None:
                 return TokenError(
                     TokenErrorTypes.VALUE,
@@ -101,8 +163,7 @@ def excel_search(
                 f"Expected integer value for start_num argument, but found: {start_num}",
             )
 
-    # Excel SEARCH is case-insensitive.
-    found_index = within_text_value.lower().find(find_text_value.lower(), start_num_value)
+    found_index = matcher(within_text_value, start_num_value)
     if found_index >= 0:
         return TokenNumber(found_index + 1)
     else:
@@ -112,10 +173,95 @@ def excel_search(
         )
 
 
-def excel_left(text: Union[Token, None], num_chars: Union[Token, None]) -> Token:
-    logging.debug(
-        f"excel_lib.excel_left: calling with (text= {text}, num_chars= {num_chars} )"
+def _specialize_search(constants: Tuple[Any, ...]) -> Union[Callable, None]:
+    # A constant find_text is coerced and compiled once, at interpreter build time
+    find_text_value = _find_text_argument(constants[0])
+    if constants[0] is None or not isinstance(find_text_value, str):
+        return None
+    # Compiled outside the LRU, which is left to patterns only known at evaluation time
+    matcher = _search_matcher.__wrapped__(find_text_value)  # type: ignore[attr-defined]
+
+    @pure
+    def search_constant(
+        find_text: Union[Token, None],
+        within_text: Union[Token, None],
+        start_num: Union[Token, None],
+    ) -> Token:
+        within_text_value = _within_text_argument(within_text)
+        if not isinstance(within_text_value, str):
+            return within_text_value
+        return _find_in(find_text_value, matcher, within_text_value, start_num)
+
+    return search_constant
+
+
+@pure
+@specialize_with(_specialize_search)
+def excel_search(
+    find_text: Union[Token, None],
+    within_text: Union[Token, None],
+    start_num: Union[Token, None],
+) -> Token:
+    # Case-insensitive, with Excel wildcards; constant patterns see `_specialize_search`
+    within_text_value = _within_text_argument(within_text)
+    if not isinstance(within_text_value, str):
+        return within_text_value
+    find_text_value = _find_text_argument(find_text)
+    if not isinstance(find_text_value, str):
+        return find_text_value
+    return _find_in(
+        find_text_value, _search_matcher(find_text_value), within_text_value, start_num
+    )
+
+
+def _specialize_find(constants: Tuple[Any, ...]) -> Union[Callable, None]:
+    find_text_value = _find_text_argument(constants[0])
+    if constants[0] is None or not isinstance(find_text_value, str):
+        return None
+    matcher = _exact_matcher(find_text_value)
+
+    @pure
+    def find_constant(
+        find_text: Union[Token, None],
+        within_text: Union[Token, None],
+        start_num: Union[Token, None],
+    ) -> Token:
+        within_text_value = _within_text_argument(within_text)
+        if not isinstance(within_text_value, str):
+            return within_text_value
+        return _find_in(find_text_value, matcher, within_text_value, start_num)
+
+    return find_constant
+
+
+def _exact_matcher(find_text: str) -> Callable[[str, int], int]:
+    def find_exact(text: str, start: int) -> int:
+        return text.find(find_text, start)
+
+    return find_exact
+
+
+@pure
+@specialize_with(_specialize_find)
+def excel_find(
+    find_text: Union[Token, None],
+    within_text: Union[Token, None],
+    start_num: Union[Token, None],
+) -> Token:
+    # Like SEARCH, but case-sensitive and without wildcards
+    within_text_value = _within_text_argument(within_text)
+    if not isinstance(within_text_value, str):
+        return within_text_value
+    find_text_value = _find_text_argument(find_text)
+    if not isinstance(find_text_value, str):
+        return find_text_value
+    return _find_in(
+        find_text_value, _exact_matcher(find_text_value), within_text_value, start_num
     )
+
+
+@pure
+def excel_left(text: Union[Token, None], num_chars: Union[Token, None]) -> Token:
     if text is None:
         return TokenError(
             TokenErrorTypes.VALUE,
@@ -175,10 +321,8 @@ def excel_left(text: Union[Token, None], num_chars: Union[Token, None]) -> Token
     return TokenString(text_value[0:num_chars_value])
 
 
+@pure
 def excel_right(text: Union[Token, None], num_chars: Union[Token, None]) -> Token:
-    logging.debug(
-        f"excel_lib.excel_right: calling with (text= {text}, num_chars= {num_chars} )"
-    )
     if text is None:
         return TokenError(
             TokenErrorTypes.VALUE,
@@ -240,8 +384,8 @@ def excel_right(text: Union[Token, None], num_chars: Union[Token, None]) -> Toke
     return TokenString(text_value[-num_chars_value:])
 
 
+@pure
 def excel_len(text: Union[Token, None]) -> Token:
-    logging.debug(f"excel_lib.excel_len: calling with (text= {text} )")
     if text is None:
         return TokenError(
             TokenErrorTypes.VALUE,
@@ -271,45 +415,1049 @@ def excel_len(text: Union[Token, None]) -> Token:
     return TokenNumber(len(text_value))
 
 
-DEFAULT_FUNCTIONS: Dict[str, Tuple[Union[List, None], Callable]] = {
-    "NOT(": (
-        [
-            None
-        ],  # default argument list (if None is in the list, that argument is not optional)
-        excel_not,
-    ),
-    "ISERROR(": (
-        [
-            None
-        ],  # default argument list (if None is in the list, that argument is not optional)
-        excel_iserror,
-    ),
-    "SEARCH(": (
-        [
-            TokenString(""),  # find_text
-            None,  # within_text
-            TokenNumber(1),  # start_num <- default: 1
-        ],  # default argument list (if None is in the list, that argument is not optional)
-        excel_search,
-    ),
-    "LEFT(": (
-        [
-            None,  # text <- required
-            TokenNumber(1),  # num_chars <- Optional, default: 1
-        ],  # default argument list (if None is in the list, that argument is not optional)
-        excel_left,
-    ),
-    "RIGHT(": (
-        [
-            None,  # text <- required
-            TokenNumber(1),  # num_chars <- Optional, default: 1
-        ],  # default argument list (if None is in the list, that argument is not optional)
-        excel_right,
-    ),
-    "LEN(": (
-        [
-            None,  # text <- required
-        ],  # default argument list (if None is in the list, that argument is not optional)
-        excel_len,
-    ),
+def _to_logical(token: Union[Token, None]) -> Union[bool, Token]:
+    # Returns the logical value of token, or the error token to propagate
+    if token is None or token.subtype == "EMPTY":
+        return False
+    if token.subtype == "LOGICAL":
+        return bool(token.value)
+    if token.subtype == "NUMBER":
+        return token.value != 0
+    if token.subtype == "ERROR":
+        return token
+    if token.subtype == "TEXT":
+        text_value = token.value.upper()
+        if text_value in ("TRUE", "FALSE"):
+            return text_value == "TRUE"
+    return TokenError(
+        TokenErrorTypes.VALUE,
+        f"Expected logical value and found {token}",
+    )
+
+
+def _branch(token: Union[Token, None]) -> Token:
+    # An empty branch argument (`IF(A1,,1)`) evaluates to 0, as in Excel
+    return TokenNumber(0) if token is None else token
+
+
+@pure
+@lazy
+def excel_if(
+    context: Any,
+    logical_test: Callable[[Any], Union[Token, None]],
+    value_if_true: Callable[[Any], Union[Token, None]],
+    value_if_false: Callable[[Any], Union[Token, None]],
+) -> Token:
+    condition = _to_logical(logical_test(context))
+    if not isinstance(condition, bool):
+        return condition
+    if condition:
+        return _branch(value_if_true(context))
+    return _branch(value_if_false(context))
+
+
+@pure
+@lazy
+def excel_iferror(
+    context: Any,
+    value: Callable[[Any], Union[Token, None]],
+    value_if_error: Callable[[Any], Union[Token, None]],
+) -> Token:
+    result = value(context)
+    if result is not None and result.subtype == "ERROR":
+        return _branch(value_if_error(context))
+    return _branch(result)
+
+
+def _excel_logical_fold(
+    name: str, stop_at: bool, context: Any, args: Tuple[Callable[[Any], Any], ...]
+) -> Token:
+    # Evaluates args in order and stops at the first one whose value is `stop_at`
+    if not args:
+        return TokenError(TokenErrorTypes.VALUE, f"{name} expects at least 1 argument")
+    for arg in args:
+        value = _to_logical(arg(context))
+        if not isinstance(value, bool):
+            return value
+        if value is stop_at:
+            return TokenBool.of(stop_at)
+    return TokenBool.of(not stop_at)
+
+
+@pure
+@lazy
+def excel_and(context: Any, *logicals: Callable[[Any], Union[Token, None]]) -> Token:
+    return _excel_logical_fold("AND", False, context, logicals)
+
+
+@pure
+@lazy
+def excel_or(context: Any, *logicals: Callable[[Any], Union[Token, None]]) -> Token:
+    return _excel_logical_fold("OR", True, context, logicals)
+
+
+@pure
+@lazy
+def excel_choose(
+    context: Any,
+    index_num: Callable[[Any], Union[Token, None]],
+    *values: Callable[[Any], Union[Token, None]],
+) -> Token:
+    index = index_num(context)
+    if index is not None and index.subtype == "ERROR":
+        return index
+    if index is None or index.subtype != "NUMBER" or isinstance(index.value, bool):
+        return TokenError(
+            TokenErrorTypes.VALUE,
+            f"Expected number for index_num argument, but found: {index}",
+        )
+    position = int(index.value)  # Excel truncates a fractional index_num
+    if position < 1 or position > len(values):
+        return TokenError(
+            TokenErrorTypes.VALUE,
+            f"index_num must be between 1 and {len(values)}, but found: {index.value}",
+        )
+    return _branch(values[position - 1](context))
+
+
+def _scalar_number(token: Union[Token, None]) -> Union[float, Token]:
+    # Number of an argument typed directly into an aggregate, or the error to return
+    if token is None or token.subtype == "EMPTY":
+        return 0
+    if token.subtype == "NUMBER":
+        return token.value
+    if token.subtype == "LOGICAL":
+        return 1 if token.value else 0
+    if token.subtype == "ERROR":
+        return token
+    if token.subtype == "TEXT":
+        try:
+            return float(token.value)
+        except ValueError:
+            pass
+    return TokenError(
+        TokenErrorTypes.VALUE,
+        f"Expected number, but found: {token}",
+    )
+
+
+def _aggregate_numbers(
+    name: str, args: Tuple[Union[Token, None], ...]
+) -> Union[Tuple[List[float], List[TokenArray]], Token]:
+    # Splits aggregate arguments into direct numbers and arrays, or returns the error.
+    # Arrays contribute their numeric cells only (text, logical and empty are skipped).
+    if not args:
+        return TokenError(TokenErrorTypes.VALUE, f"{name} expects at least 1 argument")
+    scalars: List[float] = []
+    arrays: List[TokenArray] = []
+    for arg in args:
+        if isinstance(arg, TokenArray):
+            error = arg.first_error()
+            if error is not None:
+                return error
+            arrays.append(arg)
+        else:
+            number = _scalar_number(arg)
+            if isinstance(number, Token):
+                return number
+            scalars.append(number)
+    return scalars, arrays
+
+
+def _array_numbers(array: TokenArray) -> Iterable[float]:
+    # Non-numeric cells store 0.0, so only mixed arrays need to be filtered
+    if array.count(TokenArray.NUMBER) == len(array):
+        return array.numbers
+    return compress(array.numbers, array.mask(TokenArray.NUMBER))
+
+
+def _number_result(value: float) -> Token:
+    if math.isfinite(value):
+        return TokenNumber(value)
+    return TokenError(TokenErrorTypes.NUM, f"Result is not a finite number: {value}")
+
+
+@pure
+@by_reference
+def excel_sum(*args: Union[Token, None]) -> Token:
+    numbers = _aggregate_numbers("SUM", args)
+    if isinstance(numbers, Token):
+        return numbers
+    scalars, arrays = numbers
+    if all(type(number) is int for number in scalars) and not any(
+        a.count(TokenArray.NUMBER) for a in arrays
+    ):
+        # Integers add exactly; keep the int so `SUM(1, 2) & ""` is "3" like `1 + 2`
+        return TokenNumber(sum(scalars))
+    # Non-numeric array cells store 0.0 and do not change the sum
+    return _number_result(math.fsum(chain(scalars, *(a.numbers for a in arrays))))
+
+
+@pure
+@by_reference
+def excel_average(*args: Union[Token, None]) -> Token:
+    numbers = _aggregate_numbers("AVERAGE", args)
+    if isinstance(numbers, Token):
+        return numbers
+    scalars, arrays = numbers
+    count = len(scalars) + sum(a.count(TokenArray.NUMBER) for a in arrays)
+    if count == 0:
+        return TokenError(TokenErrorTypes.ZERO_DIV, "AVERAGE of no numbers")
+    total = math.fsum(chain(scalars, *(a.numbers for a in arrays)))
+    return _number_result(total / count)
+
+
+@pure
+@by_reference
+def excel_min(*args: Union[Token, None]) -> Token:
+    numbers = _aggregate_numbers("MIN", args)
+    if isinstance(numbers, Token):
+        return numbers
+    scalars, arrays = numbers
+    return TokenNumber(min(chain(scalars, *map(_array_numbers, arrays)), default=0))
+
+
+@pure
+@by_reference
+def excel_max(*args: Union[Token, None]) -> Token:
+    numbers = _aggregate_numbers("MAX", args)
+    if isinstance(numbers, Token):
+        return numbers
+    scalars, arrays = numbers
+    return TokenNumber(max(chain(scalars, *map(_array_numbers, arrays)), default=0))
+
+
+@pure
+@by_reference
+def excel_product(*args: Union[Token, None]) -> Token:
+    numbers = _aggregate_numbers("PRODUCT", args)
+    if isinstance(numbers, Token):
+        return numbers
+    scalars, arrays = numbers
+    if not scalars and not any(a.count(TokenArray.NUMBER) for a in arrays):
+        return TokenNumber(0)  # Excel: the product of no numbers is 0
+    return _number_result(math.prod(chain(scalars, *map(_array_numbers, arrays))))
+
+
+@pure
+@by_reference
+def excel_count(*args: Union[Token, None]) -> Token:
+    if not args:
+        return TokenError(TokenErrorTypes.VALUE, "COUNT expects at least 1 argument")
+    count = 0
+    for arg in args:
+        if isinstance(arg, TokenArray):
+            count += arg.count(TokenArray.NUMBER)
+        elif not isinstance(_scalar_number(arg), Token):
+            count += 1  # direct numbers, logicals and numeric text; never errors
+    return TokenNumber(count)
+
+
+@pure
+@by_reference
+def excel_counta(*args: Union[Token, None]) -> Token:
+    if not args:
+        return TokenError(TokenErrorTypes.VALUE, "COUNTA expects at least 1 argument")
+    count = 0
+    for arg in args:
+        if isinstance(arg, TokenArray):
+            count += len(arg) - arg.count(TokenArray.EMPTY)
+        else:
+            count += 1  # every direct argument, errors and empty arguments included
+    return TokenNumber(count)
+
+
+# Per-range indexes, cached in `TokenArray.index_cache` (dropped when the range changes).
+# Cell keys: numbers as floats, text as ("t", casefolded text), logicals as ("b", value),
+# empty cells as None; error cells are not indexed (they never match a criterion).
+
+
+def _cell_key(value: Any) -> Any:
+    if isinstance(value, bool):
+        return ("b", value)
+    if isinstance(value, str):
+        return ("t", value.casefold())
+    return value
+
+
+def _hash_index(array: TokenArray) -> Dict[Any, List[int]]:
+    # Cell key -> row-major indexes of the cells with that key, in order
+    index = array.index_cache.get("hash")
+    if index is None:
+        index = {}
+        kinds = array.kinds
+        numbers = array.numbers
+        for position in range(len(array)):
+            kind = kinds[position]
+            if kind == TokenArray.NUMBER:
+                key: Any = numbers[position]
+            elif kind == TokenArray.ERROR:
+                continue
+            else:
+                key = _cell_key(array.value_at(position))
+            cells = index.get(key)
+            if cells is None:
+                index[key] = [position]
+            else:
+                cells.append(position)
+        array.index_cache["hash"] = index
+    return index
+
+
+def _sorted_index(array: TokenArray) -> Tuple[List[float], List[int]]:
+    # Numeric cells sorted by value: (values, row-major indexes), for bisect
+    index: Any = array.index_cache.get("sorted")
+    if index is None:
+        numbers = array.numbers
+        positions = sorted(
+            compress(range(len(array)), array.mask(TokenArray.NUMBER)),
+            key=numbers.__getitem__,
+        )
+        index = ([numbers[position] for position in positions], positions)
+        array.index_cache["sorted"] = index
+    return index
+
+
+@lru_cache(maxsize=1024)
+def _wildcard_regex(text: str) -> Pattern[str]:
+    # Excel wildcards: `*` any run, `?` any character, `~` escapes the next character
+    parts = []
+    escaped = False
+    for char in text:
+        if escaped:
+            parts.append(re.escape(char))
+            escaped = False
+        elif char == "~":
+            escaped = True
+        elif char == "*":
+            parts.append(".*")
+        elif char == "?":
+            parts.append(".")
+        else:
+            parts.append(re.escape(char))
+    if escaped:
+        parts.append(re.escape("~"))
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
+
+_Criterion = NamedTuple(
+    "_Criterion", [("op", str), ("kind", str), ("operand", Any)]
+)  # kind: "number", "text", "pattern", "logical" or "empty"
+
+_CRITERIA_OPERATORS = ("<=", ">=", "<>", "<", ">", "=")
+
+
+@lru_cache(maxsize=4096)
+def _parse_criterion(subtype: str, value: Any) -> _Criterion:
+    # Criteria are parsed once per distinct (subtype, value), e.g. (TEXT, ">=10")
+    if subtype == "NUMBER":
+        return _Criterion("=", "number", float(value))
+    if subtype == "LOGICAL":
+        return _Criterion("=", "logical", bool(value))
+    if subtype == "EMPTY" or value is None:
+        return _Criterion("=", "number", 0.0)  # an empty criterion cell means 0
+
+    text = str(value)
+    op = "="
+    for candidate in _CRITERIA_OPERATORS:
+        if text.startswith(candidate):
+            op, text = candidate, text[len(candidate) :]
+            break
+    if text == "":
+        return _Criterion(op, "empty", None)
+    try:
+        return _Criterion(op, "number", float(text))
+    except ValueError:
+        pass
+    if text.upper() in ("TRUE", "FALSE"):
+        return _Criterion(op, "logical", text.upper() == "TRUE")
+    if op in ("=", "<>") and re.search(r"[*?~]", text):
+        return _Criterion(op, "pattern", _wildcard_regex(text))
+    return _Criterion(op, "text", text.casefold())
+
+
+_ORDERINGS: Dict[str, Callable[[Any, Any], bool]] = {
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
 }
+
+
+def _criterion_cells(
+    array: TokenArray, criterion: _Criterion
+) -> Tuple[Sequence[int], bool]:
+    # Row-major indexes of the cells matching `criterion`, in no particular order, as
+    # (cells, negated): negated means every cell except `cells`. They are looked up in the
+    # per-range hash and sorted indexes instead of being cached: with a dynamic criterion
+    # (`"<=" & A1` over many rows), one cached set per distinct criterion would grow the
+    # cache of the range quadratically
+    op, kind, operand = criterion
+    index = _hash_index(array)
+    equal: Sequence[int] = ()
+    if kind == "empty":
+        equal = index.get(None, []) + index.get(("t", ""), [])
+    elif kind == "pattern":
+        equal = list(
+            chain.from_iterable(
+                cells
+                for key, cells in index.items()
+                if isinstance(key, tuple)
+                and key[0] == "t"
+                and operand.fullmatch(key[1])
+            )
+        )
+    elif op in ("=", "<>"):
+        key = (
+            operand
+            if kind == "number"
+            else ("b" if kind == "logical" else "t", operand)
+        )
+        equal = index.get(key, ())
+
+    if op == "=":
+        return equal, False
+    if op == "<>":
+        return equal, True
+    if kind == "number":
+        values, positions = _sorted_index(array)
+        if op == "<":
+            return positions[: bisect_left(values, operand)], False
+        if op == "<=":
+            return positions[: bisect_right(values, operand)], False
+        if op == ">":
+            return positions[bisect_right(values, operand) :], False
+        return positions[bisect_left(values, operand) :], False
+    if kind == "empty":
+        return (), False
+    # Text or logical ordering: compare the distinct keys of that kind
+    tag = "b" if kind == "logical" else "t"
+    compare = _ORDERINGS[op]
+    cells = list(
+        chain.from_iterable(
+            cells
+            for key, cells in index.items()
+            if isinstance(key, tuple) and key[0] == tag and compare(key[1], operand)
+        )
+    )
+    return cells, False
+
+
+def _as_array(token: Union[Token, None]) -> TokenArray:
+    if isinstance(token, TokenArray):
+        return token
+    return TokenArray.from_values([[token]])
+
+
+def _matching_cells(
+    name: str,
+    shape: Union[Tuple[int, int], None],
+    pairs: Tuple[Union[Token, None], ...],
+) -> Union[Sequence[int], Token]:
+    # Intersects the cells matching every (criteria_range, criteria) pair
+    if not pairs or len(pairs) % 2:
+        return TokenError(
+            TokenErrorTypes.VALUE,
+            f"{name} expects pairs of criteria_range and criteria arguments",
+        )
+    size = 0
+    matches: List[Sequence[int]] = []
+    excluded: List[Sequence[int]] = []
+    for position in range(0, len(pairs), 2):
+        criteria_range = _as_array(pairs[position])
+        criteria = pairs[position + 1]
+        if isinstance(criteria, TokenArray):
+            criteria = criteria.token_at(0) if len(criteria) else None
+        if criteria is not None and criteria.subtype == "ERROR":
+            return criteria
+        if shape is None:
+            shape = criteria_range.shape
+        elif criteria_range.shape != shape:
+            return TokenError(
+                TokenErrorTypes.VALUE,
+                f"{name} ranges must have the same size, but found {shape} "
+                f"and {criteria_range.shape}",
+            )
+        parsed = _parse_criterion(
+            "EMPTY" if criteria is None else criteria.subtype,
+            None if criteria is None else criteria.value,
+        )
+        cells, negated = _criterion_cells(criteria_range, parsed)
+        (excluded if negated else matches).append(cells)
+        size = len(criteria_range)
+
+    # Filter the smallest match list by the other criteria; the callers sum or count the
+    # cells, so they are not sorted
+    matches.sort(key=len)
+    if matches and not excluded and len(matches) == 1:
+        return matches[0]
+    candidates: Iterable[int] = matches[0] if matches else range(size)
+    others = [frozenset(cells) for cells in matches[1:]]
+    skipped = frozenset(chain.from_iterable(excluded))
+    return [
+        cell
+        for cell in candidates
+        if cell not in skipped and all(cell in other for other in others)
+    ]
+
+
+def _conditional_numbers(
+    name: str, values: Union[Token, None], pairs: Tuple[Union[Token, None], ...]
+) -> Union[Tuple[TokenArray, Sequence[int]], Token]:
+    # Matching cells of `values` (sum/average range), or the error to return
+    value_range = _as_array(values)
+    cells = _matching_cells(name, value_range.shape, pairs)
+    if isinstance(cells, Token):
+        return cells
+    if value_range.first_error() is not None:
+        kinds = value_range.kinds
+        errors = [cell for cell in cells if kinds[cell] == TokenArray.ERROR]
+        if errors:
+            return value_range.value_at(min(errors))  # the first one, row-major
+    return value_range, cells
+
+
+@pure
+def excel_sumifs(sum_range: Union[Token, None], *criteria: Union[Token, None]) -> Token:
+    matched = _conditional_numbers("SUMIFS", sum_range, criteria)
+    if isinstance(matched, Token):
+        return matched
+    value_range, cells = matched
+    numbers = value_range.numbers  # non-numeric cells hold 0.0
+    return _number_result(math.fsum(map(numbers.__getitem__, cells)))
+
+
+@pure
+def excel_averageifs(
+    average_range: Union[Token, None], *criteria: Union[Token, None]
+) -> Token:
+    matched = _conditional_numbers("AVERAGEIFS", average_range, criteria)
+    if isinstance(matched, Token):
+        return matched
+    value_range, cells = matched
+    if value_range.count(TokenArray.NUMBER) != len(value_range):
+        kinds = value_range.kinds
+        cells = [cell for cell in cells if kinds[cell] == TokenArray.NUMBER]
+    if not cells:
+        return TokenError(TokenErrorTypes.ZERO_DIV, "AVERAGEIFS matched no numbers")
+    numbers = value_range.numbers
+    return _number_result(math.fsum(map(numbers.__getitem__, cells)) / len(cells))
+
+
+@pure
+def excel_countifs(*criteria: Union[Token, None]) -> Token:
+    cells = _matching_cells("COUNTIFS", None, criteria)
+    if isinstance(cells, Token):
+        return cells
+    return TokenNumber(len(cells))
+
+
+# Lookup indexes work on one line of a range: a column (axis 0) or a row (axis 1).
+# They are cached in `TokenArray.index_cache` like the criteria indexes.
+
+
+def _line(array: TokenArray, axis: int, number: int) -> range:
+    # Row-major cell indexes of column/row `number`
+    if axis == 0:
+        return range(number, len(array), array.cols)
+    start = number * array.cols
+    return range(start, start + array.cols)
+
+
+def _line_exact_index(
+    array: TokenArray, axis: int, number: int, last: bool
+) -> Dict[Any, int]:
+    # Cell key -> first (or last) position along the line
+    cache_key = ("lookup", axis, number, last)
+    index = array.index_cache.get(cache_key)
+    if index is None:
+        index = {}
+        kinds = array.kinds
+        for position, cell in enumerate(_line(array, axis, number)):
+            if kinds[cell] == TokenArray.ERROR:
+                continue
+            key = _cell_key(array.value_at(cell))
+            if last or key not in index:
+                index[key] = position
+        array.index_cache[cache_key] = index
+    return index  # type: ignore[no-any-return]
+
+
+def _line_sorted_index(
+    array: TokenArray, axis: int, number: int, tag: str
+) -> Tuple[List[Any], List[int]]:
+    # Keys of one kind ("n", "t" or "b") sorted by (key, position): (keys, positions)
+    cache_key = ("lookup-sorted", axis, number, tag)
+    index: Any = array.index_cache.get(cache_key)
+    if index is None:
+        entries = []
+        kinds = array.kinds
+        for position, cell in enumerate(_line(array, axis, number)):
+            if kinds[cell] in (TokenArray.ERROR, TokenArray.EMPTY):
+                continue
+            key = _cell_key(array.value_at(cell))
+            if _key_tag(key) == tag:
+                entries.append((key if tag == "n" else key[1], position))
+        entries.sort()
+        index = ([key for key, _ in entries], [position for _, position in entries])
+        array.index_cache[cache_key] = index
+    return index  # type: ignore[no-any-return]
+
+
+def _key_tag(key: Any) -> str:
+    return key[0] if isinstance(key, tuple) else "n"
+
+
+def _lookup_key(token: Union[Token, None]) -> Union[Any, Token]:
+    # Cell key of a lookup value, or the error to return
+    if isinstance(token, TokenArray):
+        token = token.token_at(0) if len(token) else None
+    if token is None or token.subtype == "EMPTY":
+        return TokenError(TokenErrorTypes.NA, "Lookup value is empty")
+    if token.subtype == "ERROR":
+        return token
+    if token.subtype == "NUMBER":
+        return float(token.value)
+    if token.subtype in ("TEXT", "LOGICAL"):
+        return _cell_key(token.value)
+    return TokenError(TokenErrorTypes.VALUE, f"Unsupported lookup value: {token}")
+
+
+def _find(
+    array: TokenArray,
+    axis: int,
+    number: int,
+    key: Any,
+    mode: int,
+    last: bool = False,
+    wildcards: bool = True,
+) -> int:
+    """
+    Position of `key` along a line, or -1.
+
+    mode 0: exact match (text may use wildcards, unless `wildcards` is False); -1: exact
+    match or else the largest smaller value; 1: exact match or else the smallest larger
+    value; 2: wildcard match. Among equal values the first position is returned (the last
+    one with `last`).
+    """
+    exact = _line_exact_index(array, axis, number, last)
+    tag = _key_tag(key)
+    if tag == "t" and (
+        mode == 2 or (mode == 0 and wildcards and re.search(r"[*?~]", key[1]))
+    ):
+        pattern = _wildcard_regex(key[1])
+        positions = [
+            position
+            for candidate, position in exact.items()
+            if _key_tag(candidate) == "t" and pattern.fullmatch(candidate[1])
+        ]
+        if not positions:
+            return -1
+        return max(positions) if last else min(positions)
+
+    position = exact.get(key)
+    if position is not None or mode in (0, 2):
+        return -1 if position is None else position
+
+    keys, positions = _line_sorted_index(array, axis, number, tag)
+    operand = key if tag == "n" else key[1]
+    if mode < 0:
+        found = bisect_left(keys, operand) - 1  # largest smaller value
+    else:
+        found = bisect_right(keys, operand)  # smallest larger value
+    if found < 0 or found >= len(keys):
+        return -1
+    # Equal neighbours: report the first (or last) position of that value
+    value = keys[found]
+    if last:
+        return positions[bisect_right(keys, value) - 1]
+    return positions[bisect_left(keys, value)]
+
+
+def _approximate_match(array: TokenArray, axis: int, number: int, key: Any) -> int:
+    # VLOOKUP/HLOOKUP/MATCH approximate mode: the largest value <= key (last of ties)
+    tag = _key_tag(key)
+    keys, positions = _line_sorted_index(array, axis, number, tag)
+    found = bisect_right(keys, key if tag == "n" else key[1]) - 1
+    return -1 if found < 0 else positions[found]
+
+
+def _integer_argument(token: Union[Token, None], name: str) -> Union[int, Token]:
+    if token is not None and token.subtype == "ERROR":
+        return token
+    if token is None or token.subtype != "NUMBER" or isinstance(token.value, bool):
+        return TokenError(
+            TokenErrorTypes.VALUE,
+            f"Expected number for {name} argument, but found: {token}",
+        )
+    return int(token.value)  # Excel truncates fractional positions
+
+
+def _flag_argument(token: Union[Token, None], name: str) -> Union[bool, Token]:
+    # An empty argument is FALSE, errors propagate
+    value = _to_logical(token)
+    if isinstance(value, bool) or value.subtype == "ERROR":
+        return value
+    return TokenError(
+        TokenErrorTypes.VALUE, f"Expected logical for {name} argument: {token}"
+    )
+
+
+def _not_found(lookup_value: Union[Token, None]) -> Token:
+    return TokenError(TokenErrorTypes.NA, f"Value not found: {lookup_value}")
+
+
+def _table_lookup(
+    axis: int,
+    lookup_value: Union[Token, None],
+    table: Union[Token, None],
+    index_num: Union[Token, None],
+    range_lookup: Union[Token, None],
+) -> Token:
+    # VLOOKUP (axis 0: search the first column) and HLOOKUP (axis 1: the first row)
+    key = _lookup_key(lookup_value)
+    if isinstance(key, Token):
+        return key
+    table_array = _as_array(table)
+    offset = _integer_argument(index_num, "index_num")
+    if isinstance(offset, Token):
+        return offset
+    approximate = _flag_argument(range_lookup, "range_lookup")
+    if isinstance(approximate, Token):
+        return approximate
+    size = table_array.cols if axis == 0 else table_array.rows
+    if offset < 1:
+        return TokenError(TokenErrorTypes.VALUE, f"index_num must be >= 1: {offset}")
+    if offset > size:
+        return TokenError(
+            TokenErrorTypes.REF, f"index_num {offset} is outside the table"
+        )
+
+    if approximate:
+        position = _approximate_match(table_array, axis, 0, key)
+    else:
+        position = _find(table_array, axis, 0, key, 0)
+    if position < 0:
+        return _not_found(lookup_value)
+    if axis == 0:
+        return table_array.token(position, offset - 1)
+    return table_array.token(offset - 1, position)
+
+
+@pure
+def excel_vlookup(
+    lookup_value: Union[Token, None],
+    table_array: Union[Token, None],
+    col_index_num: Union[Token, None],
+    range_lookup: Union[Token, None],
+) -> Token:
+    return _table_lookup(0, lookup_value, table_array, col_index_num, range_lookup)
+
+
+@pure
+def excel_hlookup(
+    lookup_value: Union[Token, None],
+    table_array: Union[Token, None],
+    row_index_num: Union[Token, None],
+    range_lookup: Union[Token, None],
+) -> Token:
+    return _table_lookup(1, lookup_value, table_array, row_index_num, range_lookup)
+
+
+def _vector_axis(array: TokenArray) -> Union[int, None]:
+    # Lookup vectors are a single column (axis 0) or a single row (axis 1)
+    if array.cols == 1:
+        return 0
+    if array.rows == 1:
+        return 1
+    return None
+
+
+@pure
+def excel_match(
+    lookup_value: Union[Token, None],
+    lookup_array: Union[Token, None],
+    match_type: Union[Token, None],
+) -> Token:
+    key = _lookup_key(lookup_value)
+    if isinstance(key, Token):
+        return key
+    vector = _as_array(lookup_array)
+    axis = _vector_axis(vector)
+    if axis is None:
+        return TokenError(TokenErrorTypes.NA, "lookup_array must be one row or column")
+    mode = _integer_argument(match_type, "match_type")
+    if isinstance(mode, Token):
+        return mode
+
+    if mode == 0:
+        position = _find(vector, axis, 0, key, 0)
+    elif mode > 0:
+        position = _approximate_match(vector, axis, 0, key)
+    else:
+        # Descending data: the smallest value >= key (exact matches included)
+        position = _find(vector, axis, 0, key, 1)
+    if position < 0:
+        return _not_found(lookup_value)
+    return TokenNumber(position + 1)
+
+
+def _take(array: TokenArray, axis: int, position: int) -> Token:
+    # Cell (or whole row/column across `axis`) of `array` at `position`
+    if axis == 0:
+        if array.cols == 1:
+            return array.token(position, 0)
+        cells = [array.token(position, col) for col in range(array.cols)]
+        return TokenArray.from_values([cells])
+    if array.rows == 1:
+        return array.token(0, position)
+    return TokenArray.column([array.token(row, position) for row in range(array.rows)])
+
+
+@pure
+def excel_xlookup(
+    lookup_value: Union[Token, None],
+    lookup_array: Union[Token, None],
+    return_array: Union[Token, None],
+    if_not_found: Union[Token, None],
+    match_mode: Union[Token, None],
+    search_mode: Union[Token, None],
+) -> Token:
+    key = _lookup_key(lookup_value)
+    if isinstance(key, Token):
+        return key
+    vector = _as_array(lookup_array)
+    results = _as_array(return_array)
+    axis = _vector_axis(vector)
+    if axis is None:
+        return TokenError(
+            TokenErrorTypes.VALUE, "lookup_array must be one row or column"
+        )
+    if (results.rows if axis == 0 else results.cols) != len(vector):
+        return TokenError(
+            TokenErrorTypes.VALUE,
+            "return_array must have as many cells as lookup_array along the lookup",
+        )
+    mode = _integer_argument(match_mode, "match_mode")
+    if isinstance(mode, Token):
+        return mode
+    direction = _integer_argument(search_mode, "search_mode")
+    if isinstance(direction, Token):
+        return direction
+    if mode not in (-1, 0, 1, 2) or direction not in (-2, -1, 1, 2):
+        return TokenError(
+            TokenErrorTypes.VALUE,
+            f"Unsupported match_mode {mode} or search_mode {direction}",
+        )
+
+    # Binary search modes (+/-2) give the same result on the indexes. Unlike VLOOKUP,
+    # HLOOKUP and MATCH, XLOOKUP only uses wildcards in match_mode 2
+    position = _find(vector, axis, 0, key, mode, last=direction < 0, wildcards=False)
+    if position < 0:
+        if if_not_found is not None and if_not_found.subtype != "EMPTY":
+            return if_not_found
+        return _not_found(lookup_value)
+    return _take(results, axis, position)
+
+
+@pure
+def excel_index(
+    array: Union[Token, None],
+    row_num: Union[Token, None],
+    column_num: Union[Token, None],
+) -> Token:
+    table = _as_array(array)
+    row = _integer_argument(row_num, "row_num")
+    if isinstance(row, Token):
+        return row
+    if column_num is None or column_num.subtype == "EMPTY":
+        if table.rows == 1 and table.cols > 1:
+            row, column = 1, row  # INDEX(row_vector, n) picks the n-th column
+        else:
+            column = 0 if table.cols > 1 else 1
+    else:
+        column_value = _integer_argument(column_num, "column_num")
+        if isinstance(column_value, Token):
+            return column_value
+        column = column_value
+    if row < 0 or column < 0:
+        return TokenError(TokenErrorTypes.VALUE, "row_num and column_num must be >= 0")
+    if row > table.rows or column > table.cols:
+        return TokenError(
+            TokenErrorTypes.REF,
+            f"({row}, {column}) is outside a {table.rows}x{table.cols} range",
+        )
+
+    if row and column:
+        return table.token(row - 1, column - 1)
+    if row:
+        return _take(table, 0, row - 1)  # whole row
+    if column:
+        return _take(table, 1, column - 1)  # whole column
+    return table
+
+
+DEFAULT_FUNCTIONS: Dict[str, Tuple[Union[List, None], Callable]] = RegistryDict(
+    {
+        "NOT(": (
+            [
+                None
+            ],  # default argument list (if None is in the list, that argument is not optional)
+            excel_not,
+        ),
+        "ISERROR(": (
+            [
+                None
+            ],  # default argument list (if None is in the list, that argument is not optional)
+            excel_iserror,
+        ),
+        "SEARCH(": (
+            [
+                TokenString(""),  # find_text
+                None,  # within_text
+                TokenNumber(1),  # start_num <- default: 1
+            ],  # default argument list (if None is in the list, that argument is not optional)
+            excel_search,
+        ),
+        "FIND(": (
+            [
+                None,  # find_text <- required
+                None,  # within_text <- required
+                TokenNumber(1),  # start_num <- default: 1
+            ],  # default argument list (if None is in the list, that argument is not optional)
+            excel_find,
+        ),
+        "LEFT(": (
+            [
+                None,  # text <- required
+                TokenNumber(1),  # num_chars <- Optional, default: 1
+            ],  # default argument list (if None is in the list, that argument is not optional)
+            excel_left,
+        ),
+        "RIGHT(": (
+            [
+                None,  # text <- required
+                TokenNumber(1),  # num_chars <- Optional, default: 1
+            ],  # default argument list (if None is in the list, that argument is not optional)
+            excel_right,
+        ),
+        "LEN(": (
+            [
+                None,  # text <- required
+            ],  # default argument list (if None is in the list, that argument is not optional)
+            excel_len,
+        ),
+        "IF(": (
+            [
+                None,  # logical_test <- required
+                None,  # value_if_true <- required
+                TOKEN_FALSE,  # value_if_false <- Optional, default: FALSE
+            ],  # arguments are passed lazily, untaken branches are never evaluated
+            excel_if,
+        ),
+        "IFERROR(": (
+            [
+                None,  # value <- required
+                None,  # value_if_error <- required
+            ],  # arguments are passed lazily, value_if_error only evaluated on error
+            excel_iferror,
+        ),
+        "AND(": (
+            None,  # variadic, evaluation stops at the first FALSE
+            excel_and,
+        ),
+        "OR(": (
+            None,  # variadic, evaluation stops at the first TRUE
+            excel_or,
+        ),
+        "CHOOSE(": (
+            None,  # variadic, only the chosen value is evaluated
+            excel_choose,
+        ),
+        "SUM(": (
+            None,  # variadic: numbers and ranges (text, logical and empty cells skipped)
+            excel_sum,
+        ),
+        "COUNT(": (
+            None,  # variadic
+            excel_count,
+        ),
+        "COUNTA(": (
+            None,  # variadic
+            excel_counta,
+        ),
+        "AVERAGE(": (
+            None,  # variadic
+            excel_average,
+        ),
+        "MIN(": (
+            None,  # variadic
+            excel_min,
+        ),
+        "MAX(": (
+            None,  # variadic
+            excel_max,
+        ),
+        "PRODUCT(": (
+            None,  # variadic
+            excel_product,
+        ),
+        "SUMIFS(": (
+            None,  # sum_range, then pairs of criteria_range, criteria
+            excel_sumifs,
+        ),
+        "COUNTIFS(": (
+            None,  # pairs of criteria_range, criteria
+            excel_countifs,
+        ),
+        "AVERAGEIFS(": (
+            None,  # average_range, then pairs of criteria_range, criteria
+            excel_averageifs,
+        ),
+        "VLOOKUP(": (
+            [
+                None,  # lookup_value <- required
+                None,  # table_array <- required
+                None,  # col_index_num <- required
+                TOKEN_TRUE,  # range_lookup <- Optional, default: TRUE (approximate)
+            ],
+            excel_vlookup,
+        ),
+        "HLOOKUP(": (
+            [
+                None,  # lookup_value <- required
+                None,  # table_array <- required
+                None,  # row_index_num <- required
+                TOKEN_TRUE,  # range_lookup <- Optional, default: TRUE (approximate)
+            ],
+            excel_hlookup,
+        ),
+        "MATCH(": (
+            [
+                None,  # lookup_value <- required
+                None,  # lookup_array <- required
+                TokenNumber(1),  # match_type <- Optional, default: 1
+            ],
+            excel_match,
+        ),
+        "XLOOKUP(": (
+            [
+                None,  # lookup_value <- required
+                None,  # lookup_array <- required
+                None,  # return_array <- required
+                TOKEN_EMPTY,  # if_not_found <- Optional, default: #N/A
+                TokenNumber(0),  # match_mode <- Optional, default: 0 (exact)
+                TokenNumber(1),  # search_mode <- Optional, default: 1 (first to last)
+            ],
+            excel_xlookup,
+        ),
+        "INDEX(": (
+            [
+                None,  # array <- required
+                None,  # row_num <- required
+                TOKEN_EMPTY,  # column_num <- Optional
+            ],
+            excel_index,
+        ),
+    }
+)
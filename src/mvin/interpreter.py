@@ -1,19 +1,47 @@
+import asyncio
+import inspect
 import logging
+import threading
 import typing
-from collections import deque
+from collections import OrderedDict, deque
 from types import MappingProxyType
-from typing import Any, Callable, Dict, List, Mapping, Sequence, Set, Tuple, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    NamedTuple,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 import mvin.excel_ops as _  # noqa
 from mvin import (
     REGISTERED_OPS,
+    FunctionRegistry,
+    OperatorRegistry,
+    Registry,
+    RegistryDict,
     Token,
+    TokenArray,
     TokenError,
     TokenErrorTypes,
     TokenFunc,
     TokenNumber,
+    get_specializer,
+    is_by_reference,
+    is_lazy,
+    is_pure,
 )
 from mvin.functions.excel_lib import DEFAULT_FUNCTIONS
+from mvin.profiling import ProfileStats, _profiled
+from mvin.providers import LazyInputs
+from mvin.raw import _raw_infix, _raw_prefix, box, unbox
+from mvin.raw import _result as raw_result
+from mvin.tracing import TraceObserver
 
 # Operator precedence and associativity
 OPERATORS: Mapping[str, Tuple[Union[int, float], str]] = MappingProxyType(
@@ -44,6 +72,10 @@ UNARY_OPERATORS: Mapping[str, Tuple[Union[int, float], str]] = MappingProxyType(
 )
 
 
+# Error tokens are immutable, so the division-by-zero result is shared
+_DIV_ZERO = TokenError(TokenErrorTypes.ZERO_DIV, "Division by zero.")
+
+
 def _operator_key(token: Token) -> str:
     if token.type == "OPERATOR-PREFIX":
         return f"u{token.value}"
@@ -58,437 +90,1724 @@ def _operator_meta(operator_key: str) -> Tuple[Union[int, float], str]:
     raise KeyError(f"Unknown operator key: {operator_key}")
 
 
-def get_interpreter(
-    tokens: Sequence[Token],  # enumerable
-    proposed_functions: Dict[
-        str, Tuple[Union[List, None], Callable]
-    ] = DEFAULT_FUNCTIONS,
-    registered_ops: Dict[str, Callable[[Token, Token], Token]] = REGISTERED_OPS,
-) -> Union[Callable[[Dict[str, Any]], Any], None]:
-    if isinstance(tokens, Sequence):
-        ops = MappingProxyType(dict(registered_ops))
-
-        copied_functions: Dict[str, Tuple[Union[List, None], Callable]] = {}
-        for func_name, (defaults, func_callable) in dict(proposed_functions).items():
-            copied_defaults = list(defaults) if defaults is not None else None
-            copied_functions[func_name] = (copied_defaults, func_callable)
-        functions = MappingProxyType(copied_functions)
-
-        def infix_to_rpn(
-            tokens: Sequence[Token],  # tokens from the tokenizer
-            functions: Mapping[str, Tuple[Union[List, None], Callable]],
-        ) -> Tuple[List[Union[Token, int, None]], Set[str]]:
-            """
-            Convert an infix expression to Reverse Polish Notation (RPN).
-
-                Args:
-                    tokens (list): A list of tokens representing the infix expression.
-
-                Returns:
-                    list: A list of tokens in Reverse Polish Notation (RPN).
-
-                Raises:
-                    SyntaxError: If there are syntax errors in the infix expression.
-
-                The function processes the input tokens and converts them to RPN format.
-                It handles operators, operands, parentheses, and functions, ensuring proper
-                syntax and operator precedence. The function uses two stacks to manage
-                operators and argument counts, and includes detailed error handling to
-                provide informative messages for various syntax issues.
-            """
-            output: List[Union[Token, int, None]] = []
-            op_stack: deque[Token] = deque()
-            arg_stack: deque[int] = (
-                deque()
-            )  # Keeps track of argument counts for nested function calls
-            open_parens = 0
-
-            inputs: Set[str] = set()
-
-            filtered_tokens = [x for x in tokens if x is None or x.type != "WHITE-SPACE"]
-
-            for i, token in enumerate(filtered_tokens):
-                prev_token = filtered_tokens[i - 1] if i > 0 else None
-                logging.debug(
-                    f"--------\noutput: {output}\nop_stack: {op_stack}\narg_count: {arg_stack}\ntoken: {token}"
+def _infix_to_rpn(
+    tokens: Sequence[Token],  # tokens from the tokenizer
+    functions: Mapping[str, Tuple[Union[Sequence, None], Callable]],
+    observer: Union[TraceObserver, None] = None,
+) -> Tuple[List[Union[Token, int, None]], Set[str]]:
+    """
+    Convert an infix expression to Reverse Polish Notation (RPN).
+
+        Args:
+            tokens (list): A list of tokens representing the infix expression.
+
+        Returns:
+            list: A list of tokens in Reverse Polish Notation (RPN).
+
+        Raises:
+            SyntaxError: If there are syntax errors in the infix expression.
+
+        The function processes the input tokens and converts them to RPN format.
+        It handles operators, operands, parentheses, and functions, ensuring proper
+        syntax and operator precedence. The function uses two stacks to manage
+        operators and argument counts, and includes detailed error handling to
+        provide informative messages for various syntax issues.
+    """
+    output: List[Union[Token, int, None]] = []
+    op_stack: deque[Token] = deque()
+    arg_stack: deque[int] = (
+        deque()
+    )  # Keeps track of argument counts for nested function calls
+    open_parens = 0
+
+    inputs: Set[str] = set()
+
+    filtered_tokens = [x for x in tokens if x is None or x.type != "WHITE-SPACE"]
+
+    for i, token in enumerate(filtered_tokens):
+        prev_token = filtered_tokens[i - 1] if i > 0 else None
+        if observer is not None:
+            observer.token_consumed(i, token)
+        if token is None:
+            raise SyntaxError(f"Unexpected None value found at position {i}.")
+        if token.type == "OPERAND":
+            output.append(token)
+
+            if token.subtype == "RANGE":
+                inputs.add(token.value)
+
+        elif token.type == "FUNC" and token.subtype == "OPEN":
+            func_name = token.value
+            if func_name not in functions:
+                raise SyntaxError(
+                    f"Unsupported function `{token.value}` at position {i}."
                 )
-                if token is None:
-                    raise SyntaxError(f"Unexpected None value found at position {i}.")
-                if token.type == "OPERAND":
-                    output.append(token)
+            # op_stack.append(func_name)
+            op_stack.append(token)
+            arg_stack.append(
+                1
+            )  # Start with one argument for this instance of the function
 
-                    if token.subtype == "RANGE":
-                        inputs.add(token.value)
+            op_stack.append(TokenFunc("("))
+            open_parens += 1
 
-                elif token.type == "FUNC" and token.subtype == "OPEN":
-                    func_name = token.value
-                    if func_name not in functions:
-                        raise SyntaxError(
-                            f"Unsupported function `{token.value}` at position {i}."
-                        )
-                    # op_stack.append(func_name)
-                    op_stack.append(token)
-                    arg_stack.append(
-                        1
-                    )  # Start with one argument for this instance of the function
+        elif token.value == "(":  # Left parenthesis
+            if prev_token and prev_token.type == "OPERAND":
+                raise SyntaxError(f"Missing operator before '(' at position {i}.")
+            op_stack.append(token)
+            open_parens += 1
 
-                    op_stack.append(TokenFunc("("))
-                    open_parens += 1
+        elif token.value == ")":  # Right parenthesis
+            open_parens -= 1
+            if open_parens < 0:
+                raise SyntaxError(
+                    f"Unexpected `)` at position {i} (too many closing parentheses)."
+                )
 
-                elif token.value == "(":  # Left parenthesis
-                    if prev_token and prev_token.type == "OPERAND":
-                        raise SyntaxError(
-                            f"Missing operator before '(' at position {i}."
-                        )
-                    op_stack.append(token)
-                    open_parens += 1
+            # Ensure trailing empty argument handling
+            last_token = prev_token
+            if last_token:
+                if last_token.type == "FUNC" and last_token.subtype == "OPEN":
+                    arg_stack[-1] = 0
 
-                elif token.value == ")":  # Right parenthesis
-                    open_parens -= 1
-                    if open_parens < 0:
+                elif last_token.value == ",":
+                    output.append(None)  # Handle missing last argument
+
+            while op_stack and op_stack[-1].value != "(":
+                output.append(op_stack.pop())
+
+            if not op_stack:
+                raise SyntaxError(f"Unmatched `)` at position {i}.")
+            paren = op_stack.pop()  # Remove '('
+
+            # Only the `(` pushed with a function closes its call; a parenthesized
+            # argument like `MIN(1, (A1 - 2))` leaves the call open
+            if paren.type == "FUNC" and op_stack and op_stack[-1].type == "FUNC":
+                #!!! DESIGN DECISION
+                #
+                # Support closing parenthesis, even when is not of type='FUNC' --> display warning
+                if token.type != "FUNC":
+                    logging.warning(
+                        f"Expected token of type:`FUNC` and subtype:`CLOSE`, but found token of type:`{token.type}`"
+                    )
+                func = op_stack.pop()
+                func_name = func.value
+                arg_count = arg_stack.pop()  # Use dynamic argument count
+
+                #!!! DESIGN DECISION
+                #
+                # arg_count full validation: We are filling the missing part of the arguments
+                #
+                required_args, _ = functions[func_name]
+                if required_args is not None:
+                    required_args_count = len(required_args)
+
+                    if required_args_count < arg_count:
                         raise SyntaxError(
-                            f"Unexpected `)` at position {i} (too many closing parentheses)."
+                            f"Function `{func_name}` expects {required_args_count} arguments but got {arg_count}."
                         )
 
-                    # Ensure trailing empty argument handling
-                    last_token = prev_token
-                    logging.debug(f"last_token: {last_token}")
-                    if last_token:
-                        if last_token.type == "FUNC" and last_token.subtype == "OPEN":
-                            arg_stack[-1] = 0
-
-                        elif last_token.value == ",":
-                            output.append(None)  # Handle missing last argument
-
-                    while op_stack and op_stack[-1].value != "(":
-                        output.append(op_stack.pop())
-
-                    if not op_stack:
-                        raise SyntaxError(f"Unmatched `)` at position {i}.")
-                    op_stack.pop()  # Remove '('
-
-                    if op_stack and op_stack[-1].type == "FUNC":
-                        #!!! DESIGN DECISION
-                        #
-                        # Support closing parenthesis, even when is not of type='FUNC' --> display warning
-                        if token.type != "FUNC":
-                            logging.warning(
-                                f"Expected token of type:`FUNC` and subtype:`CLOSE`, but found token of type:`{token.type}`"
+                    # copy defaults to stack if not None
+                    # print(
+                    #     f" --> arg_count:{arg_count} required_args_count:{required_args_count}"
+                    # )
+                    arg_index = arg_count
+                    while arg_index < required_args_count:
+                        default_arg = required_args[arg_index]
+                        # print(
+                        #     f"   --> arg_index:{arg_index} default_arg: {default_arg}"
+                        # )
+                        if default_arg is not None:
+                            output.append(default_arg)
+                        else:
+                            raise SyntaxError(
+                                f"Missing required argument at {arg_index} for function `{func_name}`"
                             )
-                        func = op_stack.pop()
-                        func_name = func.value
-                        arg_count = arg_stack.pop()  # Use dynamic argument count
-
-                        #!!! DESIGN DECISION
-                        #
-                        # arg_count full validation: We are filling the missing part of the arguments
-                        #
-                        required_args, _ = functions[func_name]
-                        if required_args is not None:
-                            required_args_count = len(required_args)
-
-                            if required_args_count < arg_count:
-                                raise SyntaxError(
-                                    f"Function `{func_name}` expects {required_args_count} arguments but got {arg_count}."
-                                )
+                        arg_index += 1
+                    arg_count = required_args_count
 
-                            # copy defaults to stack if not None
-                            # print(
-                            #     f" --> arg_count:{arg_count} required_args_count:{required_args_count}"
-                            # )
-                            arg_index = arg_count
-                            while arg_index < required_args_count:
-                                default_arg = required_args[arg_index]
-                                # print(
-                                #     f"   --> arg_index:{arg_index} default_arg: {default_arg}"
-                                # )
-                                if default_arg is not None:
-                                    output.append(default_arg)
-                                else:
-                                    raise SyntaxError(
-                                        f"Missing required argument at {arg_index} for function `{func_name}`"
-                                    )
-                                arg_index += 1
-                            arg_count = required_args_count
-
-                        #!!! DESIGN DECISION
-                        #
-                        # There are 2 ways to go to correct the arg_count bug:
-                        #  - Use the stack to store the arg_count:
-                        #    * append the arg_count first as int (and in the execute part, read it from stack)
-                        #    * append the TokenFunc
-                        #
-                        #    > This option pollutes the stack by mixing types
-                        #    > There is a possibility to have more dynamic variable arguments calling by putting
-                        #      the value in the stack
-                        #
-                        #  - Use the output to store the arg_count and read it directly when execute
-                        #    * appent the TokenFunc
-                        #    * append the arg_count as int (and read it just after the TokenFunc, and it will never reach the Token evaluation)
-                        #
-                        #    > This options requires an additional index to track the rpn_tokens' position
-                        #
-                        #  I preferred the non pullution version (the second one)
-
-                        # output.append(TokenFunc(func_name))
-                        output.append(func)
-                        output.append(arg_count)
-
-                elif token.type == "OPERATOR-PREFIX":
-                    if token.value not in ("+", "-"):
-                        raise SyntaxError(
-                            f"Unsupported unary operator `{token.value}` at position {i}."
+                #!!! DESIGN DECISION
+                #
+                # There are 2 ways to go to correct the arg_count bug:
+                #  - Use the stack to store the arg_count:
+                #    * append the arg_count first as int (and in the execute part, read it from stack)
+                #    * append the TokenFunc
+                #
+                #    > This option pollutes the stack by mixing types
+                #    > There is a possibility to have more dynamic variable arguments calling by putting
+                #      the value in the stack
+                #
+                #  - Use the output to store the arg_count and read it directly when execute
+                #    * appent the TokenFunc
+                #    * append the arg_count as int (and read it just after the TokenFunc, and it will never reach the Token evaluation)
+                #
+                #    > This options requires an additional index to track the rpn_tokens' position
+                #
+                #  I preferred the non pullution version (the second one)
+
+                # output.append(TokenFunc(func_name))
+                output.append(func)
+                output.append(arg_count)
+
+        elif token.type == "OPERATOR-PREFIX":
+            if token.value not in ("+", "-"):
+                raise SyntaxError(
+                    f"Unsupported unary operator `{token.value}` at position {i}."
+                )
+            if prev_token and (
+                prev_token.type == "OPERAND"
+                or prev_token.value == ")"
+                or (prev_token.type == "FUNC" and prev_token.subtype == "CLOSE")
+            ):
+                raise SyntaxError(
+                    f"Unexpected unary operator `{token}` at position {i}."
+                )
+            op_stack.append(token)
+
+        elif token.type == "OPERATOR-INFIX":
+            if i == 0 or (
+                prev_token
+                and (
+                    (
+                        prev_token.type == "OPERATOR-INFIX"
+                        and prev_token.value != ")"
+                        and prev_token.subtype != "CLOSE"
+                    )
+                    or prev_token.type == "OPERATOR-PREFIX"
+                    or prev_token.value == "("
+                )
+            ):
+                raise SyntaxError(f"Unexpected operator `{token}` at position {i}.")
+            token_key = _operator_key(token)
+            if token_key in OPERATORS or token_key in UNARY_OPERATORS:
+                token_prec, token_assoc = _operator_meta(token_key)
+                while (
+                    op_stack
+                    and (
+                        _operator_key(op_stack[-1]) in OPERATORS
+                        or _operator_key(op_stack[-1]) in UNARY_OPERATORS
+                    )
+                    and (
+                        (
+                            token_assoc == "L"
+                            and token_prec
+                            <= _operator_meta(_operator_key(op_stack[-1]))[0]
                         )
-                    if prev_token and (
-                        prev_token.type == "OPERAND"
-                        or prev_token.value == ")"
                         or (
-                            prev_token.type == "FUNC"
-                            and prev_token.subtype == "CLOSE"
+                            token_assoc == "R"
+                            and token_prec
+                            < _operator_meta(_operator_key(op_stack[-1]))[0]
                         )
-                    ):
-                        raise SyntaxError(
-                            f"Unexpected unary operator `{token}` at position {i}."
+                    )
+                ):
+                    output.append(op_stack.pop())  # TODO Improve test coverage
+            op_stack.append(token)
+
+        elif token.type == "SEP" and token.subtype == "ARG":  # token.value == ',':
+            if prev_token is None:
+                raise SyntaxError(f"Unexpected separator `{token}` at position {i}.")
+
+            if prev_token.subtype == "OPEN" or prev_token.value == ",":
+                output.append(None)  # Handle missing argument
+
+            while op_stack and op_stack[-1].value != "(":
+                output.append(op_stack.pop())
+
+            if not arg_stack:
+                raise SyntaxError(f"Unexpected separator `{token}` at position {i}.")
+            arg_stack[-1] += 1  # Increase count for the current function call
+
+        # elif token.type == "WHITE-SPACE":
+        #     pass
+
+        else:
+            raise SyntaxError(f"Unrecognized token `{token}` at position {i}.")
+
+    if open_parens > 0:
+        raise SyntaxError("Unmatched `(` (missing closing parenthesis).")
+
+    while op_stack:
+        if op_stack[-1].value == "(":
+            raise SyntaxError("Unmatched `(` in expression.")
+        output.append(op_stack.pop())
+
+    return output, inputs
+
+
+def _value_thunk(value: Any) -> Callable[[Any], Any]:
+    # Lazy-argument adapter for values the stack machine already evaluated
+    def thunk(context: Any) -> Any:
+        return value
+
+    return thunk
+
+
+# Referenced values a `by_reference` function gets as a 1x1 range; numbers and errors
+# behave the same either way and are passed unchanged
+_CELL_SUBTYPES = frozenset(("TEXT", "LOGICAL", "EMPTY"))
+
+
+def _reference_cell(value: Any) -> Any:
+    if (
+        value is not None
+        and value.type == "OPERAND"
+        and value.subtype in _CELL_SUBTYPES
+    ):
+        return TokenArray.from_values([[value]])
+    return value
+
+
+def _reference_arguments(
+    rpn_tokens: Sequence[Union[Token, int, None]],
+    functions: Mapping[str, Tuple[Union[Sequence, None], Callable]],
+) -> Dict[int, Tuple[bool, ...]]:
+    # RPN index of the argument count of each `by_reference` function call -> which of its
+    # arguments are references, from a pass tracking the origin of every stack entry
+    found: Dict[int, Tuple[bool, ...]] = {}
+    origins: List[bool] = []
+    i = 0
+    while i < len(rpn_tokens):
+        token = rpn_tokens[i]
+        i += 1
+        if token is None or isinstance(token, int):
+            origins.append(False)
+        elif token.type == "OPERAND":
+            origins.append(token.subtype == "RANGE")
+        elif token.type == "OPERATOR-INFIX":
+            del origins[-2:]
+            origins.append(False)
+        elif token.type == "OPERATOR-PREFIX":
+            del origins[-1:]
+            origins.append(False)
+        elif token.type == "FUNC" and token.subtype == "OPEN":
+            arg_count = rpn_tokens[i] if i < len(rpn_tokens) else None
+            if not isinstance(arg_count, int):
+                break
+            i += 1
+            args = origins[len(origins) - arg_count :] if arg_count else []
+            del origins[len(origins) - len(args) :]
+            entry = functions.get(token.value)
+            if entry is not None and is_by_reference(entry[1]) and any(args):
+                # Missing entries (stack underflow) are padded in front, as the
+                # evaluator pads its arguments with None
+                found[i - 1] = (False,) * (arg_count - len(args)) + tuple(args)
+            origins.append(False)
+    return found
+
+
+def _stack_evaluator(
+    rpn_tokens: Sequence[Union[Token, int, None]],
+    functions: Mapping[str, Tuple[Union[Sequence, None], Callable]],
+    ops: Mapping[str, Callable[[Token, Token], Token]],
+    observer: Union[TraceObserver, None] = None,
+) -> Callable[[Dict[str, typing.Any]], Any]:
+    """
+    Build the reference stack-machine evaluator for an RPN program.
+
+    Every call walks `rpn_tokens` from the start. It is kept as the reference backend
+    (`backend="stack"`) for differential testing and as the fallback for programs the
+    compiler cannot turn into a well-formed expression tree.
+    """
+    reference_arguments = _reference_arguments(rpn_tokens, functions)
+    # A profiled `/` counts the zero-divisor case itself, so it is not short-circuited
+    checked_division = "/" in ops and _checks_division(ops["/"])
+    # Profiled prefix operators (`u-`/`u+`) replace the inline unary handling
+    unary_ops: Mapping[str, Callable[..., Token]] = ops
+
+    def evaluate_rpn_token(
+        inputs: Union[Dict[str, typing.Any], None] = None,
+    ) -> typing.Any:
+        immutable_inputs: Mapping[str, Any]
+        if isinstance(inputs, LazyInputs):
+            # Copying would fetch nothing: the lazy mapping is read as references are reached
+            immutable_inputs = inputs
+        else:
+            provided_inputs = {} if inputs is None else dict(inputs)
+            immutable_inputs = MappingProxyType(provided_inputs)
+
+        stack: deque[Any] = deque()
+
+        i = 0  # Token index for argument count retrieval
+
+        while i < len(rpn_tokens):
+            token = rpn_tokens[i]
+            i += 1  # Move to the next token
+            # print(token)
+
+            if token is None:
+                # raise ValueError(f"Unexpected None at position {i}")
+                stack.append(token)
+            elif isinstance(token, int):
+                raise ValueError(f"Unexpected token (int: {token}) at position {i} ")
+            elif token.type == "OPERAND":
+                if token.subtype != "RANGE":
+                    stack.append(token)
+                else:
+                    if token.value in immutable_inputs:
+                        stack.append(immutable_inputs[token.value])
+                    else:
+                        raise KeyError(
+                            f"The input '{token.value}' is required but was not found in the provided inputs."
                         )
-                    op_stack.append(token)
-
-                elif token.type == "OPERATOR-INFIX":
-                    if i == 0 or (
-                        prev_token
-                        and (
-                            (
-                                prev_token.type == "OPERATOR-INFIX"
-                                and prev_token.value != ")"
-                                and prev_token.subtype != "CLOSE"
-                            )
-                            or prev_token.type == "OPERATOR-PREFIX"
-                            or prev_token.value == "("
+            elif token.type == "OPERATOR-INFIX":  # in OPERATORS:
+                if len(stack) < 2:
+                    raise ValueError(
+                        f"Not enough values for operation '{token.value}'."
+                    )
+                b = stack.pop()
+                a = stack.pop()
+
+                if (
+                    token.value == "/"
+                    and not checked_division
+                    and b.type == "OPERAND"
+                    and (b.value == 0 or b.value == 0.0)
+                ):
+                    stack.append(_DIV_ZERO)
+                else:
+                    op = ops.get(token.value)
+                    if op:
+                        stack.append(op(a, b))
+                    else:
+                        raise NotImplementedError(
+                            f"Operator '{token.value}' is not implemented"
                         )
-                    ):
-                        raise SyntaxError(
-                            f"Unexpected operator `{token}` at position {i}."
+                if observer is not None:
+                    observer.op_applied(token.value, (a, b), stack[-1])
+            elif token.type == "OPERATOR-PREFIX":
+                if len(stack) < 1:
+                    raise ValueError(
+                        f"Not enough values for unary operation '{token.value}'."
+                    )
+                a = stack.pop()
+                profiled_prefix = unary_ops.get(f"u{token.value}")
+                if profiled_prefix is not None:
+                    stack.append(profiled_prefix(a))
+                elif a is None:
+                    stack.append(
+                        TokenError(
+                            TokenErrorTypes.NUM,
+                            f"Unary operator '{token.value}' cannot be applied to None.",
                         )
-                    token_key = _operator_key(token)
-                    if token_key in OPERATORS or token_key in UNARY_OPERATORS:
-                        token_prec, token_assoc = _operator_meta(token_key)
-                        while (
-                            op_stack
-                            and (
-                                _operator_key(op_stack[-1]) in OPERATORS
-                                or _operator_key(op_stack[-1]) in UNARY_OPERATORS
+                    )
+                elif a.subtype == "ERROR":
+                    stack.append(a)
+                elif a.type == "OPERAND" and a.subtype == "NUMBER":
+                    if token.value == "-":
+                        stack.append(TokenNumber(-a.value))
+                    elif token.value == "+":
+                        stack.append(TokenNumber(+a.value))
+                    else:
+                        raise NotImplementedError(
+                            f"Unary operator '{token.value}' is not implemented"
+                        )
+                else:
+                    stack.append(
+                        TokenError(
+                            TokenErrorTypes.NUM,
+                            f"Unary operator '{token.value}' expects NUMBER but found {a}.",
+                        )
+                    )
+                if observer is not None:
+                    observer.op_applied(f"u{token.value}", (a,), stack[-1])
+            elif token.type == "FUNC" and token.subtype == "OPEN":
+                func_name = token.value
+
+                if i >= len(rpn_tokens):
+                    raise ValueError(
+                        f"Missing argument count for function `{func_name}`."
+                    )
+
+                arg_count = rpn_tokens[i]  # Read argument count from tokens, not stack
+                i += 1  # Move to next token after argument count
+
+                if isinstance(arg_count, int):
+                    args = [stack.pop() if stack else None for _ in range(arg_count)][
+                        ::-1
+                    ]
+                    # print(f"`{func_name}`-> args: {args}")
+
+                    # Get function default values
+                    func_defaults, func_callable = functions[func_name]
+
+                    if func_defaults is not None:
+                        required_args_count = len(func_defaults)
+                        if len(args) != required_args_count:
+                            raise ValueError(
+                                f"Function `{token}` expects {required_args_count} arguments but got {len(args)}."
                             )
-                            and (
-                                (
-                                    token_assoc == "L"
-                                    and token_prec
-                                    <= _operator_meta(_operator_key(op_stack[-1]))[0]
-                                )
-                                or (
-                                    token_assoc == "R"
-                                    and token_prec
-                                    < _operator_meta(_operator_key(op_stack[-1]))[0]
+                        arg_index = 0
+                        while arg_index < required_args_count:
+                            default_value = func_defaults[arg_index]
+                            # print(
+                            #     f" *-> Eval#{func_name} :: {arg_index} | {args[arg_index]} | {default_value}"
+                            # )
+                            if default_value is None and args[arg_index] is None:
+                                raise ValueError(
+                                    f"Missing required argument at {arg_index} for function `{func_name}`"
                                 )
+                            arg_index += 1
+
+                    if i - 1 in reference_arguments:
+                        args = [
+                            _reference_cell(arg) if is_reference else arg
+                            for arg, is_reference in zip(
+                                args, reference_arguments[i - 1]
                             )
-                        ):
-                            output.append(op_stack.pop())  # TODO Improve test coverage
-                    op_stack.append(token)
-
-                elif (
-                    token.type == "SEP" and token.subtype == "ARG"
-                ):  # token.value == ',':
-                    if prev_token is None:
-                        raise SyntaxError(
-                            f"Unexpected separator `{token}` at position {i}."
+                        ]
+
+                    if is_lazy(func_callable):
+                        func_result = func_callable(
+                            None, *[_value_thunk(arg) for arg in args]
                         )
+                    else:
+                        func_result = func_callable(*args)
+                    # print(f"`{func_name}`-> result: {func_result}")
+                    if observer is not None:
+                        observer.function_called(func_name, args, func_result)
+                    if func_result is not None:
+                        stack.append(func_result)
+                else:
+                    raise RuntimeError(
+                        f"Expected an interger arg_count for function `{func_name}`'s arg_count, but found {arg_count}"
+                    )
 
-                    if prev_token.subtype == "OPEN" or prev_token.value == ",":
-                        output.append(None)  # Handle missing argument
+        if len(stack) != 1:
+            raise ValueError("Formula evaluation error: too many values remaining.")
 
-                    while op_stack and op_stack[-1].value != "(":
-                        output.append(op_stack.pop())
+        result = stack.pop()
+        if observer is not None:
+            observer.evaluated(result)
+        return result
 
-                    if not arg_stack:
-                        raise SyntaxError(
-                            f"Unexpected separator `{token}` at position {i}."
-                        )
-                    arg_stack[-1] += 1  # Increase count for the current function call
+    def evaluate_rpn(
+        inputs: Union[Dict[str, typing.Any], None] = None,
+    ) -> typing.Any:
+        return evaluate_rpn_token(inputs).value
 
-                # elif token.type == "WHITE-SPACE":
-                #     pass
+    evaluate_rpn.__setattr__("evaluate_token", evaluate_rpn_token)
+    return evaluate_rpn
 
-                else:
-                    raise SyntaxError(f"Unrecognized token `{token}` at position {i}.")
 
-            if open_parens > 0:
-                raise SyntaxError("Unmatched `(` (missing closing parenthesis).")
+# Expression tree node kinds produced by `_rpn_to_tree`
+_CONST = 0  # (_CONST, token)
+_MISSING = 1  # (_MISSING,) -> an empty function argument
+_REF = 2  # (_REF, key)
+_INFIX = 3  # (_INFIX, operator_key, left, right)
+_PREFIX = 4  # (_PREFIX, operator_value, operand)
+_CALL = 5  # (_CALL, func_name, args)
+_SHARED = 6  # (_SHARED, index, node) -> a repeated subexpression, computed once
 
-            while op_stack:
-                if op_stack[-1].value == "(":
-                    raise SyntaxError("Unmatched `(` in expression.")
-                output.append(op_stack.pop())
+_Node = Tuple[Any, ...]
+_Closure = Callable[[Mapping[str, Any]], Any]
 
-            return output, inputs
+# Deeper trees (e.g. `A1+A2+...+A500`) stay on the stack machine: compiling and calling
+# the closures recurses once or twice per level
+_MAX_TREE_DEPTH = 200
 
-        rpn_tokens, inputs = infix_to_rpn(tokens, functions)
-        # print(f"rpn_tokens: {rpn_tokens}")
 
-        def execute_func(
-            rpn_tokens: Sequence[Union[Token, int, None]], inputs_set: Set[str]
-        ) -> Callable[[Dict[str, typing.Any]], Any]:
-            def evaluate_rpn(
-                inputs: Union[Dict[str, typing.Any], None] = None,
-            ) -> typing.Any:
-                provided_inputs = {} if inputs is None else dict(inputs)
-                immutable_inputs: Mapping[str, Any] = MappingProxyType(provided_inputs)
+def _rpn_to_tree(
+    rpn_tokens: Sequence[Union[Token, int, None]],
+    functions: Mapping[str, Tuple[Union[Sequence, None], Callable]],
+    ops: Mapping[str, Callable[[Token, Token], Token]],
+) -> Union[_Node, None]:
+    """
+    Rebuild the expression tree encoded by an RPN program.
 
-                stack: deque[Any] = deque()
+    Returns None when the program is not a well-formed expression (stack underflow,
+    leftover values, unknown operators, invalid defaults, ...). Those programs keep the
+    stack-machine semantics, including the errors it raises while evaluating. Trees
+    nested deeper than `_MAX_TREE_DEPTH` levels also return None.
+    """
+    stack: List[_Node] = []
+    depths: List[int] = []  # nesting depth of each stack entry
+    i = 0
+    while i < len(rpn_tokens):
+        token = rpn_tokens[i]
+        i += 1
 
-                i = 0  # Token index for argument count retrieval
+        if token is None:
+            stack.append((_MISSING,))
+            depths.append(1)
+        elif isinstance(token, int):
+            return None
+        elif token.type == "OPERAND":
+            if token.subtype == "RANGE":
+                stack.append((_REF, token.value))
+            else:
+                stack.append((_CONST, token))
+            depths.append(1)
+        elif token.type == "OPERATOR-INFIX":
+            if len(stack) < 2 or token.value not in ops:
+                return None
+            b = stack.pop()
+            a = stack.pop()
+            if a[0] == _MISSING or b[0] == _MISSING:
+                return None
+            stack.append((_INFIX, token.value, a, b))
+            depths.append(max(depths.pop(), depths.pop()) + 1)
+        elif token.type == "OPERATOR-PREFIX":
+            if not stack or token.value not in ("+", "-"):
+                return None
+            stack.append((_PREFIX, token.value, stack.pop()))
+            depths[-1] += 1
+        elif token.type == "FUNC" and token.subtype == "OPEN":
+            if i >= len(rpn_tokens) or token.value not in functions:
+                return None
+            arg_count = rpn_tokens[i]
+            i += 1
+            if not isinstance(arg_count, int) or len(stack) < arg_count:
+                return None
+            args = tuple(stack[len(stack) - arg_count :])
+            del stack[len(stack) - arg_count :]
+            depth = max(depths[len(depths) - arg_count :], default=0) + 1
+            del depths[len(depths) - arg_count :]
 
-                while i < len(rpn_tokens):
-                    token = rpn_tokens[i]
-                    i += 1  # Move to the next token
-                    # print(token)
+            func_defaults = functions[token.value][0]
+            if func_defaults is not None:
+                if len(args) != len(func_defaults):
+                    return None
+                for default_value, arg in zip(func_defaults, args):
+                    if default_value is None and arg[0] == _MISSING:
+                        return None
+            stack.append((_CALL, token.value, args))
+            depths.append(depth)
+        else:
+            return None
 
-                    if token is None:
-                        # raise ValueError(f"Unexpected None at position {i}")
-                        stack.append(token)
-                    elif isinstance(token, int):
-                        raise ValueError(
-                            f"Unexpected token (int: {token}) at position {i} "
-                        )
-                    elif token.type == "OPERAND":
-                        if token.subtype != "RANGE":
-                            stack.append(token)
-                        else:
-                            if token.value in immutable_inputs:
-                                stack.append(immutable_inputs[token.value])
-                            else:
-                                raise KeyError(
-                                    f"The input '{token.value}' is required but was not found in the provided inputs."
-                                )
-                    elif token.type == "OPERATOR-INFIX":  # in OPERATORS:
-                        if len(stack) < 2:
-                            raise ValueError(
-                                f"Not enough values for operation '{token.value}'."
-                            )
-                        b = stack.pop()
-                        a = stack.pop()
+        if depths[-1] > _MAX_TREE_DEPTH:
+            return None
 
-                        logging.debug(
-                            f"interpreter: applying op: {token.value} with a: {a.value} b: {b.value}"
-                        )
+    if len(stack) != 1 or stack[0][0] == _MISSING:
+        return None
+    return stack[0]
 
-                        if (
-                            token.value == "/"
-                            and b.type == "OPERAND"
-                            and (b.value == 0 or b.value == 0.0)
-                        ):
-                            stack.append(
-                                TokenError(
-                                    TokenErrorTypes.ZERO_DIV, "Division by zero."
-                                )
-                            )
-                        else:
-                            op = ops.get(token.value)
-                            if op:
-                                stack.append(op(a, b))
-                            else:
-                                raise NotImplementedError(
-                                    f"Operator '{token.value}' is not implemented"
-                                )
-                    elif token.type == "OPERATOR-PREFIX":
-                        if len(stack) < 1:
-                            raise ValueError(
-                                f"Not enough values for unary operation '{token.value}'."
-                            )
-                        a = stack.pop()
-                        if a is None:
-                            stack.append(
-                                TokenError(
-                                    TokenErrorTypes.NUM,
-                                    f"Unary operator '{token.value}' cannot be applied to None.",
-                                )
-                            )
-                        elif a.subtype == "ERROR":
-                            stack.append(a)
-                        elif a.type == "OPERAND" and a.subtype == "NUMBER":
-                            if token.value == "-":
-                                stack.append(TokenNumber(-a.value))
-                            elif token.value == "+":
-                                stack.append(TokenNumber(+a.value))
-                            else:
-                                raise NotImplementedError(
-                                    f"Unary operator '{token.value}' is not implemented"
-                                )
-                        else:
-                            stack.append(
-                                TokenError(
-                                    TokenErrorTypes.NUM,
-                                    f"Unary operator '{token.value}' expects NUMBER but found {a}.",
-                                )
-                            )
-                    elif token.type == "FUNC" and token.subtype == "OPEN":
-                        func_name = token.value
 
-                        if i >= len(rpn_tokens):
-                            raise ValueError(
-                                f"Missing argument count for function `{func_name}`."
-                            )
+def _fold_constants(
+    node: _Node,
+    functions: Mapping[str, Tuple[Union[Sequence, None], Callable]],
+    ops: Mapping[str, Callable[[Token, Token], Token]],
+) -> _Node:
+    """
+    Pre-evaluate every operator or pure function node whose operands are constants.
 
-                        arg_count = rpn_tokens[
-                            i
-                        ]  # Read argument count from tokens, not stack
-                        i += 1  # Move to next token after argument count
-
-                        if isinstance(arg_count, int):
-                            args = [
-                                stack.pop() if stack else None for _ in range(arg_count)
-                            ][::-1]
-                            # print(f"`{func_name}`-> args: {args}")
-
-                            # Get function default values
-                            func_defaults, func_callable = functions[func_name]
-
-                            if func_defaults is not None:
-                                required_args_count = len(func_defaults)
-                                if len(args) != required_args_count:
-                                    raise ValueError(
-                                        f"Function `{token}` expects {required_args_count} arguments but got {len(args)}."
-                                    )
-                                arg_index = 0
-                                while arg_index < required_args_count:
-                                    default_value = func_defaults[arg_index]
-                                    # print(
-                                    #     f" *-> Eval#{func_name} :: {arg_index} | {args[arg_index]} | {default_value}"
-                                    # )
-                                    if (
-                                        default_value is None
-                                        and args[arg_index] is None
-                                    ):
-                                        raise ValueError(
-                                            f"Missing required argument at {arg_index} for function `{func_name}`"
-                                        )
-                                    arg_index += 1
-
-                            func_result = func_callable(*args)
-                            # print(f"`{func_name}`-> result: {func_result}")
-                            if func_result is not None:
-                                stack.append(func_result)
-                        else:
-                            raise RuntimeError(
-                                f"Expected an interger arg_count for function `{func_name}`'s arg_count, but found {arg_count}"
-                            )
+    Operators count as pure unless marked `volatile`; functions only when marked
+    `pure`. A node whose evaluation raises or produces no value is kept as-is, so the
+    behaviour at evaluation time does not change.
+    """
+    kind = node[0]
+    if kind == _INFIX:
+        children: Tuple[_Node, ...] = (node[2], node[3])
+        foldable = is_pure(ops[node[1]], default=True)
+    elif kind == _PREFIX:
+        children = (node[2],)
+        foldable = True
+    elif kind == _CALL:
+        children = node[2]
+        foldable = is_pure(functions[node[1]][1])
+    else:
+        return node
 
-                if len(stack) != 1:
-                    raise ValueError(
-                        "Formula evaluation error: too many values remaining."
-                    )
+    children = tuple(_fold_constants(child, functions, ops) for child in children)
+    if kind == _CALL:
+        node = (_CALL, node[1], children)
+    else:
+        node = node[:2] + children
+
+    if foldable and all(child[0] in (_CONST, _MISSING) for child in children):
+        try:
+            value = _emit(node, functions, ops)({})
+        except Exception:
+            return node
+        if value is not None:
+            return (_CONST, value)
+    return node
+
+
+def _share_subexpressions(
+    node: _Node,
+    functions: Mapping[str, Tuple[Union[Sequence, None], Callable]],
+    ops: Mapping[str, Callable[[Token, Token], Token]],
+) -> Tuple[_Node, int]:
+    """
+    Wrap structurally identical subtrees in `_SHARED` nodes (common subexpression
+    elimination). Returns the new tree and the number of distinct shared subtrees.
+
+    Only subtrees that reference an input, call at least one function and contain
+    nothing but non-volatile operators and `pure` functions qualify; repeated operators
+    alone are cheaper to recompute than to memoize. A repeated subtree is shared as a
+    whole; the nodes inside it are only shared when they also occur elsewhere.
+    """
+    keys: Dict[int, Any] = {}  # id(node) -> structural key, or None when not eligible
+
+    def visit(node: _Node) -> Tuple[Any, bool, bool, bool]:
+        # Returns (structural key, pure, references an input, calls a function)
+        kind = node[0]
+        if kind == _CONST:
+            token = node[1]
+            key: Any = (_CONST, token.type, token.subtype, token.value.__class__)
+            try:
+                key += (token.value,)
+                hash(key)
+            except TypeError:
+                key = (_CONST, id(token))
+            return key, True, False, False
+        if kind == _MISSING:
+            return (_MISSING,), True, False, False
+        if kind == _REF:
+            return node, True, True, False
+        if kind == _INFIX:
+            children: Tuple[_Node, ...] = (node[2], node[3])
+            pure = is_pure(ops[node[1]], default=True)
+        elif kind == _PREFIX:
+            children = (node[2],)
+            pure = True
+        else:
+            children = node[2]
+            pure = is_pure(functions[node[1]][1])
+        has_ref = False
+        has_call = kind == _CALL
+        child_keys = []
+        for child in children:
+            child_key, child_pure, child_ref, child_call = visit(child)
+            child_keys.append(child_key)
+            pure = pure and child_pure
+            has_ref = has_ref or child_ref
+            has_call = has_call or child_call
+        key = (kind, node[1], tuple(child_keys))
+        keys[id(node)] = key if pure and has_ref and has_call else None
+        return key, pure, has_ref, has_call
+
+    visit(node)
+
+    # Count occurrences top-down, without looking inside repeated subtrees again
+    counts: Dict[Any, int] = {}
+
+    def count(node: _Node) -> None:
+        key = keys.get(id(node))
+        if key is not None:
+            counts[key] = counts.get(key, 0) + 1
+            if counts[key] > 1:
+                return
+        kind = node[0]
+        if kind in (_INFIX, _PREFIX):
+            for child in node[2:]:
+                count(child)
+        elif kind == _CALL:
+            for child in node[2]:
+                count(child)
+
+    count(node)
+    indexes: Dict[Any, int] = {}
+
+    def rebuild(node: _Node) -> _Node:
+        kind = node[0]
+        key = keys.get(id(node))
+        if kind in (_INFIX, _PREFIX):
+            node = node[:2] + tuple(rebuild(child) for child in node[2:])
+        elif kind == _CALL:
+            node = (_CALL, node[1], tuple(rebuild(child) for child in node[2]))
+        if key is not None and counts.get(key, 0) > 1:
+            index = indexes.setdefault(key, len(indexes))
+            return (_SHARED, index, node)
+        return node
 
-                return stack.pop().value
+    return rebuild(node), len(indexes)
 
-            evaluate_rpn.__setattr__("inputs", inputs_set)
-            return evaluate_rpn
 
-        return execute_func(rpn_tokens, inputs)
+class _SharedValues(threading.local):
+    """
+    Results of the shared subexpressions for the evaluation running in this thread.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.values: Union[List[Any], None] = None
+
+
+_UNSET = object()
+
+
+def _with_shared_values(root: _Closure, shared: _SharedValues) -> _Closure:
+    # Gives each evaluation (per thread, re-entrant) a fresh list of shared results
+    size = shared.size
+
+    def shared_root(inputs: Mapping[str, Any]) -> Any:
+        previous = shared.values
+        shared.values = [_UNSET] * size
+        try:
+            return root(inputs)
+        finally:
+            shared.values = previous
+
+    return shared_root
+
+
+def _missing(inputs: Mapping[str, Any]) -> None:
     return None
+
+
+def _checked_division(
+    op: Callable[[Token, Token], Token],
+) -> Callable[[Token, Token], Token]:
+    def divide(a: Token, b: Token) -> Token:
+        if b.type == "OPERAND" and (b.value == 0 or b.value == 0.0):
+            return _DIV_ZERO
+        return op(a, b)
+
+    return divide
+
+
+def _prefix_operator(op_value: str) -> Callable[[Any], Token]:
+    negate = op_value == "-"
+
+    def apply_prefix(a: Any) -> Token:
+        if a is None:
+            return TokenError(
+                TokenErrorTypes.NUM,
+                f"Unary operator '{op_value}' cannot be applied to None.",
+            )
+        if a.subtype == "ERROR":
+            return a
+        if a.type == "OPERAND" and a.subtype == "NUMBER":
+            return TokenNumber(-a.value if negate else +a.value)
+        return TokenError(
+            TokenErrorTypes.NUM,
+            f"Unary operator '{op_value}' expects NUMBER but found {a}.",
+        )
+
+    return apply_prefix
+
+
+def _profiled_maps(
+    rpn_tokens: Sequence[Union[Token, int, None]],
+    functions: Mapping[str, Tuple[Union[Sequence, None], Callable]],
+    ops: Mapping[str, Callable[[Token, Token], Token]],
+    profile: ProfileStats,
+) -> Tuple[
+    Dict[str, Tuple[Union[Sequence, None], Callable]],
+    Dict[str, Callable[..., Token]],
+]:
+    # Maps with the functions and operators the program uses wrapped in profile counters.
+    # `/` is wrapped with its division-by-zero check, so that short-circuit is counted
+    # too, and prefix operators are added as `u-`/`u+` (the keys tracing reports)
+    profiled_functions = {}
+    profiled_ops: Dict[str, Callable[..., Token]] = {}
+    for token in rpn_tokens:
+        if token is None or isinstance(token, int):
+            continue
+        key = token.value
+        if token.type == "FUNC" and key in functions:
+            defaults, func = functions[key]
+            profiled_functions[key] = (
+                defaults,
+                _profiled(profile, "function", key, func),
+            )
+        elif token.type == "OPERATOR-INFIX" and key in ops:
+            if key == "/":
+                profiled_ops[key] = _profiled(
+                    profile, "op", key, _checked_division(ops[key])
+                )
+                profiled_ops[key].__setattr__("__mvin_checked_division__", True)
+            else:
+                profiled_ops[key] = _profiled(profile, "op", key, ops[key])
+        elif token.type == "OPERATOR-PREFIX" and key in ("+", "-"):
+            profiled_ops[f"u{key}"] = _profiled(
+                profile, "op", f"u{key}", _prefix_operator(key)
+            )
+    return profiled_functions, profiled_ops
+
+
+def _checks_division(op: Callable[..., Token]) -> bool:
+    # Whether the `/` callable returns #DIV/0! itself (profiled), so that the evaluators
+    # must call it instead of short-circuiting a zero divisor
+    return getattr(op, "__mvin_checked_division__", False)
+
+
+def _prefix_callable(
+    ops: Mapping[str, Callable[..., Token]], op_value: str
+) -> Callable[[Any], Token]:
+    # Prefix operators are built in; profiled maps carry counted ones as `u-`/`u+`
+    return ops.get(f"u{op_value}") or _prefix_operator(op_value)
+
+
+def _traced_op(
+    observer: TraceObserver, key: str, op: Callable[..., Token]
+) -> Callable[..., Token]:
+    def traced_op(*args: Any) -> Token:
+        result = op(*args)
+        observer.op_applied(key, args, result)
+        return result
+
+    return traced_op
+
+
+def _traced_function(
+    observer: TraceObserver, name: str, func: Callable[..., Any]
+) -> Callable[..., Any]:
+    def traced_function(*args: Any) -> Any:
+        result = func(*args)
+        observer.function_called(name, args, result)
+        return result
+
+    return traced_function
+
+
+def _emit(
+    node: _Node,
+    functions: Mapping[str, Tuple[Union[Sequence, None], Callable]],
+    ops: Mapping[str, Callable[[Token, Token], Token]],
+    observer: Union[TraceObserver, None] = None,
+    slots: Union[Mapping[str, int], None] = None,
+    shared: Union[_SharedValues, None] = None,
+) -> _Closure:
+    """
+    Turn an expression tree node into a closure taking the inputs mapping.
+
+    Operators and function callables are resolved here, once, so evaluating the
+    closure tree does no dispatch on token types or names. When an observer is given,
+    operators and functions are wrapped to report their calls; otherwise no tracing
+    code is part of the closure tree at all. With `slots` (input key -> index), the
+    closures take a sequence of input values instead and references are indexed loads.
+    `_SHARED` nodes read and store their result in `shared`; the root closure must be
+    wrapped with `_with_shared_values`.
+    """
+    kind = node[0]
+
+    if kind == _SHARED:
+        assert shared is not None
+        index = node[1]
+        compute = _emit(node[2], functions, ops, observer, slots, shared)
+        state = shared
+
+        def shared_value(inputs: Mapping[str, Any]) -> Any:
+            values = state.values
+            value = values[index]  # type: ignore[index]
+            if value is _UNSET:
+                value = values[index] = compute(inputs)  # type: ignore[index]
+            return value
+
+        return shared_value
+
+    if kind == _CONST:
+        token = node[1]
+
+        def const(inputs: Mapping[str, Any]) -> Any:
+            return token
+
+        return const
+
+    if kind == _MISSING:
+        return _missing
+
+    if kind == _REF:
+        key = node[1]
+        if slots is not None:
+            slot = slots[key]
+
+            def ref_slot(values: Any) -> Any:
+                return values[slot]
+
+            return ref_slot
+
+        def ref(inputs: Mapping[str, Any]) -> Any:
+            try:
+                return inputs[key]
+            except KeyError:
+                raise KeyError(
+                    f"The input '{key}' is required but was not found in the provided inputs."
+                ) from None
+
+        return ref
+
+    if kind == _INFIX:
+        op = ops[node[1]]
+        left = _emit(node[2], functions, ops, observer, slots, shared)
+        right = _emit(node[3], functions, ops, observer, slots, shared)
+
+        if observer is not None:
+            op = _traced_op(
+                observer, node[1], _checked_division(op) if node[1] == "/" else op
+            )
+
+        elif node[1] == "/" and not _checks_division(op):
+
+            def divide(inputs: Mapping[str, Any]) -> Any:
+                a = left(inputs)
+                b = right(inputs)
+                if b.type == "OPERAND" and (b.value == 0 or b.value == 0.0):
+                    return _DIV_ZERO
+                return op(a, b)
+
+            return divide
+
+        if node[3][0] == _CONST:
+            b_const = node[3][1]
+
+            def infix_const(inputs: Mapping[str, Any]) -> Any:
+                return op(left(inputs), b_const)
+
+            return infix_const
+
+        def infix(inputs: Mapping[str, Any]) -> Any:
+            return op(left(inputs), right(inputs))
+
+        return infix
+
+    if kind == _PREFIX:
+        operand = _emit(node[2], functions, ops, observer, slots, shared)
+        apply_prefix = _prefix_callable(ops, node[1])
+        if observer is not None:
+            apply_prefix = _traced_op(observer, f"u{node[1]}", apply_prefix)
+
+        def prefix(inputs: Mapping[str, Any]) -> Any:
+            return apply_prefix(operand(inputs))
+
+        return prefix
+
+    # kind == _CALL
+    args = [_emit(arg, functions, ops, observer, slots, shared) for arg in node[2]]
+    return _emit_call(node, functions, args, observer)
+
+
+def _reference_argument(arg: _Closure) -> _Closure:
+    # Argument closure of a reference passed to a `by_reference` function
+    def reference(inputs: Mapping[str, Any]) -> Any:
+        return _reference_cell(arg(inputs))
+
+    return reference
+
+
+def _emit_call(
+    node: _Node,
+    functions: Mapping[str, Tuple[Union[Sequence, None], Callable]],
+    args: List[_Closure],
+    observer: Union[TraceObserver, None] = None,
+) -> _Closure:
+    # The closure of a `_CALL` node, given the closures of its arguments
+    func = functions[node[1]][1]
+
+    if is_by_reference(func):
+        args = [
+            _reference_argument(arg) if arg_node[0] == _REF else arg
+            for arg, arg_node in zip(args, node[2])
+        ]
+
+    if is_lazy(func):
+        # Lazy functions get the argument closures themselves and call them on demand
+        lazy_func = func
+        lazy_args = tuple(args)
+        if observer is not None:
+            lazy_name = node[1]
+            lazy_observer = observer
+
+            def traced_lazy_call(inputs: Mapping[str, Any]) -> Any:
+                result = lazy_func(inputs, *lazy_args)
+                lazy_observer.function_called(lazy_name, lazy_args, result)
+                return result
+
+            return traced_lazy_call
+
+        def lazy_call(inputs: Mapping[str, Any]) -> Any:
+            return lazy_func(inputs, *lazy_args)
+
+        return lazy_call
+
+    specializer = get_specializer(func)
+    if specializer is not None and any(arg[0] == _CONST for arg in node[2]):
+        specialized = specializer(
+            tuple(arg[1] if arg[0] == _CONST else None for arg in node[2])
+        )
+        if specialized is not None:
+            func = specialized
+
+    if observer is not None:
+        func = _traced_function(observer, node[1], func)
+
+    if len(args) == 0:
+
+        def call0(inputs: Mapping[str, Any]) -> Any:
+            return func()
+
+        return call0
+
+    if len(args) == 1:
+        arg0 = args[0]
+
+        def call1(inputs: Mapping[str, Any]) -> Any:
+            return func(arg0(inputs))
+
+        return call1
+
+    if len(args) == 2:
+        arg0, arg1 = args
+
+        def call2(inputs: Mapping[str, Any]) -> Any:
+            return func(arg0(inputs), arg1(inputs))
+
+        return call2
+
+    if len(args) == 3:
+        arg0, arg1, arg2 = args
+
+        def call3(inputs: Mapping[str, Any]) -> Any:
+            return func(arg0(inputs), arg1(inputs), arg2(inputs))
+
+        return call3
+
+    def call(inputs: Mapping[str, Any]) -> Any:
+        return func(*[arg(inputs) for arg in args])
+
+    return call
+
+
+def _emit_raw(
+    node: _Node,
+    functions: Mapping[str, Tuple[Union[Sequence, None], Callable]],
+    ops: Mapping[str, Callable[[Token, Token], Token]],
+    shared: Union[_SharedValues, None] = None,
+) -> _Closure:
+    """
+    Turn an expression tree node into a closure taking and returning raw values
+    (`mvin.raw`). Built-in operators work on the raw values; custom operators and
+    functions get their arguments boxed into tokens and their results unboxed.
+    """
+    kind = node[0]
+
+    if kind == _CONST:
+        value = unbox(node[1])
+
+        def raw_const(inputs: Mapping[str, Any]) -> Any:
+            return value
+
+        return raw_const
+
+    if kind == _MISSING:
+        no_token = unbox(None)
+
+        def raw_missing(inputs: Mapping[str, Any]) -> Any:
+            return no_token
+
+        return raw_missing
+
+    if kind == _REF:
+        # Same lookup (and error) as the token path
+        return _emit(node, functions, ops)
+
+    if kind == _SHARED:
+        assert shared is not None
+        index = node[1]
+        compute = _emit_raw(node[2], functions, ops, shared)
+        state = shared
+
+        def raw_shared(inputs: Mapping[str, Any]) -> Any:
+            values = state.values
+            value = values[index]  # type: ignore[index]
+            if value is _UNSET:
+                value = values[index] = compute(inputs)  # type: ignore[index]
+            return value
+
+        return raw_shared
+
+    if kind == _INFIX:
+        raw_op = _raw_infix(node[1], ops[node[1]], checked_division=node[1] == "/")
+        left = _emit_raw(node[2], functions, ops, shared)
+        right = _emit_raw(node[3], functions, ops, shared)
+
+        def raw_infix(inputs: Mapping[str, Any]) -> Any:
+            return raw_op(left(inputs), right(inputs))
+
+        return raw_infix
+
+    if kind == _PREFIX:
+        raw_prefix = _raw_prefix(node[1], _prefix_operator(node[1]))
+        operand = _emit_raw(node[2], functions, ops, shared)
+
+        def raw_prefix_call(inputs: Mapping[str, Any]) -> Any:
+            return raw_prefix(operand(inputs))
+
+        return raw_prefix_call
+
+    # kind == _CALL: functions take and return tokens
+    args = []
+    for arg in node[2]:
+        if arg[0] in (_CONST, _MISSING):
+            args.append(_emit(arg, functions, ops))
+        else:
+            args.append(_boxed(_emit_raw(arg, functions, ops, shared)))
+    call = _emit_call(node, functions, args)
+
+    def raw_call(inputs: Mapping[str, Any]) -> Any:
+        return unbox(call(inputs))
+
+    return raw_call
+
+
+def _boxed(raw: _Closure) -> _Closure:
+    def boxed(inputs: Mapping[str, Any]) -> Any:
+        return box(raw(inputs))
+
+    return boxed
+
+
+def _raw_evaluator(
+    tree: Union[_Node, None],
+    evaluate_token: Callable[[Dict[str, typing.Any]], Any],
+    functions: Mapping[str, Tuple[Union[Sequence, None], Callable]],
+    ops: Mapping[str, Callable[[Token, Token], Token]],
+    observer: Union[TraceObserver, None] = None,
+    shared: Union[_SharedValues, None] = None,
+    profiled: bool = False,
+) -> Callable[..., Any]:
+    if tree is None or observer is not None or profiled:
+        # Stack machine, traced or profiled: box the inputs and unbox the result token
+        def evaluate_raw_boxed(inputs: Union[Mapping[str, Any], None] = None) -> Any:
+            tokens = {} if inputs is None else {k: box(v) for k, v in inputs.items()}
+            return raw_result(unbox(evaluate_token(tokens)))
+
+        return evaluate_raw_boxed
+
+    # The raw closure tree is only built when raw evaluation is used
+    compiled: List[_Closure] = []
+
+    def evaluate_raw(inputs: Union[Mapping[str, Any], None] = None) -> Any:
+        """
+        Evaluate the formula for plain Python inputs (`int`, `float`, `str`, `bool`,
+        `None` for an empty cell, `mvin.raw.RawError`, or a token such as a `TokenArray`).
+
+        Returns:
+            The same value as calling the interpreter with the boxed inputs; errors are
+            `RawError` values, which compare equal to the token path's error codes.
+        """
+        if not compiled:
+            root = _emit_raw(tree, functions, ops, shared)
+            compiled.append(
+                root if shared is None else _with_shared_values(root, shared)
+            )
+        return raw_result(compiled[0]({} if inputs is None else inputs))
+
+    return evaluate_raw
+
+
+def _emit_root(
+    tree: _Node,
+    functions: Mapping[str, Tuple[Union[Sequence, None], Callable]],
+    ops: Mapping[str, Callable[[Token, Token], Token]],
+    observer: Union[TraceObserver, None] = None,
+    slots: Union[Mapping[str, int], None] = None,
+    shared: Union[_SharedValues, None] = None,
+) -> _Closure:
+    root = _emit(tree, functions, ops, observer, slots, shared)
+    return root if shared is None else _with_shared_values(root, shared)
+
+
+def _compiled_evaluator(
+    root: _Closure, observer: Union[TraceObserver, None] = None
+) -> Callable[[Dict[str, typing.Any]], Any]:
+    if observer is not None:
+        traced_root = root
+
+        def observed_root(inputs: Mapping[str, Any]) -> Any:
+            result = traced_root(inputs)
+            observer.evaluated(result)
+            return result
+
+        root = observed_root
+
+    def evaluate_compiled(
+        inputs: Union[Dict[str, typing.Any], None] = None,
+    ) -> typing.Any:
+        result = root({} if inputs is None else inputs)
+        if result is None:
+            # A function produced no value: same outcome as the stack machine's empty stack
+            raise ValueError("Formula evaluation error: too many values remaining.")
+        return result.value
+
+    def evaluate_compiled_token(
+        inputs: Union[Dict[str, typing.Any], None] = None,
+    ) -> typing.Any:
+        result = root({} if inputs is None else inputs)
+        if result is None:
+            raise ValueError("Formula evaluation error: too many values remaining.")
+        return result
+
+    evaluate_compiled.__setattr__("evaluate_token", evaluate_compiled_token)
+    return evaluate_compiled
+
+
+def _positional_evaluator(
+    input_order: Tuple[str, ...],
+    tree: Union[_Node, None],
+    evaluate: Callable[[Dict[str, typing.Any]], Any],
+    functions: Mapping[str, Tuple[Union[Sequence, None], Callable]],
+    ops: Mapping[str, Callable[[Token, Token], Token]],
+    observer: Union[TraceObserver, None] = None,
+    shared: Union[_SharedValues, None] = None,
+) -> Callable[[Sequence[Any]], Any]:
+    count = len(input_order)
+    if tree is None:
+        # Stack machine: bind the values to their keys
+        evaluate_token = evaluate.evaluate_token  # type: ignore[attr-defined]
+
+        def call_keyed(values: Sequence[Any]) -> Any:
+            if len(values) != count:
+                raise TypeError(
+                    f"Expected {count} input values {input_order}, but got {len(values)}."
+                )
+            return evaluate(dict(zip(input_order, values)))
+
+        def call_keyed_token(values: Sequence[Any]) -> Any:
+            if len(values) != count:
+                raise TypeError(
+                    f"Expected {count} input values {input_order}, but got {len(values)}."
+                )
+            return evaluate_token(dict(zip(input_order, values)))
+
+        call_keyed.__setattr__("evaluate_token", call_keyed_token)
+        return call_keyed
+
+    # The slot-indexed closure tree is only built when positional calls are used
+    slots = {key: slot for slot, key in enumerate(input_order)}
+    compiled: List[Callable[[Any], Any]] = []
+
+    def compiled_evaluator() -> Callable[[Any], Any]:
+        if not compiled:
+            compiled.append(
+                _compiled_evaluator(
+                    _emit_root(tree, functions, ops, observer, slots, shared),
+                    observer,
+                )
+            )
+        return compiled[0]
+
+    def call_tuple(values: Sequence[Any]) -> Any:
+        if len(values) != count:
+            raise TypeError(
+                f"Expected {count} input values {input_order}, but got {len(values)}."
+            )
+        return (compiled[0] if compiled else compiled_evaluator())(values)
+
+    def call_tuple_token(values: Sequence[Any]) -> Any:
+        if len(values) != count:
+            raise TypeError(
+                f"Expected {count} input values {input_order}, but got {len(values)}."
+            )
+        return compiled_evaluator().evaluate_token(values)  # type: ignore[attr-defined]
+
+    call_tuple.__setattr__("evaluate_token", call_tuple_token)
+    return call_tuple
+
+
+def _batch_evaluator(
+    evaluate_token: Callable[[Dict[str, typing.Any]], Any],
+    input_order: Tuple[str, ...] = (),
+    call_tuple_token: Union[Callable[[Sequence[Any]], Any], None] = None,
+) -> Callable[[Mapping[str, Sequence[Any]]], List[Token]]:
+    def evaluate_batch(columns: Mapping[str, Sequence[Any]]) -> List[Token]:
+        """
+        Evaluate the formula once per row of columnar inputs.
+
+        Args:
+            columns: Maps each input key to a sequence of tokens; all sequences must
+                have the same length (one entry per row).
+
+        Returns:
+            One result token per row, as `evaluate_token` returns it: read `.value`,
+            and tell errors apart by `subtype == "ERROR"`. A row whose evaluation
+            raises gets a `TokenError` (`#REF!` for a missing input, `#VALUE!`
+            otherwise) instead of aborting the batch.
+
+        Raises:
+            ValueError: If the columns have different lengths.
+        """
+        keys = list(columns)
+        values = [columns[key] for key in keys]
+        if values and any(len(column) != len(values[0]) for column in values):
+            raise ValueError(
+                "All input columns must have the same length: "
+                + ", ".join(f"{key}={len(column)}" for key, column in zip(keys, values))
+            )
+
+        results: List[Token] = []
+        append = results.append
+        if (
+            call_tuple_token is not None
+            and input_order
+            and all(key in columns for key in input_order)
+        ):
+            # Every input has a column: bind the rows positionally
+            for row in zip(*[columns[key] for key in input_order]):
+                try:
+                    append(call_tuple_token(row))
+                except KeyError as e:
+                    append(TokenError(TokenErrorTypes.REF, str(e.args[0])))
+                except Exception as e:
+                    append(TokenError(TokenErrorTypes.VALUE, str(e)))
+            return results
+
+        for row in zip(*values):
+            try:
+                append(evaluate_token(dict(zip(keys, row))))
+            except KeyError as e:
+                append(TokenError(TokenErrorTypes.REF, str(e.args[0])))
+            except Exception as e:
+                append(TokenError(TokenErrorTypes.VALUE, str(e)))
+        return results
+
+    return evaluate_batch
+
+
+async def _resolve_input(key: str, value: Any) -> Any:
+    # Awaitables are awaited; async providers are called with the reference first
+    if inspect.isawaitable(value):
+        return await value
+    if callable(value):
+        value = value(key)
+        if inspect.isawaitable(value):
+            return await value
+    return value
+
+
+def _async_evaluator(
+    evaluate: Callable[[Dict[str, typing.Any]], Any],
+    required: Set[str],
+) -> Callable[[Mapping[str, Any]], Any]:
+    async def evaluate_async(inputs: Mapping[str, Any]) -> Any:
+        """
+        Resolve the formula's inputs concurrently, then evaluate it.
+
+        Args:
+            inputs: Maps input keys to tokens, to awaitables that produce a token, or to
+                async providers: callables that take the input key and return a token
+                or an awaitable of one. Only the keys in `.inputs` are resolved.
+
+        Returns:
+            The result of the evaluation with the resolved tokens.
+
+        Raises:
+            Exception: Whatever a provider raises; the evaluation is not run then.
+        """
+        keys = [key for key in required if key in inputs]
+        values = await asyncio.gather(
+            *[_resolve_input(key, inputs[key]) for key in keys]
+        )
+        return evaluate(dict(zip(keys, values)))
+
+    return evaluate_async
+
+
+BACKENDS = ("compiled", "stack")
+"""
+Evaluation backends accepted by `get_interpreter`.
+"""
+
+
+def _build_interpreter(
+    tokens: Sequence[Token],
+    proposed_functions: Mapping[str, Tuple[Union[Sequence, None], Callable]],
+    registered_ops: Mapping[str, Callable[[Token, Token], Token]],
+    backend: str,
+    observer: Union[TraceObserver, None] = None,
+    optimize: bool = True,
+    profile: Union[ProfileStats, None] = None,
+) -> Union[Callable[[Dict[str, Any]], Any], None]:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend `{backend}`, expected one of {BACKENDS}.")
+
+    if isinstance(tokens, Sequence):
+        # Snapshots are shared by reference; only plain mappings are copied
+        ops = OperatorRegistry.of(registered_ops)
+        functions = FunctionRegistry.of(proposed_functions)
+
+        rpn_tokens, inputs = _infix_to_rpn(tokens, functions, observer)
+        return _interpreter_from_rpn(
+            rpn_tokens, inputs, functions, ops, backend, observer, optimize, profile
+        )
+    return None
+
+
+def _interpreter_from_rpn(
+    rpn_tokens: Sequence[Union[Token, int, None]],
+    inputs: Set[str],
+    functions: Mapping[str, Tuple[Union[Sequence, None], Callable]],
+    ops: Mapping[str, Callable[[Token, Token], Token]],
+    backend: str,
+    observer: Union[TraceObserver, None] = None,
+    optimize: bool = True,
+    profile: Union[ProfileStats, None] = None,
+) -> Callable[[Dict[str, Any]], Any]:
+    # Everything after parsing; also used to load serialized programs (`mvin.program`)
+    tree = _rpn_to_tree(rpn_tokens, functions, ops) if backend == "compiled" else None
+    shared = None
+    if tree is not None and optimize and observer is None:
+        # With the unprofiled callables
+        tree = _fold_constants(tree, functions, ops)
+        tree, shared_count = _share_subexpressions(tree, functions, ops)
+        if shared_count:
+            shared = _SharedValues(shared_count)
+    if profile is not None:
+        functions, ops = _profiled_maps(rpn_tokens, functions, ops, profile)
+    if tree is not None:
+        evaluator = _compiled_evaluator(
+            _emit_root(tree, functions, ops, observer, None, shared), observer
+        )
+        selected_backend = "compiled"
+    else:
+        evaluator = _stack_evaluator(rpn_tokens, functions, ops, observer)
+        selected_backend = "stack"
+
+    # Distinct references in order of first appearance: the positional input slots
+    input_order = tuple(
+        dict.fromkeys(
+            token.value
+            for token in rpn_tokens
+            if token is not None
+            and not isinstance(token, int)
+            and token.type == "OPERAND"
+            and token.subtype == "RANGE"
+        )
+    )
+    call_tuple = _positional_evaluator(
+        input_order, tree, evaluator, functions, ops, observer, shared
+    )
+
+    def call(*values: Any) -> Any:
+        return call_tuple(values)
+
+    evaluator.__setattr__("inputs", inputs)
+    evaluator.__setattr__("input_order", input_order)
+    evaluator.__setattr__("call", call)
+    evaluator.__setattr__("call_tuple", call_tuple)
+    evaluator.__setattr__("backend", selected_backend)
+    evaluator.__setattr__(
+        "evaluate_batch",
+        _batch_evaluator(
+            evaluator.evaluate_token,  # type: ignore[attr-defined]
+            input_order,
+            call_tuple.evaluate_token,  # type: ignore[attr-defined]
+        ),
+    )
+    evaluator.__setattr__("evaluate_async", _async_evaluator(evaluator, inputs))
+    evaluator.__setattr__(
+        "evaluate_raw",
+        _raw_evaluator(
+            tree,
+            evaluator.evaluate_token,  # type: ignore[attr-defined]
+            functions,
+            ops,
+            observer,
+            shared,
+            profile is not None,
+        ),
+    )
+    return evaluator
+
+
+def _fingerprint(tokens: Sequence[Token]) -> Tuple[Any, ...]:
+    # The value's class is part of the key so that `1`, `1.0` and `True` do not collide
+    return tuple(
+        None
+        if token is None
+        else (token.type, token.subtype, token.value.__class__, token.value)
+        for token in tokens
+    )
+
+
+def _map_key(mapping: Mapping[str, Any], registry_cls: type) -> Any:
+    if isinstance(mapping, (Registry, RegistryDict)):
+        return ("version", registry_cls.of(mapping).version)  # type: ignore[attr-defined]
+    return ("id", id(mapping))
+
+
+CacheInfo = NamedTuple(
+    "CacheInfo",
+    [("hits", int), ("misses", int), ("maxsize", int), ("currsize", int)],
+)
+"""
+Statistics reported by `InterpreterCache.info()`.
+"""
+
+
+class InterpreterCache:
+    """
+    Bounded LRU cache of compiled interpreters.
+
+    Entries are keyed by a structural fingerprint of the tokens (`type`, `subtype` and
+    `value` of each one), the function and operator maps and the backend, so identical
+    formula texts share a single compiled interpreter.
+
+    Registries and `RegistryDict`s (such as `DEFAULT_FUNCTIONS` and `REGISTERED_OPS`)
+    are keyed by snapshot version, so modifying them is picked up automatically. Plain
+    mappings are identified by identity only: mutating one after it was used with the
+    cache is not detected, call `clear()` after doing so.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be >= 1, but found {maxsize}")
+        self._maxsize = maxsize
+        self._entries: typing.OrderedDict[Any, Tuple[Any, ...]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def maxsize(self) -> int:
+        """Returns the maximum number of cached interpreters."""
+        return self._maxsize
+
+    @property
+    def hits(self) -> int:
+        """Returns the number of lookups served from the cache."""
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """Returns the number of lookups that had to compile the formula."""
+        return self._misses
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def info(self) -> CacheInfo:
+        """Returns the hit/miss counters and the current size of the cache."""
+        with self._lock:
+            return CacheInfo(
+                self._hits, self._misses, self._maxsize, len(self._entries)
+            )
+
+    def clear(self) -> None:
+        """Drops every cached interpreter and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def get_interpreter(
+        self,
+        tokens: Sequence[Token],
+        proposed_functions: Mapping[
+            str, Tuple[Union[Sequence, None], Callable]
+        ] = DEFAULT_FUNCTIONS,
+        registered_ops: Mapping[str, Callable[[Token, Token], Token]] = REGISTERED_OPS,
+        backend: str = "compiled",
+        observer: Union[TraceObserver, None] = None,
+        optimize: bool = True,
+        profile: Union[ProfileStats, None] = None,
+    ) -> Union[Callable[[Dict[str, Any]], Any], None]:
+        """
+        Same as `mvin.interpreter.get_interpreter`, but reuses a cached interpreter
+        when an identical formula was already compiled.
+        """
+        if not isinstance(tokens, Sequence):
+            return None
+
+        try:
+            key: Any = (
+                _fingerprint(tokens),
+                _map_key(proposed_functions, FunctionRegistry),
+                _map_key(registered_ops, OperatorRegistry),
+                backend,
+                observer,
+                optimize,
+                profile,
+            )
+            hash(key)
+        except (AttributeError, TypeError):
+            key = None  # unhashable token values: compile without caching
+
+        if key is not None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[0]
+
+        evaluator = _build_interpreter(
+            tokens,
+            proposed_functions,
+            registered_ops,
+            backend,
+            observer,
+            optimize,
+            profile,
+        )
+
+        with self._lock:
+            self._misses += 1
+            if key is not None:
+                # Keep the maps alive so their ids cannot be reused by other maps
+                self._entries[key] = (evaluator, proposed_functions, registered_ops)
+                if len(self._entries) > self._maxsize:
+                    self._entries.popitem(last=False)
+        return evaluator
+
+
+def get_interpreter(
+    tokens: Sequence[Token],  # enumerable
+    proposed_functions: Mapping[
+        str, Tuple[Union[Sequence, None], Callable]
+    ] = DEFAULT_FUNCTIONS,
+    registered_ops: Mapping[str, Callable[[Token, Token], Token]] = REGISTERED_OPS,
+    backend: str = "compiled",
+    cache: Union[InterpreterCache, None] = None,
+    observer: Union[TraceObserver, None] = None,
+    optimize: bool = True,
+    profile: Union[ProfileStats, None] = None,
+) -> Union[Callable[[Dict[str, Any]], Any], None]:
+    """
+    Parse `tokens` and return a callable that evaluates the formula for a dict of inputs.
+
+    Args:
+        tokens: Infix tokens (e.g. from a tokenizer).
+        proposed_functions: Function map (`"NAME("` -> (defaults, callable)). A
+            `FunctionRegistry` or `RegistryDict` is shared by reference, other
+            mappings are copied.
+        registered_ops: Operator map (operator key -> callable). An `OperatorRegistry`
+            or `RegistryDict` is shared by reference, other mappings are copied.
+        backend: `"compiled"` (default) turns the RPN into a tree of closures once, with
+            operators and functions resolved ahead of time. `"stack"` keeps the reference
+            stack machine that walks the RPN on every call.
+        cache: Optional `InterpreterCache`; identical formulas then share one compiled
+            interpreter instead of being parsed again.
+        observer: Optional `mvin.tracing.TraceObserver` notified of every consumed
+            token, applied operator, called function and evaluation result. Without
+            one, no tracing code runs at all.
+        optimize: Let the compiled backend pre-evaluate sub-expressions that do not
+            depend on inputs (constant folding). Only operators and functions marked
+            `pure` are folded. Disabled while an observer is attached.
+        profile: Optional `mvin.profiling.ProfileStats` that accumulates call counts
+            and `perf_counter_ns` times per operator key and function name. The
+            callables are wrapped when compiling; without one, nothing is wrapped.
+
+    Returns:
+        The evaluator, or None when `tokens` is not a sequence. The evaluator exposes
+        the required input keys as `.inputs`, the selected backend as `.backend`,
+        `.evaluate_batch(columns)` to evaluate many rows of columnar inputs at once (one
+        result token per row) and `.evaluate_token(inputs)`, which returns the result
+        token instead of its value.
+        `await .evaluate_async(inputs)` accepts awaitables and async providers as input
+        values and resolves them concurrently before evaluating. `.evaluate_raw(inputs)`
+        takes and returns plain Python values (see `mvin.raw`).
+        `.input_order` lists the input keys in order of first appearance;
+        `.call(*values)` and `.call_tuple(values)` take the input tokens in that order
+        and skip building an inputs dict.
+
+    Raises:
+        SyntaxError: If the formula cannot be parsed.
+        ValueError: If `backend` is unknown.
+    """
+    if cache is not None:
+        return cache.get_interpreter(
+            tokens,
+            proposed_functions,
+            registered_ops,
+            backend,
+            observer,
+            optimize,
+            profile,
+        )
+    return _build_interpreter(
+        tokens, proposed_functions, registered_ops, backend, observer, optimize, profile
+    )
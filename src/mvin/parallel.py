@@ -0,0 +1,218 @@
+"""
+This module evaluates the formulas of an `Engine` across a pool of worker processes.
+
+The dependency graph is split into weakly connected components, which never read each other's
+results. Components are grouped into chunks of similar size; a worker compiles the formulas
+of a chunk the first time it evaluates that chunk, so afterwards only input and result tokens
+cross process boundaries. With a `cache_dir`, workers load serialized programs (`mvin.program.ProgramCache`)
+instead of parsing, so restarts and new workers skip parsing entirely.
+
+Formulas must have been registered as tokens (not as interpreters), and the tokens, the
+function map and the operator map must be picklable when the platform starts worker
+processes with `spawn` (module-level functions and the built-in tokens are).
+
+Classes:
+    ParallelCalculator: Evaluates an engine's formulas with a `ProcessPoolExecutor`.
+"""
+
+import heapq
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Mapping, Sequence, Set, Tuple, Union
+
+from mvin import Token
+from mvin.engine import Engine, _cell_evaluator, _evaluate_cell
+from mvin.interpreter import InterpreterCache
+from mvin.program import ProgramCache
+
+# State of the worker process: the formula tokens of every chunk, the maps and cache to
+# compile them with, and the chunks compiled so far (chunk index -> [(ref, evaluate_token)])
+_worker_sources: List[Sequence[Tuple[str, Sequence[Token]]]] = []
+_worker_maps: List[Any] = []
+_worker_chunks: Dict[int, List[Tuple[str, Callable[[Any], Token]]]] = {}
+
+
+def _init_worker(
+    chunks: Sequence[Sequence[Tuple[str, Sequence[Token]]]],
+    proposed_functions: Mapping[str, Tuple[Union[Sequence, None], Callable]],
+    registered_ops: Mapping[str, Callable[[Token, Token], Token]],
+    cache_dir: Union[str, None] = None,
+) -> None:
+    # Worker initializer: runs once per process. Chunks are compiled on first use, so a
+    # worker only compiles the chunks it is given
+    cache: Any = (
+        InterpreterCache(maxsize=max(1, sum(len(chunk) for chunk in chunks)))
+        if cache_dir is None
+        else ProgramCache(cache_dir)
+    )
+    _worker_sources[:] = chunks
+    _worker_maps[:] = [proposed_functions, registered_ops, cache]
+    _worker_chunks.clear()
+
+
+def _compiled_chunk(index: int) -> List[Tuple[str, Callable[[Any], Token]]]:
+    compiled = _worker_chunks.get(index)
+    if compiled is None:
+        proposed_functions, registered_ops, cache = _worker_maps
+        compiled = [
+            (
+                ref,
+                _cell_evaluator(
+                    cache.get_interpreter(tokens, proposed_functions, registered_ops)
+                ),
+            )
+            for ref, tokens in _worker_sources[index]
+        ]
+        _worker_chunks[index] = compiled
+    return compiled
+
+
+def _evaluate_chunk(index: int, inputs: Dict[str, Token]) -> List[Tuple[str, Token]]:
+    values = inputs
+    results = []
+    for ref, evaluate_token in _compiled_chunk(index):
+        value = _evaluate_cell(evaluate_token, values)
+        values[ref] = value
+        results.append((ref, value))
+    return results
+
+
+class ParallelCalculator:
+    """
+    Evaluates the formulas of an `Engine` with a `ProcessPoolExecutor`.
+
+    The calculator works on a snapshot of the engine's formulas taken when it is created;
+    create a new one after changing formulas. Leaf values are read from the engine on every
+    `calculate`, so values set with `Engine.set_value` are used. Results are not written
+    back to the engine.
+
+    Use it as a context manager (or call `close()`) to shut the worker processes down.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        max_workers: Union[int, None] = None,
+        chunks_per_worker: int = 4,
+        cache_dir: Union[str, "os.PathLike[str]", None] = None,
+    ) -> None:
+        """
+        Args:
+            engine: The engine whose formulas are evaluated.
+            max_workers: Number of worker processes, defaults to `os.cpu_count()`.
+            chunks_per_worker: Components are grouped into about
+                `max_workers * chunks_per_worker` chunks of similar size, so that
+                workers finishing early can pick up more work.
+            cache_dir: Optional `ProgramCache` directory shared by the workers; they load
+                the programs stored there instead of parsing the formulas.
+
+        Raises:
+            ValueError: If a formula was registered as an interpreter, or if the
+                formulas contain a circular reference.
+        """
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if max_workers < 1 or chunks_per_worker < 1:
+            raise ValueError("max_workers and chunks_per_worker must be >= 1")
+
+        components = engine.components()
+        sources: Dict[str, Sequence[Token]] = {}
+        for component in components:
+            for ref in component:
+                source = engine.source(ref)
+                if source is None:
+                    raise ValueError(
+                        f"Formula `{ref}` was registered as an interpreter; register "
+                        "tokens to evaluate it in worker processes"
+                    )
+                sources[ref] = source
+
+        # Greedy balancing: largest components first, each into the lightest chunk
+        chunk_count = max(1, min(len(components), max_workers * chunks_per_worker))
+        heap = [(0, index) for index in range(chunk_count)]
+        assigned: List[List[List[str]]] = [[] for _ in range(chunk_count)]
+        for component in sorted(components, key=len, reverse=True):
+            size, index = heapq.heappop(heap)
+            assigned[index].append(component)
+            heapq.heappush(heap, (size + len(component), index))
+
+        self._engine = engine
+        self._chunks: List[List[str]] = [
+            [ref for component in chunk for ref in component] for chunk in assigned
+        ]
+        self._chunk_leaves: List[Set[str]] = [
+            {
+                precedent
+                for ref in chunk
+                for precedent in engine.precedents(ref)
+                if precedent not in engine
+            }
+            for chunk in self._chunks
+        ]
+        self._executor: Executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(
+                [[(ref, sources[ref]) for ref in chunk] for chunk in self._chunks],
+                engine.proposed_functions,
+                engine.registered_ops,
+                None if cache_dir is None else os.fspath(cache_dir),
+            ),
+        )
+
+    def __enter__(self) -> "ParallelCalculator":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Shuts the worker processes down."""
+        self._executor.shutdown()
+
+    def _leaf_values(
+        self, leaves: Set[str], provided: Mapping[str, Token]
+    ) -> Dict[str, Token]:
+        # The given input, or else the engine's current value, of every leaf cell
+        values = {}
+        for ref in leaves:
+            if ref in provided:
+                values[ref] = provided[ref]
+            else:
+                try:
+                    values[ref] = self._engine.value(ref)
+                except KeyError:
+                    pass  # no value: the formulas reading it get #REF!
+        return values
+
+    def calculate(
+        self, inputs: Union[Mapping[str, Token], None] = None
+    ) -> Dict[str, Token]:
+        """
+        Evaluates every formula, like `Engine.calculate`, in the worker processes.
+
+        Args:
+            inputs: Tokens for the leaf cells, added to the values already set on the
+                engine (without storing them there). Each chunk only receives the values
+                its formulas read.
+
+        Returns:
+            The result token of every formula cell; the cells of one component are
+            listed in evaluation order.
+        """
+        provided = {} if inputs is None else inputs
+        futures = [
+            self._executor.submit(
+                _evaluate_chunk, index, self._leaf_values(leaves, provided)
+            )
+            for index, leaves in enumerate(self._chunk_leaves)
+        ]
+        results: Dict[str, Token] = {}
+        for future in futures:
+            results.update(future.result())
+        return results
+
+
+__all__ = [
+    "ParallelCalculator",
+]
@@ -0,0 +1,151 @@
+"""
+This module defines the statistics collected by profiled interpreters.
+
+Profiling is opt-in: pass a `ProfileStats` to `get_interpreter(..., profile=stats)`. The
+interpreter is then compiled with every operator and function callable wrapped in a counter
+that adds the number of calls and the elapsed `time.perf_counter_ns()` to `stats`. Without a
+`ProfileStats`, no profiling code is part of the interpreter at all.
+
+One `ProfileStats` can be shared by many interpreters; stats from other interpreters or
+processes (a `ProfileStats` pickles, and `as_dict`/`from_dict` round-trip through JSON) are
+combined with `merge`.
+
+Classes:
+    ProfileEntry: Call count and cumulative time of one operator or function.
+    ProfileStats: Per-operator and per-function call counts and cumulative times.
+"""
+
+from time import perf_counter_ns
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Tuple, Union
+
+ProfileEntry = NamedTuple("ProfileEntry", [("calls", int), ("total_ns", int)])
+"""
+Call count and cumulative time (nanoseconds) of one operator or function.
+"""
+
+
+class ProfileStats:
+    """
+    Call counts and cumulative `perf_counter_ns` times per operator key (`"+"`, `"&"`, ...)
+    and per function name (`"SUM("`, ...). Prefix operators are keyed `"u-"` and `"u+"`, and
+    `"/"` counts divisions by zero as well.
+
+    Times are inclusive: the time of a `lazy` function includes evaluating the arguments
+    it asks for. Updates are not synchronized; give each thread its own `ProfileStats`
+    and `merge` them.
+    """
+
+    def __init__(self) -> None:
+        # name -> [calls, total_ns]; the lists are updated in place by the wrappers
+        self._operators: Dict[str, List[int]] = {}
+        self._functions: Dict[str, List[int]] = {}
+
+    @property
+    def operators(self) -> Dict[str, ProfileEntry]:
+        """Returns the entries of the operators that were called, by operator key."""
+        return _entries(self._operators)
+
+    @property
+    def functions(self) -> Dict[str, ProfileEntry]:
+        """Returns the entries of the functions that were called, by function name."""
+        return _entries(self._functions)
+
+    def merge(self, *others: "ProfileStats") -> "ProfileStats":
+        """Adds the counts and times of `others` to these stats and returns them."""
+        for other in others:
+            _add(self._operators, other._operators)
+            _add(self._functions, other._functions)
+        return self
+
+    def reset(self) -> None:
+        """Sets every count and time to zero."""
+        for counters in (self._operators, self._functions):
+            for entry in counters.values():
+                entry[0] = entry[1] = 0
+
+    def as_dict(self) -> Dict[str, Dict[str, List[int]]]:
+        """Returns `{"operators": {key: [calls, total_ns]}, "functions": {...}}`."""
+        return {
+            "operators": {key: list(entry) for key, entry in self.operators.items()},
+            "functions": {key: list(entry) for key, entry in self.functions.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Mapping[str, Any]]) -> "ProfileStats":
+        """Rebuilds stats from the output of `as_dict`."""
+        stats = cls()
+        _add(stats._operators, data.get("operators", {}))
+        _add(stats._functions, data.get("functions", {}))
+        return stats
+
+    def report(self, limit: Union[int, None] = None) -> str:
+        """Returns a text table of the entries, slowest (cumulative time) first."""
+        rows: List[Tuple[str, str, ProfileEntry]] = [
+            ("op", key, entry) for key, entry in self.operators.items()
+        ] + [("function", name, entry) for name, entry in self.functions.items()]
+        rows.sort(key=lambda row: row[2].total_ns, reverse=True)
+        lines = [
+            f"{'kind':<10}{'name':<16}{'calls':>10}{'total ms':>12}{'mean us':>10}"
+        ]
+        for kind, name, entry in rows[:limit]:
+            lines.append(
+                f"{kind:<10}{name:<16}{entry.calls:>10}{entry.total_ns / 1e6:>12.3f}"
+                f"{entry.total_ns / entry.calls / 1e3:>10.3f}"
+            )
+        return "\n".join(lines)
+
+    def _counter(self, kind: str, name: str) -> List[int]:
+        counters = self._operators if kind == "op" else self._functions
+        return counters.setdefault(name, [0, 0])
+
+    def __repr__(self) -> str:
+        return f"ProfileStats(operators={self.operators}, functions={self.functions})"
+
+
+def _entries(counters: Mapping[str, List[int]]) -> Dict[str, ProfileEntry]:
+    return {
+        name: ProfileEntry(entry[0], entry[1])
+        for name, entry in counters.items()
+        if entry[0]
+    }
+
+
+def _add(counters: Dict[str, List[int]], others: Mapping[str, Any]) -> None:
+    for name, (calls, total_ns) in others.items():
+        entry = counters.setdefault(name, [0, 0])
+        entry[0] += calls
+        entry[1] += total_ns
+
+
+def _profiled(stats: ProfileStats, kind: str, name: str, func: Callable) -> Callable:
+    # Wraps an operator (kind "op") or function callable, keeping its mvin marks
+    counter = stats._counter(kind, name)
+
+    def profiled(*args: Any) -> Any:
+        start = perf_counter_ns()
+        try:
+            return func(*args)
+        finally:
+            counter[0] += 1
+            counter[1] += perf_counter_ns() - start
+
+    for mark in ("__mvin_pure__", "__mvin_lazy__", "__mvin_by_reference__"):
+        if hasattr(func, mark):
+            setattr(profiled, mark, getattr(func, mark))
+    specializer = getattr(func, "__mvin_specialize__", None)
+    if specializer is not None:
+        # Specialized call sites are counted under the same name
+        def profiled_specializer(constants: Tuple[Any, ...]) -> Union[Callable, None]:
+            specialized = specializer(constants)
+            if specialized is None:
+                return None
+            return _profiled(stats, kind, name, specialized)
+
+        setattr(profiled, "__mvin_specialize__", profiled_specializer)
+    return profiled
+
+
+__all__ = [
+    "ProfileEntry",
+    "ProfileStats",
+]
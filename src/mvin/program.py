@@ -0,0 +1,421 @@
+"""
+This module serializes parsed formulas into a compact, versioned format and caches them on disk.
+
+A serialized program is the RPN produced by the parser, stored with `marshal` as:
+
+    (magic, FORMAT_VERSION, code, constants, inputs, names)
+
+`code` is the opcode stream, `constants` the constant pool (operand tokens, including the
+default arguments the parser filled in), `inputs` the input-slot table (the keys `RANGE`
+operands read) and `names` the operator keys and function names. Functions are stored by
+name only and resolved against the function map when the program is loaded, so loading skips
+tokenizing and parsing; only the (cheap) compile step runs again.
+
+Only load programs from trusted sources.
+
+Classes:
+    ProgramCache: On-disk cache of serialized programs keyed by formula fingerprint.
+
+Functions:
+    dumps: Parses a formula and serializes its program.
+    loads: Builds an interpreter from a serialized program.
+"""
+
+import hashlib
+import marshal
+import os
+import tempfile
+from typing import Any, Callable, Dict, List, Mapping, Sequence, Tuple, Union
+
+from mvin import (
+    REGISTERED_OPS,
+    TOKEN_EMPTY,
+    FunctionRegistry,
+    OperatorRegistry,
+    Token,
+    TokenBool,
+    TokenError,
+    TokenErrorTypes,
+    TokenFunc,
+    TokenNumber,
+    TokenOperator,
+    TokenPrefixOperator,
+    TokenReference,
+    TokenString,
+    __version__,
+)
+from mvin.functions.excel_lib import DEFAULT_FUNCTIONS
+from mvin.interpreter import (
+    BACKENDS,
+    _fingerprint,
+    _infix_to_rpn,
+    _interpreter_from_rpn,
+    _map_key,
+)
+from mvin.profiling import ProfileStats
+from mvin.tokenizer import tokenize
+from mvin.tracing import TraceObserver
+
+FORMAT_VERSION = 1
+"""
+Version of the serialized program format; `loads` rejects programs of any other version.
+"""
+
+_MAGIC = "mvin-program"
+
+# Opcodes; every instruction is (opcode, operand), `_OP_CALL` is followed by the arg count
+_OP_CONST = 0  # operand: constant pool index
+_OP_MISSING = 1  # operand: unused (an omitted function argument)
+_OP_REF = 2  # operand: input slot
+_OP_INFIX = 3  # operand: names index of the operator key
+_OP_PREFIX = 4  # operand: names index of the operator
+_OP_CALL = 5  # operand: names index of the function name, then the arg count
+
+
+def _encode_constant(token: Token) -> Tuple[Any, ...]:
+    subtype = token.subtype
+    if subtype in ("NUMBER", "TEXT", "LOGICAL"):
+        return (subtype, token.value)
+    if subtype == "ERROR":
+        return (subtype, token.value, getattr(token, "message", ""))
+    if subtype == "EMPTY":
+        return (subtype,)
+    raise ValueError(f"Constant `{token}` ({subtype}) cannot be serialized")
+
+
+def _decode_constant(entry: Tuple[Any, ...]) -> Token:
+    subtype = entry[0]
+    if subtype == "NUMBER":
+        return TokenNumber(entry[1])
+    if subtype == "TEXT":
+        return TokenString(entry[1])
+    if subtype == "LOGICAL":
+        return TokenBool.of(entry[1])
+    if subtype == "ERROR":
+        error_type = TokenErrorTypes(entry[1])
+        return (
+            TokenError(error_type, entry[2]) if entry[2] else TokenError.of(error_type)
+        )
+    if subtype == "EMPTY":
+        return TOKEN_EMPTY
+    raise ValueError(f"Unknown constant subtype `{subtype}`")
+
+
+def _encode(
+    rpn_tokens: Sequence[Union[Token, int, None]], inputs: Sequence[str]
+) -> bytes:
+    code: List[int] = []
+    constants: List[Tuple[Any, ...]] = []
+    constant_index: Dict[Any, int] = {}
+    names: List[str] = []
+    name_index: Dict[str, int] = {}
+    slots = {ref: slot for slot, ref in enumerate(inputs)}
+
+    def name(value: str) -> int:
+        if value not in name_index:
+            name_index[value] = len(names)
+            names.append(value)
+        return name_index[value]
+
+    i = 0
+    while i < len(rpn_tokens):
+        token = rpn_tokens[i]
+        i += 1
+        if token is None:
+            code += (_OP_MISSING, 0)
+        elif isinstance(token, int):
+            raise ValueError(f"Unexpected argument count at position {i - 1}")
+        elif token.type == "OPERAND":
+            if token.subtype == "RANGE":
+                code += (_OP_REF, slots[token.value])
+                continue
+            entry = _encode_constant(token)
+            key = (entry[0], entry[1].__class__, entry[1:]) if len(entry) > 1 else entry
+            if key not in constant_index:
+                constant_index[key] = len(constants)
+                constants.append(entry)
+            code += (_OP_CONST, constant_index[key])
+        elif token.type == "OPERATOR-INFIX":
+            code += (_OP_INFIX, name(token.value))
+        elif token.type == "OPERATOR-PREFIX":
+            code += (_OP_PREFIX, name(token.value))
+        else:  # FUNC/OPEN, always followed by its argument count
+            code += (_OP_CALL, name(token.value), rpn_tokens[i])  # type: ignore[arg-type]
+            i += 1
+
+    return marshal.dumps(
+        (
+            _MAGIC,
+            FORMAT_VERSION,
+            tuple(code),
+            tuple(constants),
+            tuple(inputs),
+            tuple(names),
+        ),
+        4,
+    )
+
+
+def _decode(
+    data: bytes,
+    functions: Mapping[str, Tuple[Union[Sequence, None], Callable]],
+) -> Tuple[List[Union[Token, int, None]], List[str]]:
+    try:
+        magic, version, code, constants, inputs, names = marshal.loads(data)
+    except (EOFError, ValueError, TypeError) as e:
+        raise ValueError(f"Invalid program data: {e}") from None
+    if magic != _MAGIC or version != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported program format `{magic}` version {version}, "
+            f"expected version {FORMAT_VERSION}"
+        )
+
+    try:
+        pool = [_decode_constant(entry) for entry in constants]
+        refs = [TokenReference(ref) for ref in inputs]
+        rpn_tokens: List[Union[Token, int, None]] = []
+        append = rpn_tokens.append
+        i = 0
+        while i < len(code):
+            opcode, operand = code[i], code[i + 1]
+            i += 2
+            if opcode == _OP_CONST:
+                append(pool[operand])
+            elif opcode == _OP_REF:
+                append(refs[operand])
+            elif opcode == _OP_MISSING:
+                append(None)
+            elif opcode == _OP_INFIX:
+                append(TokenOperator(names[operand]))
+            elif opcode == _OP_PREFIX:
+                append(TokenPrefixOperator(names[operand]))
+            elif opcode == _OP_CALL:
+                func_name = names[operand]
+                if func_name not in functions:
+                    raise ValueError(f"Unsupported function `{func_name}` in program")
+                append(TokenFunc(func_name))
+                append(code[i])
+                i += 1
+            else:
+                raise ValueError(f"Unknown opcode {opcode}")
+    except (IndexError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid program data: {e!r}") from None
+    return rpn_tokens, list(inputs)
+
+
+def dumps(
+    tokens: Sequence[Token],
+    proposed_functions: Mapping[
+        str, Tuple[Union[Sequence, None], Callable]
+    ] = DEFAULT_FUNCTIONS,
+) -> bytes:
+    """
+    Parses `tokens` and serializes the resulting program.
+
+    Args:
+        tokens: Infix tokens, as for `get_interpreter`.
+        proposed_functions: Function map used to validate calls and fill in default
+            arguments. Only function names are stored.
+
+    Returns:
+        The serialized program.
+
+    Raises:
+        SyntaxError: If the formula cannot be parsed.
+        ValueError: If a constant cannot be serialized (only number, text, logical,
+            error and empty operands can).
+    """
+    functions = FunctionRegistry.of(proposed_functions)
+    rpn_tokens, inputs = _infix_to_rpn(tokens, functions)
+    return _encode(rpn_tokens, sorted(inputs))
+
+
+def loads(
+    data: bytes,
+    proposed_functions: Mapping[
+        str, Tuple[Union[Sequence, None], Callable]
+    ] = DEFAULT_FUNCTIONS,
+    registered_ops: Mapping[str, Callable[[Token, Token], Token]] = REGISTERED_OPS,
+    backend: str = "compiled",
+    observer: Union[TraceObserver, None] = None,
+    optimize: bool = True,
+    profile: Union[ProfileStats, None] = None,
+) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Builds an interpreter from a program serialized by `dumps`, without parsing.
+
+    The arguments after `data` have the same meaning as for `get_interpreter`; function
+    names are resolved against `proposed_functions` here.
+
+    Raises:
+        ValueError: If `data` is not a program of the current `FORMAT_VERSION`, if it
+            calls a function missing from `proposed_functions`, or if `backend` is
+            unknown.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend `{backend}`, expected one of {BACKENDS}.")
+    functions = FunctionRegistry.of(proposed_functions)
+    rpn_tokens, inputs = _decode(data, functions)
+    return _interpreter_from_rpn(
+        rpn_tokens,
+        set(inputs),
+        functions,
+        OperatorRegistry.of(registered_ops),
+        backend,
+        observer,
+        optimize,
+        profile,
+    )
+
+
+class ProgramCache:
+    """
+    On-disk cache of serialized programs.
+
+    Each formula is stored in its own file under `directory`, named after a fingerprint of
+    the formula (its text, or the `type`, `subtype` and `value` of its tokens), the names
+    and default arguments of the function map, `FORMAT_VERSION` and the mvin version. A
+    restarted process (or a new worker) then loads the program instead of tokenizing and
+    parsing the formula again.
+
+    As with `InterpreterCache`, a plain (non-registry) function map is fingerprinted once
+    per object: mutating it after use is not detected.
+    """
+
+    def __init__(self, directory: Union[str, "os.PathLike[str]"]) -> None:
+        self._directory = os.fspath(directory)
+        os.makedirs(self._directory, exist_ok=True)
+        self._signatures: Dict[Any, Tuple[str, Any]] = {}
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def directory(self) -> str:
+        """Returns the cache directory."""
+        return self._directory
+
+    @property
+    def hits(self) -> int:
+        """Returns the number of programs loaded from disk."""
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """Returns the number of formulas that had to be parsed (and were stored)."""
+        return self._misses
+
+    def _signature(
+        self, functions: Mapping[str, Tuple[Union[Sequence, None], Callable]]
+    ) -> str:
+        map_key = _map_key(functions, FunctionRegistry)
+        entry = self._signatures.get(map_key)
+        if entry is None:
+            signature = repr(
+                sorted(
+                    (name, None if defaults is None else _fingerprint(defaults))
+                    for name, (defaults, _) in functions.items()
+                )
+            )
+            # Keep the map alive so its id cannot be reused by another map
+            entry = (hashlib.sha256(signature.encode()).hexdigest(), functions)
+            self._signatures[map_key] = entry
+        return entry[0]
+
+    def path(
+        self,
+        formula: Union[str, Sequence[Token]],
+        proposed_functions: Mapping[
+            str, Tuple[Union[Sequence, None], Callable]
+        ] = DEFAULT_FUNCTIONS,
+    ) -> str:
+        """Returns the file that stores the program of `formula`."""
+        source = formula if isinstance(formula, str) else _fingerprint(formula)
+        key = repr(
+            (FORMAT_VERSION, __version__, self._signature(proposed_functions), source)
+        )
+        return os.path.join(
+            self._directory, hashlib.sha256(key.encode()).hexdigest() + ".mvin"
+        )
+
+    def get_interpreter(
+        self,
+        formula: Union[str, Sequence[Token]],
+        proposed_functions: Mapping[
+            str, Tuple[Union[Sequence, None], Callable]
+        ] = DEFAULT_FUNCTIONS,
+        registered_ops: Mapping[str, Callable[[Token, Token], Token]] = REGISTERED_OPS,
+        backend: str = "compiled",
+        observer: Union[TraceObserver, None] = None,
+        optimize: bool = True,
+        profile: Union[ProfileStats, None] = None,
+    ) -> Callable[[Dict[str, Any]], Any]:
+        """
+        Like `get_interpreter`, but loads the program from disk when it was stored before.
+
+        Args:
+            formula: A formula string (tokenized with `mvin.tokenizer.tokenize` on a miss)
+                or infix tokens.
+
+        A missing, unreadable or outdated file counts as a miss: the formula is parsed
+        and its program (re)written.
+
+        Raises:
+            SyntaxError: If the formula cannot be tokenized or parsed.
+            ValueError: If a constant cannot be serialized or `backend` is unknown.
+        """
+        path = self.path(formula, proposed_functions)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            run = loads(
+                data,
+                proposed_functions,
+                registered_ops,
+                backend,
+                observer,
+                optimize,
+                profile,
+            )
+        except (OSError, ValueError):
+            pass
+        else:
+            self._hits += 1
+            return run
+
+        tokens = tokenize(formula) if isinstance(formula, str) else formula
+        data = dumps(tokens, proposed_functions)
+        # Write to a temporary file first, so readers never see a partial program
+        fd, temp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self._misses += 1
+        return loads(
+            data,
+            proposed_functions,
+            registered_ops,
+            backend,
+            observer,
+            optimize,
+            profile,
+        )
+
+    def clear(self) -> None:
+        """Removes every stored program and resets the counters."""
+        for name in os.listdir(self._directory):
+            if name.endswith(".mvin"):
+                os.unlink(os.path.join(self._directory, name))
+        self._hits = 0
+        self._misses = 0
+
+
+__all__ = [
+    "FORMAT_VERSION",
+    "ProgramCache",
+    "dumps",
+    "loads",
+]
@@ -0,0 +1,128 @@
+"""
+This module defines input providers: data sources that interpreters read cell values from on
+demand instead of from a fully built dict of tokens.
+
+Wrap a provider in `LazyInputs` and pass that to an interpreter in place of the inputs dict.
+A reference is fetched with `provider.get(ref)` only when its `RANGE` operand is evaluated, so
+inputs used only by untaken `IF`/`IFERROR`/`CHOOSE` branches or short-circuited `AND`/`OR`
+arguments are never fetched by the compiled backend. Each reference is fetched at most once per
+`LazyInputs`.
+
+To fetch in bulk instead, `prefetch` collects the union of the `inputs` of a batch of
+interpreters and issues a single `provider.get_many(refs)` call.
+
+Classes:
+    InputProvider: Abstract provider; subclasses implement `get`, may override `get_many`.
+    MappingProvider: Provider backed by a mapping of tokens.
+    LazyInputs: Read-only mapping that fetches and memoizes inputs on first access.
+
+Functions:
+    prefetch: Fetch the inputs of many interpreters with one `get_many` call.
+"""
+
+from abc import ABCMeta, abstractmethod
+from collections.abc import Mapping as MappingABC
+from typing import Any, Dict, Iterable, Iterator, Mapping, Set
+
+
+class InputProvider(metaclass=ABCMeta):
+    """
+    Abstract base class for input providers. Subclasses implement `get`; `get_many`
+    defaults to one `get` per reference and should be overridden by sources that support
+    bulk reads.
+    """
+
+    @abstractmethod
+    def get(self, ref: str) -> Any:
+        """
+        Returns the token for `ref`.
+
+        Raises:
+            KeyError: If the provider has no value for `ref`.
+        """
+        pass
+
+    def get_many(self, refs: Iterable[str]) -> Mapping[str, Any]:
+        """Returns `{ref: token}` for the `refs` the provider has a value for."""
+        found: Dict[str, Any] = {}
+        for ref in refs:
+            try:
+                found[ref] = self.get(ref)
+            except KeyError:
+                pass
+        return found
+
+
+class MappingProvider(InputProvider):
+    """
+    Provider backed by a mapping of tokens (e.g. a dict loaded elsewhere).
+    """
+
+    def __init__(self, values: Mapping[str, Any]) -> None:
+        self.values = values
+
+    def get(self, ref: str) -> Any:
+        return self.values[ref]
+
+    def get_many(self, refs: Iterable[str]) -> Mapping[str, Any]:
+        values = self.values
+        return {ref: values[ref] for ref in refs if ref in values}
+
+
+class LazyInputs(MappingABC):
+    """
+    Read-only inputs mapping that fetches a reference from `provider` the first time it is
+    looked up and memoizes the token. Iteration and `len` cover the references fetched so far.
+
+    Use a new `LazyInputs` per evaluation (or per batch of evaluations that should see the
+    same values). Lookups are not synchronized.
+    """
+
+    def __init__(self, provider: InputProvider) -> None:
+        self.provider = provider
+        self._fetched: Dict[str, Any] = {}
+
+    def __getitem__(self, ref: str) -> Any:
+        fetched = self._fetched
+        if ref in fetched:
+            return fetched[ref]
+        token = fetched[ref] = self.provider.get(ref)
+        return token
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fetched)
+
+    def __len__(self) -> int:
+        return len(self._fetched)
+
+    def __repr__(self) -> str:
+        return f"LazyInputs({self.provider!r}, fetched={sorted(self._fetched)})"
+
+
+def prefetch(interpreters: Iterable[Any], provider: InputProvider) -> Dict[str, Any]:
+    """
+    Fetch every input of a batch of interpreters with a single `provider.get_many` call.
+
+    Args:
+        interpreters: Interpreters returned by `get_interpreter` (anything with `.inputs`).
+        provider: The data source.
+
+    Returns:
+        A dict of tokens for the union of the interpreters' inputs, suitable as the inputs
+        of each of them. References the provider has no value for are left out; evaluating
+        a formula that needs one raises `KeyError` as usual.
+    """
+    refs: Set[str] = set()
+    for run in interpreters:
+        refs.update(run.inputs)
+    if not refs:
+        return {}
+    return dict(provider.get_many(sorted(refs)))
+
+
+__all__ = [
+    "InputProvider",
+    "LazyInputs",
+    "MappingProvider",
+    "prefetch",
+]
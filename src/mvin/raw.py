@@ -0,0 +1,273 @@
+"""
+This module defines the plain-Python value model used by raw evaluation
+(`run.evaluate_raw(inputs)`).
+
+Raw inputs and results are Python values instead of tokens:
+
+    int, float (and complex)  <->  NUMBER
+    str                       <->  TEXT
+    bool                      <->  LOGICAL
+    None                      <->  EMPTY
+    RawError                  <->  ERROR
+
+Anything else (a `TokenArray`, or any other token) is passed through as is. Inside the
+compiled raw closure tree, the built-in operators work on these values directly and only fall
+back to tokens (`box`, the token operator, `unbox`) for the cases their fast paths do not
+cover, so both paths give identical results.
+
+Classes:
+    RawError: Compact Excel error value; a `str` equal to the error code (e.g. "#DIV/0!").
+
+Functions:
+    box: Turn a raw value into a token.
+    unbox: Turn a token into a raw value.
+"""
+
+import operator
+from typing import Any, Callable, Dict, Union
+
+import mvin.excel_ops as _  # noqa: F401  (registers the built-in operators)
+from mvin import (
+    REGISTERED_OPS,
+    TOKEN_EMPTY,
+    Token,
+    TokenBool,
+    TokenError,
+    TokenErrorTypes,
+    TokenNumber,
+    TokenString,
+)
+
+# The operator callables defined by `mvin.excel_ops`; only these get raw fast paths
+_BUILTIN_OPS: Dict[str, Callable] = dict(REGISTERED_OPS)
+
+
+class RawError(str):
+    """
+    Excel error value of raw evaluation: a `str` equal to the error code (`"#N/A"`, ...),
+    so results compare equal to those of the token path. One shared instance per
+    `TokenErrorTypes` member: `RawError.of(error_type)`.
+    """
+
+    error_type: Any  # the TokenErrorTypes member
+
+    @staticmethod
+    def of(error_type: Any) -> "RawError":
+        """Returns the shared raw error for a `TokenErrorTypes` member."""
+        return _RAW_ERRORS[error_type]
+
+    def __repr__(self) -> str:
+        return f"RawError({str.__repr__(self)})"
+
+
+def _raw_error(error_type: Any) -> RawError:
+    error = RawError(error_type.value)
+    error.error_type = error_type
+    return error
+
+
+_RAW_ERRORS: Dict[Any, RawError] = {
+    error_type: _raw_error(error_type) for error_type in TokenErrorTypes
+}
+_RAW_ERRORS_BY_CODE: Dict[str, RawError] = {
+    error.error_type.value: error for error in _RAW_ERRORS.values()
+}
+_DIV_ZERO = _RAW_ERRORS[TokenErrorTypes.ZERO_DIV]
+
+
+class _NumberBool:
+    # A NUMBER token holding a bool, e.g. the result of `A1 > 1`; unlike a LOGICAL value
+    # it still counts as a number for the numeric operators
+    __slots__ = ("value",)
+
+    def __init__(self, value: bool) -> None:
+        self.value = value
+
+
+class _NoToken:
+    # No token at all (an empty function argument, or a function that produced nothing)
+    __slots__ = ()
+
+
+_NUMBER_TRUE = _NumberBool(True)
+_NUMBER_FALSE = _NumberBool(False)
+_NO_TOKEN = _NoToken()
+
+_BOXES: Dict[type, Callable[[Any], Any]] = {
+    int: TokenNumber,
+    float: TokenNumber,
+    complex: TokenNumber,
+    str: TokenString,
+    bool: TokenBool.of,
+    type(None): lambda value: TOKEN_EMPTY,
+    RawError: lambda value: TokenError.of(value.error_type),
+    _NumberBool: lambda value: TokenNumber(value.value),
+    _NoToken: lambda value: None,
+}
+
+# Classes handled by the arithmetic and comparison fast paths (bool is not a number here)
+_FAST_NUMBERS = frozenset((int, float))
+
+
+def box(value: Any) -> Any:
+    """Returns the token for a raw value; tokens are returned unchanged."""
+    make = _BOXES.get(value.__class__)
+    return value if make is None else make(value)
+
+
+def unbox(token: Union[Token, None]) -> Any:
+    """
+    Returns the raw value of an operand token. Tokens without a raw equivalent (arrays,
+    non-operands, unusual value types) are returned unchanged.
+    """
+    if token is None:
+        return _NO_TOKEN
+    if token.type != "OPERAND":
+        return token
+    subtype = token.subtype
+    value = token.value
+    cls = value.__class__
+    if subtype == "NUMBER":
+        if cls is bool:
+            return _NUMBER_TRUE if value else _NUMBER_FALSE
+        if cls is int or cls is float or cls is complex:
+            return value
+    elif subtype == "TEXT":
+        if cls is str:
+            return value
+    elif subtype == "LOGICAL":
+        if cls is bool:
+            return value
+    elif subtype == "ERROR":
+        return _RAW_ERRORS_BY_CODE.get(value, token)
+    elif subtype == "EMPTY":
+        return None
+    return token
+
+
+def _result(value: Any) -> Any:
+    # The raw result of an evaluation, equal to the `.value` the token path returns
+    cls = value.__class__
+    if cls is _NumberBool:
+        return value.value
+    if cls is _NoToken:
+        # Same outcome as the token path when a function produced no value
+        raise ValueError("Formula evaluation error: too many values remaining.")
+    if isinstance(value, Token):
+        return value.value
+    return value
+
+
+_COMPARISONS = {
+    "<": operator.lt,
+    ">": operator.gt,
+    "<=": operator.le,
+    ">=": operator.ge,
+}
+_ARITHMETIC = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "^": operator.pow,
+}
+
+
+def _raw_infix(
+    key: str, op: Callable[[Token, Token], Token], checked_division: bool = False
+) -> Callable[[Any, Any], Any]:
+    # `op` on raw values. Built-in operators get fast paths for plain numbers and text;
+    # every other case goes through the token operator, which defines the semantics
+    def generic(a: Any, b: Any) -> Any:
+        return unbox(op(box(a), box(b)))
+
+    if checked_division:
+
+        def checked(a: Any, b: Any) -> Any:
+            b_token = box(b)
+            if b_token.type == "OPERAND" and (
+                b_token.value == 0 or b_token.value == 0.0
+            ):
+                return _DIV_ZERO
+            return unbox(op(box(a), b_token))
+
+        generic = checked
+
+    if _BUILTIN_OPS.get(key) is not op:
+        return generic
+    fast = _FAST_NUMBERS
+
+    if key == "/":
+
+        def divide(a: Any, b: Any) -> Any:
+            if a.__class__ in fast and b.__class__ in fast:
+                if b == 0:
+                    return _DIV_ZERO
+                return a / b
+            return generic(a, b)
+
+        return divide
+
+    if key in _ARITHMETIC:
+        arithmetic = _ARITHMETIC[key]
+
+        def numeric(a: Any, b: Any) -> Any:
+            if a.__class__ in fast and b.__class__ in fast:
+                return arithmetic(a, b)
+            return generic(a, b)
+
+        return numeric
+
+    if key in _COMPARISONS:
+        compare = _COMPARISONS[key]
+
+        def comparison(a: Any, b: Any) -> Any:
+            if a.__class__ in fast and b.__class__ in fast:
+                return _NUMBER_TRUE if compare(a, b) else _NUMBER_FALSE
+            return generic(a, b)
+
+        return comparison
+
+    if key == "&":
+
+        def concat(a: Any, b: Any) -> Any:
+            if a.__class__ is str and b.__class__ is str:
+                return a + b
+            return generic(a, b)
+
+        return concat
+
+    if key in ("=", "==", "<>", "!="):
+        negate = key in ("<>", "!=")
+
+        def equal(a: Any, b: Any) -> Any:
+            cls_a = a.__class__
+            cls_b = b.__class__
+            if (cls_a in fast and cls_b in fast) or (cls_a is str and cls_b is str):
+                return (a != b) if negate else (a == b)
+            return generic(a, b)
+
+        return equal
+
+    return generic
+
+
+def _raw_prefix(
+    op_value: str, apply_prefix: Callable[[Any], Token]
+) -> Callable[[Any], Any]:
+    # Unary `+`/`-` on raw values, with the token operator for anything but plain numbers
+    fast = _FAST_NUMBERS
+    negate = op_value == "-"
+
+    def prefix(a: Any) -> Any:
+        if a.__class__ in fast:
+            return -a if negate else +a
+        return unbox(apply_prefix(box(a)))
+
+    return prefix
+
+
+__all__ = [
+    "RawError",
+    "box",
+    "unbox",
+]
@@ -0,0 +1,201 @@
+"""
+This module defines immutable, versioned snapshots of the operator and function maps used by
+the interpreter.
+
+Classes:
+    Registry: Base class for frozen name -> entry maps with a version number.
+    OperatorRegistry: Snapshot of an operator map (operator key -> callable).
+    FunctionRegistry: Snapshot of a function map (`"NAME("` -> (defaults, callable)).
+    RegistryDict: Mutable dict that tracks its mutations and hands out cached snapshots.
+
+Every snapshot gets a version number that is unique for the process, so a version identifies
+both the registry and its content. Compiled interpreters keep a reference to the snapshot they
+were built with instead of copying the maps.
+"""
+
+import itertools
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    Mapping,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
+
+_versions = itertools.count(1)
+
+RegistryType = TypeVar("RegistryType", bound="Registry")
+
+
+class Registry(Mapping[str, Any]):
+    """
+    Immutable, versioned map of names to entries.
+    """
+
+    __slots__ = ("_entries", "_version")
+
+    def __init__(self, entries: Union[Mapping[str, Any], None] = None) -> None:
+        self._entries: Dict[str, Any] = (
+            {} if entries is None else {k: self._entry(v) for k, v in entries.items()}
+        )
+        self._version = next(_versions)
+
+    @staticmethod
+    def _entry(value: Any) -> Any:
+        """Normalizes an entry before it is stored."""
+        return value
+
+    @classmethod
+    def of(cls: Type[RegistryType], mapping: Mapping[str, Any]) -> RegistryType:
+        """
+        Returns a snapshot of `mapping`.
+
+        Registries of the same class are returned as-is and `RegistryDict`s hand out a
+        snapshot cached until their next mutation, so neither is copied. Any other
+        mapping is copied defensively.
+        """
+        if isinstance(mapping, cls):
+            return mapping
+        if isinstance(mapping, RegistryDict):
+            return mapping.snapshot(cls)
+        return cls(mapping)
+
+    @property
+    def version(self) -> int:
+        """Returns the version number of this snapshot."""
+        return self._version
+
+    def updated(self: RegistryType, entries: Mapping[str, Any]) -> RegistryType:
+        """Returns a new snapshot with `entries` added or replaced."""
+        merged = dict(self._entries)
+        merged.update(entries)
+        return type(self)(merged)
+
+    def without(self: RegistryType, *names: str) -> RegistryType:
+        """Returns a new snapshot without the given names."""
+        return type(self)({k: v for k, v in self._entries.items() if k not in names})
+
+    def __getitem__(self, key: str) -> Any:
+        return self._entries[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}<v:{self._version} n:{len(self._entries)}>"
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Versions are only unique within a process: an unpickled copy gets a new one
+        return (type(self), (self._entries,))
+
+
+class OperatorRegistry(Registry):
+    """
+    Immutable, versioned snapshot of an operator map (operator key -> callable).
+    """
+
+    __slots__ = ()
+
+    def register(self, key: str, func: Callable) -> "OperatorRegistry":
+        """Returns a new snapshot where `key` maps to `func`."""
+        return self.updated({key: func})
+
+
+class FunctionRegistry(Registry):
+    """
+    Immutable, versioned snapshot of a function map (`"NAME("` -> (defaults, callable)).
+
+    Default argument lists are stored as tuples so they cannot be changed afterwards.
+    """
+
+    __slots__ = ()
+
+    @staticmethod
+    def _entry(value: Any) -> Any:
+        defaults, func_callable = value
+        return (tuple(defaults) if defaults is not None else None, func_callable)
+
+    def register(
+        self, name: str, defaults: Union[Sequence, None], func: Callable
+    ) -> "FunctionRegistry":
+        """Returns a new snapshot where `name` maps to `(defaults, func)`."""
+        return self.updated({name: (defaults, func)})
+
+
+class RegistryDict(dict):
+    """
+    Mutable dict that tracks mutations and caches registry snapshots of its content.
+
+    `REGISTERED_OPS` and `DEFAULT_FUNCTIONS` are `RegistryDict`s, so interpreters built
+    from them share one snapshot until the maps are modified again.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._snapshots: Dict[type, Registry] = {}
+
+    def snapshot(self, registry_cls: Type[RegistryType]) -> RegistryType:
+        """Returns a snapshot of the current content, reused until the next mutation."""
+        cached = self._snapshots.get(registry_cls)
+        if cached is None:
+            cached = registry_cls(self)
+            self._snapshots[registry_cls] = cached
+        return cached  # type: ignore[return-value]
+
+    def _mutated(self) -> None:
+        self._snapshots = {}
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        super().__setitem__(key, value)
+        self._mutated()
+
+    def __delitem__(self, key: Any) -> None:
+        super().__delitem__(key)
+        self._mutated()
+
+    def __ior__(self, other: Any) -> "RegistryDict":  # type: ignore[override,misc]
+        super().update(other)
+        self._mutated()
+        return self
+
+    def clear(self) -> None:
+        super().clear()
+        self._mutated()
+
+    def pop(self, *args: Any) -> Any:
+        value = super().pop(*args)
+        self._mutated()
+        return value
+
+    def popitem(self) -> Tuple[Any, Any]:
+        item = super().popitem()
+        self._mutated()
+        return item
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        value = super().setdefault(key, default)
+        self._mutated()
+        return value
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        super().update(*args, **kwargs)
+        self._mutated()
+
+
+__all__ = [
+    "Registry",
+    "OperatorRegistry",
+    "FunctionRegistry",
+    "RegistryDict",
+]
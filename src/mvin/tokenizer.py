@@ -0,0 +1,209 @@
+"""
+This module turns formula strings into the infix tokens `get_interpreter` consumes.
+
+The tokenizer scans the formula once with a single compiled regular expression and builds the
+mvin tokens directly, without an intermediate token representation:
+
+    =SUM(A1:B2, -C1) * 2
+    -> FUNC/OPEN "SUM(", OPERAND/RANGE "A1:B2", SEP/ARG ",", OPERATOR-PREFIX "-",
+       OPERAND/RANGE "C1", FUNC/CLOSE ")", OPERATOR-INFIX "*", OPERAND/NUMBER 2
+
+References (`A1`, `$A$1:B2`, `Sheet1!A1`, `'My sheet'!A:A`, `1:3`, defined names, table
+references) become `RANGE` operands whose value is the reference text as written, i.e. the
+key of the evaluation inputs. Function names are upper-cased and the `_xlfn.`/`_xlws.`
+prefixes written by Excel for newer functions are dropped. White space is skipped; array
+constants (`{1,2}`) and the percent operator are not supported.
+
+Functions:
+    tokenize: Splits a formula string into infix tokens.
+    get_interpreter_from_string: Tokenizes a formula string and returns its interpreter.
+"""
+
+import re
+from typing import Any, Callable, Dict, List, Mapping, Sequence, Tuple, Union
+
+from mvin import (
+    REGISTERED_OPS,
+    Token,
+    TokenBool,
+    TokenError,
+    TokenErrorTypes,
+    TokenFunc,
+    TokenFuncClose,
+    TokenNumber,
+    TokenOperator,
+    TokenParen,
+    TokenPrefixOperator,
+    TokenReference,
+    TokenSeparator,
+    TokenString,
+)
+from mvin.functions.excel_lib import DEFAULT_FUNCTIONS
+from mvin.interpreter import InterpreterCache, get_interpreter
+from mvin.profiling import ProfileStats
+from mvin.tracing import TraceObserver
+
+_ERRORS: Dict[str, TokenError] = {
+    error_type.value: TokenError.of(error_type) for error_type in TokenErrorTypes
+}
+
+_CELL = r"\$?[A-Za-z]{1,3}\$?[0-9]+"
+_SHEET = r"(?:\[[0-9]+\])?(?:'(?:[^']|'')+'|[A-Za-z0-9_.]+)!"
+_NAME = r"[A-Za-z_\\][A-Za-z0-9_.]*(?:\[(?:[^\[\]]|\[[^\]]*\])*\])?"
+
+# Alternatives are tried in order; the first group that matches names the token kind
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<space>\s+)
+    | (?P<string>"(?:[^"]|"")*")
+    | (?P<error>{errors})
+    | (?P<func>(?:_xlfn\.|_xlws\.)?[A-Za-z_][A-Za-z0-9_.]*)\(
+    | (?P<ref>(?:{sheet})?(?:
+          {cell}(?::{cell})?
+        | \$?[A-Za-z]{{1,3}}:\$?[A-Za-z]{{1,3}}
+        | \$?[0-9]+:\$?[0-9]+
+        | {name}
+      ))(?![A-Za-z0-9_.(])
+    | (?P<number>(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?)
+    | (?P<op><>|<=|>=|[-+*/^&=<>])
+    | (?P<open>\()
+    | (?P<close>\))
+    | (?P<sep>,)
+    """.format(
+        errors="|".join(re.escape(error) for error in sorted(_ERRORS, reverse=True)),
+        sheet=_SHEET,
+        cell=_CELL,
+        name=_NAME,
+    ),
+    re.VERBOSE,
+)
+
+_BOOLEANS = {"TRUE": TokenBool.of(True), "FALSE": TokenBool.of(False)}
+_OPERATORS = {op: TokenOperator(op) for op in ("<>", "<=", ">=", "-", "+", "*", "/")}
+_OPERATORS.update({op: TokenOperator(op) for op in ("^", "&", "=", "<", ">")})
+_PREFIX_OPERATORS = {op: TokenPrefixOperator(op) for op in ("+", "-")}
+_OPEN = TokenParen("OPEN")
+_CLOSE = TokenParen("CLOSE")
+_FUNC_CLOSE = TokenFuncClose()
+_SEPARATOR = TokenSeparator(",")
+
+
+def _number(text: str) -> TokenNumber:
+    if "." in text or "e" in text or "E" in text:
+        return TokenNumber(float(text))
+    return TokenNumber(int(text))
+
+
+def tokenize(formula: str) -> List[Token]:
+    """
+    Splits a formula string into the infix tokens `get_interpreter` consumes.
+
+    Args:
+        formula: The formula, with or without the leading `=`.
+
+    Returns:
+        The tokens in formula order. `+`/`-` are prefix operators at the start of an
+        operand and infix operators otherwise; the `)` closing a function call is a
+        `FUNC`/`CLOSE` token.
+
+    Raises:
+        SyntaxError: If the formula contains a character sequence that is not a token
+            (including array constants, `%` and unterminated strings).
+    """
+    start = 1 if formula.startswith("=") else 0
+    end = len(formula)
+    tokens: List[Token] = []
+    append = tokens.append
+    calls: List[bool] = []  # open parentheses, True for function calls
+    operand_before = False  # whether `+`/`-` would follow an operand
+
+    match = _TOKEN_PATTERN.match
+    position = start
+    while position < end:
+        found = match(formula, position)
+        if found is None:
+            raise SyntaxError(
+                f"Unexpected character `{formula[position]}` at position {position}."
+            )
+        kind = found.lastgroup
+        text = found.group(kind)  # type: ignore[arg-type]
+        position = found.end()
+
+        if kind == "space":
+            continue
+        if kind == "ref":
+            boolean = _BOOLEANS.get(text.upper())
+            append(TokenReference(text) if boolean is None else boolean)
+            operand_before = True
+        elif kind == "number":
+            append(_number(text))
+            operand_before = True
+        elif kind == "op":
+            if not operand_before and text in _PREFIX_OPERATORS:
+                append(_PREFIX_OPERATORS[text])
+            else:
+                append(_OPERATORS[text])
+            operand_before = False
+        elif kind == "func":
+            name = text.upper()
+            if name.startswith(("_XLFN.", "_XLWS.")):
+                name = name[6:]
+            append(TokenFunc(name + "("))
+            calls.append(True)
+            operand_before = False
+        elif kind == "sep":
+            append(_SEPARATOR)
+            operand_before = False
+        elif kind == "open":
+            append(_OPEN)
+            calls.append(False)
+            operand_before = False
+        elif kind == "close":
+            append(_FUNC_CLOSE if calls and calls.pop() else _CLOSE)
+            operand_before = True
+        elif kind == "string":
+            append(TokenString(text[1:-1].replace('""', '"')))
+            operand_before = True
+        else:  # error literal
+            append(_ERRORS[text])
+            operand_before = True
+    return tokens
+
+
+def get_interpreter_from_string(
+    formula: str,
+    proposed_functions: Mapping[
+        str, Tuple[Union[Sequence, None], Callable]
+    ] = DEFAULT_FUNCTIONS,
+    registered_ops: Mapping[str, Callable[[Token, Token], Token]] = REGISTERED_OPS,
+    backend: str = "compiled",
+    cache: Union[InterpreterCache, None] = None,
+    observer: Union[TraceObserver, None] = None,
+    optimize: bool = True,
+    profile: Union[ProfileStats, None] = None,
+) -> Union[Callable[[Dict[str, Any]], Any], None]:
+    """
+    Tokenizes `formula` with `tokenize` and returns `get_interpreter` for its tokens.
+
+    The remaining arguments are passed to `get_interpreter` unchanged.
+
+    Raises:
+        SyntaxError: If the formula cannot be tokenized or parsed.
+        ValueError: If `backend` is unknown.
+    """
+    return get_interpreter(
+        tokenize(formula),
+        proposed_functions,
+        registered_ops,
+        backend=backend,
+        cache=cache,
+        observer=observer,
+        optimize=optimize,
+        profile=profile,
+    )
+
+
+__all__ = [
+    "tokenize",
+    "get_interpreter_from_string",
+]
@@ -0,0 +1,105 @@
+"""
+This module defines the observer interface used to trace parsing and evaluation.
+
+Tracing is opt-in: pass an observer to `get_interpreter(..., observer=...)`. Without one, the
+parser and the compiled evaluator skip every hook, so an unobserved interpreter pays nothing
+for tracing.
+
+Classes:
+    TraceEvent: A structured trace event.
+    TraceObserver: Base observer; every hook is a no-op.
+    RecordingObserver: Observer that keeps every event in memory.
+    LoggingObserver: Observer that writes events to a `logging.Logger` at DEBUG level.
+"""
+
+import logging
+from typing import Any, List, NamedTuple, Sequence, Union
+
+TraceEvent = NamedTuple(
+    "TraceEvent",
+    [("kind", str), ("name", str), ("args", Sequence[Any]), ("result", Any)],
+)
+"""
+A structured trace event.
+
+kind is one of:
+    "token": the parser consumed `args[0]` at position `name`.
+    "op": operator `name` was applied to `args`, producing `result`.
+    "function": function `name` was called with `args`, producing `result`.
+    "result": the evaluation finished with `result`.
+"""
+
+
+class TraceObserver:
+    """
+    Base class for trace observers. Every hook is a no-op; override the ones you need.
+    """
+
+    def token_consumed(self, position: int, token: Any) -> None:
+        """Called by the parser for every (non white-space) token it consumes."""
+
+    def op_applied(self, operator: str, args: Sequence[Any], result: Any) -> None:
+        """Called after an infix (`"+"`) or prefix (`"u-"`) operator was applied."""
+
+    def function_called(self, name: str, args: Sequence[Any], result: Any) -> None:
+        """
+        Called after a function returned.
+
+        With the compiled backend, `args` of a `lazy` function are its argument thunks.
+        """
+
+    def evaluated(self, result: Any) -> None:
+        """Called with the result token of a whole evaluation."""
+
+
+class RecordingObserver(TraceObserver):
+    """
+    Observer that records every event as a `TraceEvent` in `events`.
+    """
+
+    def __init__(self) -> None:
+        self.events: List[TraceEvent] = []
+
+    def token_consumed(self, position: int, token: Any) -> None:
+        self.events.append(TraceEvent("token", str(position), (token,), None))
+
+    def op_applied(self, operator: str, args: Sequence[Any], result: Any) -> None:
+        self.events.append(TraceEvent("op", operator, tuple(args), result))
+
+    def function_called(self, name: str, args: Sequence[Any], result: Any) -> None:
+        self.events.append(TraceEvent("function", name, tuple(args), result))
+
+    def evaluated(self, result: Any) -> None:
+        self.events.append(TraceEvent("result", "", (), result))
+
+
+class LoggingObserver(TraceObserver):
+    """
+    Observer that logs every event at DEBUG level.
+
+    Messages use lazy `%`-formatting, so nothing is formatted unless DEBUG is enabled
+    for the logger.
+    """
+
+    def __init__(self, logger: Union[logging.Logger, None] = None) -> None:
+        self.logger = logger if logger is not None else logging.getLogger("mvin")
+
+    def token_consumed(self, position: int, token: Any) -> None:
+        self.logger.debug("parser: token %s at position %s", token, position)
+
+    def op_applied(self, operator: str, args: Sequence[Any], result: Any) -> None:
+        self.logger.debug("interpreter: applied op %s to %s -> %s", operator, args, result)
+
+    def function_called(self, name: str, args: Sequence[Any], result: Any) -> None:
+        self.logger.debug("interpreter: called %s with %s -> %s", name, args, result)
+
+    def evaluated(self, result: Any) -> None:
+        self.logger.debug("interpreter: result %s", result)
+
+
+__all__ = [
+    "TraceEvent",
+    "TraceObserver",
+    "RecordingObserver",
+    "LoggingObserver",
+]
@@ -0,0 +1,248 @@
+import pytest
+
+from mvin import BaseToken, TokenArray, TokenError, TokenNumber, TokenString
+from mvin.engine import Engine
+from mvin.interpreter import InterpreterCache, get_interpreter
+
+
+class ManualToken(BaseToken):
+    def __init__(self, value, token_type, subtype) -> None:
+        super().__init__()
+        self._value = value
+        self._type = token_type
+        self._subtype = subtype
+
+
+def ref(name):
+    return ManualToken(name, "OPERAND", "RANGE")
+
+
+def op(value):
+    return ManualToken(value, "OPERATOR-INFIX", "")
+
+
+def test_calculate_evaluates_in_dependency_order():
+    engine = Engine()
+    engine.set_formula("C1", [ref("B1"), op("*"), TokenNumber(2)])
+    engine.set_formula("B1", [ref("A1"), op("+"), ref("A2")])
+    engine.set_formula("D1", [ref("C1"), op("&"), TokenString("!")])
+
+    assert engine.order() == ["B1", "C1", "D1"]
+    assert engine.leaves() == {"A1", "A2"}
+    assert engine.precedents("B1") == {"A1", "A2"}
+    assert engine.dependents("B1") == {"C1"}
+
+    results = engine.calculate({"A1": TokenNumber(1), "A2": TokenNumber(2)})
+    assert list(results) == ["B1", "C1", "D1"]
+    assert [token.value for token in results.values()] == [3, 6, "6!"]
+    assert results["C1"].subtype == "NUMBER"
+
+
+def test_result_tokens_are_passed_without_rewrapping():
+    shared = TokenString("abc")
+    engine = Engine()
+    engine.set_formula("B1", [ref("A1")])
+    engine.set_formula("C1", [ref("B1")])
+    results = engine.calculate({"A1": shared})
+    assert results["B1"] is shared and results["C1"] is shared
+
+
+def test_circular_references_are_rejected():
+    engine = Engine()
+    engine.set_formula("A1", [ref("C1"), op("+"), TokenNumber(1)])
+    engine.set_formula("B1", [ref("A1")])
+    engine.set_formula("C1", [ref("B1")])
+    engine.set_formula("D1", [ref("C1")])
+    with pytest.raises(ValueError, match="Circular reference: (.+ -> ){3}"):
+        engine.calculate()
+
+    engine.set_formula("A1", [TokenNumber(1)])  # breaking the cycle
+    assert engine.calculate()["D1"].value == 1
+
+    engine.set_formula("E1", [ref("E1")])
+    with pytest.raises(ValueError, match="E1 -> E1"):
+        engine.order()
+
+
+def test_errors_flow_into_dependents():
+    engine = Engine()
+    engine.set_formula("B1", [ref("A1"), op("/"), TokenNumber(0)])
+    engine.set_formula("C1", [ref("B1"), op("+"), TokenNumber(1)])
+    engine.set_formula("D1", [ref("MISSING")])
+    results = engine.calculate({"A1": TokenNumber(1)})
+    assert results["C1"].value == "#DIV/0!"
+    assert isinstance(results["D1"], TokenError) and results["D1"].value == "#REF!"
+
+
+def test_set_formula_accepts_interpreters_and_can_be_undone():
+    cache = InterpreterCache()
+    engine = Engine(cache=cache)
+    engine.set_formula("B1", [ref("A1"), op("+"), TokenNumber(1)])
+    engine.set_formula("B2", [ref("A1"), op("+"), TokenNumber(1)])
+    assert cache.info().hits == 1
+    engine.set_formula("C1", get_interpreter([ref("B1"), op("+"), ref("B2")]))
+    assert "C1" in engine and len(engine) == 3
+    assert engine.calculate({"A1": TokenNumber(1)})["C1"].value == 4
+
+    engine.remove_formula("B2")
+    assert engine.leaves() == {"A1", "B2"}
+    assert engine.calculate({"A1": TokenNumber(1), "B2": TokenNumber(10)})["C1"].value == 12
+    engine.set_formula("B1", [TokenNumber(5)])
+    assert engine.dependents("A1") == set()
+    with pytest.raises(KeyError):
+        engine.remove_formula("B2")
+    with pytest.raises(TypeError):
+        engine.set_formula("X1", 42)  # type: ignore[arg-type]
+
+
+def counting_engine(calls):
+    def probe(value):
+        calls.append(value.value)
+        return value
+
+    from mvin.functions.excel_lib import DEFAULT_FUNCTIONS
+
+    functions = dict(DEFAULT_FUNCTIONS)
+    functions["PROBE("] = ([None], probe)
+    return Engine(proposed_functions=functions)
+
+
+def probe(*tokens):
+    return [ManualToken("PROBE(", "FUNC", "OPEN"), *tokens, ManualToken(")", "FUNC", "CLOSE")]
+
+
+def test_recalc_only_evaluates_transitive_dependents():
+    calls = []
+    engine = counting_engine(calls)
+    engine.set_formula("B1", probe(ref("A1"), op("+"), TokenNumber(1)))
+    engine.set_formula("C1", probe(ref("B1"), op("*"), TokenNumber(2)))
+    engine.set_formula("B2", probe(ref("A2")))
+    engine.set_value("A1", TokenNumber(1))
+    engine.set_value("A2", TokenString("x"))
+    assert {ref: token.value for ref, token in engine.recalc().items()} == {
+        "B1": 2,
+        "C1": 4,
+        "B2": "x",
+    }
+    assert set(calls) == {2, 4, "x"}
+
+    calls.clear()
+    engine.set_value("A1", TokenNumber(5))
+    results = engine.recalc()
+    assert {ref: token.value for ref, token in results.items()} == {"B1": 6, "C1": 12}
+    assert calls == [6, 12]
+    assert engine.value("C1").value == 12 and engine.value("A2").value == "x"
+
+    calls.clear()
+    assert engine.recalc() == {}
+    engine.set_value("A1", TokenNumber(5))  # same value: nothing to do
+    assert engine.recalc() == {} and calls == []
+
+
+def test_recalc_stops_when_a_value_does_not_change():
+    calls = []
+    engine = counting_engine(calls)
+    engine.set_formula("B1", [ref("A1"), op(">"), TokenNumber(10)])
+    engine.set_formula("C1", probe(ref("B1")))
+    engine.set_formula("D1", probe(ref("C1"), op("&"), ref("A1")))
+    engine.calculate({"A1": TokenNumber(1)})
+    calls.clear()
+
+    engine.set_value("A1", TokenNumber(2))  # B1 stays FALSE: C1 is not evaluated again
+    results = engine.recalc()
+    assert list(results) == ["D1"]
+    assert results["D1"].value.endswith("2")
+    assert calls == [results["D1"].value]
+
+
+def test_recalc_follows_formula_edits():
+    engine = Engine()
+    engine.set_formula("B1", [ref("A1")])
+    engine.set_formula("C1", [ref("B1"), op("+"), TokenNumber(1)])
+    engine.calculate({"A1": TokenNumber(1)})
+
+    engine.set_formula("B1", [ref("A1"), op("*"), TokenNumber(10)])
+    assert {ref: token.value for ref, token in engine.recalc().items()} == {"B1": 10, "C1": 11}
+
+    engine.remove_formula("B1")
+    assert engine.recalc()["C1"].value == "#REF!"
+    engine.set_value("B1", TokenNumber(41))
+    assert engine.recalc()["C1"].value == 42
+
+    with pytest.raises(ValueError):
+        engine.set_value("C1", TokenNumber(0))
+    with pytest.raises(KeyError):
+        engine.value("Z9")
+
+
+def test_recalc_sees_arrays_modified_in_place():
+    engine = Engine()
+    engine.set_formula("B1", [ManualToken("SUM(", "FUNC", "OPEN"), ref("A1:A3"), ManualToken(")", "FUNC", "CLOSE")])
+    values = TokenArray.column([1, 2, 3])
+    assert engine.calculate({"A1:A3": values})["B1"].value == 6
+
+    values.set(0, 0, 10)
+    engine.set_value("A1:A3", values)  # the same array object, with a new value
+    assert engine.recalc()["B1"].value == 15
+
+
+def test_recalc_matches_full_calculation_after_number_type_edits():
+    from mvin import TokenBool
+    from mvin.tokenizer import tokenize
+
+    formulas = {
+        "B1": '=A1 & ""',
+        "C1": "=B1 & A1",
+        "D1": "=IF(A2, A1 > 0, 1)",  # TRUE (a comparison) or 1, both NUMBER tokens
+        "E1": '=D1 & ""',
+    }
+
+    def build():
+        engine = Engine()
+        for cell, formula in formulas.items():
+            engine.set_formula(cell, tokenize(formula))
+        return engine
+
+    engine = build()
+    engine.calculate({"A1": TokenNumber(1), "A2": TokenBool(True)})
+    edits = [
+        ("A1", TokenNumber(1.0)),
+        ("A1", TokenNumber(True)),
+        ("A1", TokenNumber(1)),
+        ("A2", TokenBool(False)),
+        ("A1", TokenNumber(0.0)),
+        ("A1", TokenNumber(False)),
+    ]
+    for cell, token in edits:
+        engine.set_value(cell, token)
+        engine.recalc()
+        fresh = build().calculate({"A1": engine.value("A1"), "A2": engine.value("A2")})
+        assert {ref: engine.value(ref).value for ref in formulas} == {
+            ref: result.value for ref, result in fresh.items()
+        }, (cell, token.value)
+
+
+def test_stack_backend_cells_only_receive_their_own_inputs():
+    from mvin.tokenizer import tokenize
+
+    engine = Engine()
+    deep = "=" + " + ".join(f"A{i}" for i in range(300))  # deeper than the compiler's limit
+    engine.set_formula("B1", tokenize(deep))
+    engine.set_formula("B2", tokenize("=B1 * 2"))
+    assert engine._formulas["B1"].backend == "stack"
+
+    seen = []
+    run = engine._formulas["B1"]
+    evaluate_token = run.evaluate_token
+    run.evaluate_token = lambda values: seen.append(set(values)) or evaluate_token(values)
+    engine._order = None  # rebuild the evaluation order with the recording evaluator
+
+    sheet = {f"A{i}": TokenNumber(1) for i in range(300)}
+    sheet.update({f"Z{i}": TokenNumber(0) for i in range(1000)})  # unrelated cells
+    assert engine.calculate(sheet)["B2"].value == 600
+    assert seen == [{f"A{i}" for i in range(300)}]
+
+    # A missing input is still reported as #REF!
+    partial = Engine()
+    partial.set_formula("B1", tokenize(deep))
+    assert partial.calculate({"A1": TokenNumber(1)})["B1"].value == "#REF!"
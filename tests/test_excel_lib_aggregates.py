@@ -0,0 +1,145 @@
+import pytest
+
+from mvin import (
+    TOKEN_EMPTY,
+    TokenArray,
+    TokenBool,
+    TokenError,
+    TokenErrorTypes,
+    TokenNumber,
+    TokenString,
+)
+from mvin.functions.excel_lib import (
+    excel_average,
+    excel_count,
+    excel_counta,
+    excel_max,
+    excel_min,
+    excel_product,
+    excel_sum,
+)
+
+NA = TokenError(TokenErrorTypes.NA, "missing")
+MIXED = TokenArray.column([1, 2.5, "text", True, None, 4])
+
+
+@pytest.mark.parametrize(
+    "func, expected",
+    [
+        (excel_sum, 7.5),
+        (excel_average, 2.5),
+        (excel_min, 1.0),
+        (excel_max, 4.0),
+        (excel_product, 10.0),
+        (excel_count, 3),
+        (excel_counta, 5),
+    ],
+)
+def test_ranges_skip_text_logical_and_empty(func, expected):
+    assert func(MIXED).value == expected
+
+
+@pytest.mark.parametrize(
+    "func, expected",
+    [
+        (excel_sum, 7.0),  # 1 + 2 + TRUE + "3" + empty argument
+        (excel_average, 1.4),
+        (excel_min, 0.0),
+        (excel_max, 3.0),
+        (excel_product, 0.0),
+        (excel_count, 5),
+        (excel_counta, 5),
+    ],
+)
+def test_direct_arguments_are_converted(func, expected):
+    args = (TokenNumber(1), TokenNumber(2), TokenBool(True), TokenString("3"), None)
+    assert func(*args).value == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("func", [excel_sum, excel_average, excel_min, excel_max, excel_product])
+def test_errors_propagate(func):
+    with_error = TokenArray.column([1, NA, TokenError(TokenErrorTypes.REF, "")])
+    assert func(TokenNumber(1), with_error) is NA
+    assert func(NA).value == "#N/A"
+    assert func(TokenString("abc")).value == "#VALUE!"
+    assert func().value == "#VALUE!"
+
+
+def test_count_functions_never_propagate_errors():
+    with_error = TokenArray.column([1, NA, "x", None])
+    assert excel_count(with_error, NA, TokenString("abc")).value == 1
+    assert excel_counta(with_error, NA, TOKEN_EMPTY).value == 5
+    assert excel_count().value == excel_counta().value == "#VALUE!"
+
+
+def test_empty_ranges():
+    empty = TokenArray.column([None, "text"])
+    assert excel_sum(empty).value == 0
+    assert excel_min(empty).value == excel_max(empty).value == 0
+    assert excel_product(empty).value == 0
+    assert excel_average(empty).value == "#DIV/0!"
+
+
+def test_large_numeric_ranges_use_exact_summation():
+    values = TokenArray.from_numbers([0.1] * 100_000)
+    assert excel_sum(values).value == 10_000.0
+    assert excel_average(values, values).value == 0.1
+    assert excel_max(TokenArray.from_numbers(range(100_000))).value == 99_999
+    assert excel_product(TokenArray.from_numbers([1e200, 1e200])).value == "#NUM!"
+
+
+def test_aggregates_are_registered():
+    from mvin import BaseToken
+    from mvin.interpreter import get_interpreter
+
+    class ManualToken(BaseToken):
+        def __init__(self, value, token_type, subtype) -> None:
+            super().__init__()
+            self._value = value
+            self._type = token_type
+            self._subtype = subtype
+
+    tokens = [
+        ManualToken("SUM(", "FUNC", "OPEN"),
+        ManualToken("A1:A6", "OPERAND", "RANGE"),
+        ManualToken(",", "SEP", "ARG"),
+        TokenNumber(10),
+        ManualToken(")", "FUNC", "CLOSE"),
+    ]
+    for backend in ("compiled", "stack"):
+        run = get_interpreter(tokens, backend=backend)
+        assert run is not None and run({"A1:A6": MIXED}) == 17.5
+
+
+@pytest.mark.parametrize("backend", ["compiled", "stack"])
+def test_referenced_cells_are_treated_like_range_cells(backend):
+    from mvin.tokenizer import get_interpreter_from_string
+
+    def run(formula, **inputs):
+        return get_interpreter_from_string(formula, backend=backend)(inputs)
+
+    two = TokenNumber(2)
+    assert run("=SUM(A1, A2)", A1=TokenString("abc"), A2=two) == 2
+    assert run("=AVERAGE(A1, A2)", A1=TokenString("abc"), A2=two) == 2
+    assert run("=COUNT(A1, A2)", A1=TokenBool(True), A2=two) == 1
+    assert run("=COUNTA(A1)", A1=TOKEN_EMPTY) == 0
+    # Values typed into the formula and computed values keep their conversions
+    assert run('=SUM("3", TRUE, A1)', A1=two) == 6
+    assert run('=SUM(A1 & "")', A1=TokenString("abc")) == "#VALUE!"
+    assert run("=COUNT(TRUE, A1)", A1=TokenBool(True)) == 1
+    assert run("=SUM(A1, A2)", A1=NA, A2=two) == "#N/A"
+
+
+@pytest.mark.parametrize("backend", ["compiled", "stack"])
+def test_integer_sums_stay_integers(backend):
+    from mvin.tokenizer import get_interpreter_from_string
+
+    def run(formula, **inputs):
+        return get_interpreter_from_string(formula, backend=backend)(inputs)
+
+    assert run('=SUM(1, 2) & ""') == "3"
+    assert run('=SUM(A1, 2) & ""', A1=TokenNumber(1)) == "3"
+    assert run('=SUM(1, 0.5) & ""') == "1.5"
+    assert run('=SUM(1, TRUE, A1) & ""', A1=TOKEN_EMPTY) == "2"
+    assert type(excel_sum(TokenNumber(10**20), TokenNumber(1)).value) is int
+    assert excel_sum(TokenNumber(1), TokenArray.column([2])).value == 3.0
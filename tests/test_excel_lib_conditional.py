@@ -0,0 +1,150 @@
+import pytest
+
+from mvin import (
+    BaseToken,
+    TokenArray,
+    TokenBool,
+    TokenError,
+    TokenErrorTypes,
+    TokenNumber,
+    TokenString,
+)
+from mvin.functions.excel_lib import (
+    _parse_criterion,
+    excel_averageifs,
+    excel_countifs,
+    excel_sumifs,
+)
+from mvin.interpreter import get_interpreter
+
+
+class ManualToken(BaseToken):
+    def __init__(self, value, token_type, subtype) -> None:
+        super().__init__()
+        self._value = value
+        self._type = token_type
+        self._subtype = subtype
+
+
+REGIONS = TokenArray.column(["North", "south", "North", "East", None, "Northwest", True, 12])
+AMOUNTS = TokenArray.column([10, 20, 30, 40, 50, 60, 70, 80])
+
+
+def text(value):
+    return TokenString(value)
+
+
+@pytest.mark.parametrize(
+    "criteria, expected",
+    [
+        (text("north"), 2),  # case-insensitive equality
+        (text("North*"), 3),  # wildcards
+        (text("?ast"), 1),
+        (text("<>North"), 6),  # includes empty, logical and numeric cells
+        (text(""), 1),  # empty cells
+        (text("="), 1),
+        (text("<>"), 7),
+        (text(">=12"), 1),
+        (TokenNumber(12), 1),
+        (TokenBool(True), 1),
+        (text("TRUE"), 1),
+        (text(">n"), 4),  # text ordering
+        (text("<z"), 5),
+        (text(">"), 0),
+    ],
+)
+def test_countifs_criteria(criteria, expected):
+    assert excel_countifs(REGIONS, criteria).value == expected
+
+
+def test_numeric_comparisons_use_sorted_index():
+    values = TokenArray.from_numbers([5, 1, 10, 10, 3, 7])
+    for criteria, expected in [
+        (">5", 3),
+        (">=5", 4),
+        ("<5", 2),
+        ("<=5", 3),
+        ("=10", 2),
+        ("<>10", 4),
+        ("10", 2),
+    ]:
+        assert excel_countifs(values, text(criteria)).value == expected, criteria
+    assert "sorted" in values.index_cache
+
+
+def test_sumifs_and_averageifs_with_multiple_criteria():
+    assert excel_sumifs(AMOUNTS, REGIONS, text("North*")).value == 100
+    assert excel_sumifs(AMOUNTS, REGIONS, text("North*"), AMOUNTS, text(">10")).value == 90
+    assert excel_averageifs(AMOUNTS, REGIONS, text("North*")).value == pytest.approx(100 / 3)
+    assert excel_averageifs(AMOUNTS, REGIONS, text("missing")).value == "#DIV/0!"
+    assert excel_countifs(REGIONS, text("North*"), AMOUNTS, text("<40")).value == 2
+
+
+def test_errors_and_shapes():
+    na = TokenError(TokenErrorTypes.NA, "")
+    with_error = TokenArray.column([1, na, 3])
+    flags = TokenArray.column(["a", "b", "a"])
+    assert excel_sumifs(with_error, flags, text("a")).value == 4  # error cell not matched
+    assert excel_sumifs(with_error, flags, text("b")) is na
+    assert excel_countifs(flags, na) is na
+    assert excel_countifs(flags, text("a"), AMOUNTS, text(">0")).value == "#VALUE!"
+    assert excel_countifs(flags).value == "#VALUE!"
+    assert excel_sumifs(AMOUNTS).value == "#VALUE!"
+    # criteria given as a 1x1 range and scalar ranges
+    assert excel_countifs(flags, TokenArray.column(["a"])).value == 2
+    assert excel_sumifs(TokenNumber(5), TokenString("x"), text("x")).value == 5
+
+
+def test_indexes_are_cached_per_range_and_invalidated():
+    values = TokenArray.column(["a", "b", "a"])
+    assert excel_countifs(values, text("a")).value == 2
+    cached = dict(values.index_cache)
+    assert "hash" in cached
+    assert excel_countifs(values, text("a")).value == 2
+    assert values.index_cache["hash"] is cached["hash"]
+
+    values.set(1, 0, "A")
+    assert values.index_cache == {}
+    assert excel_countifs(values, text("a")).value == 3
+
+
+def test_criteria_are_parsed_once():
+    _parse_criterion.cache_clear()
+    for _ in range(3):
+        excel_countifs(REGIONS, text(">=10"))
+    info = _parse_criterion.cache_info()
+    assert info.misses == 1 and info.hits == 2
+
+
+def test_conditional_aggregates_are_registered():
+    tokens = [
+        ManualToken("SUMIFS(", "FUNC", "OPEN"),
+        ManualToken("B1:B8", "OPERAND", "RANGE"),
+        ManualToken(",", "SEP", "ARG"),
+        ManualToken("A1:A8", "OPERAND", "RANGE"),
+        ManualToken(",", "SEP", "ARG"),
+        TokenString("North"),
+        ManualToken(")", "FUNC", "CLOSE"),
+    ]
+    run = get_interpreter(tokens)
+    assert run is not None
+    assert run({"A1:A8": REGIONS, "B1:B8": AMOUNTS}) == 40
+
+
+def test_dynamic_criteria_do_not_grow_the_range_cache():
+    values = TokenArray.from_numbers(list(range(200)))
+    for row in range(200):
+        assert excel_sumifs(values, values, text(f"<={row}")).value == row * (row + 1) / 2
+        count = excel_countifs(values, text(f"<>{row}"), values, text(f"<={row + 3}"))
+        assert count.value == min(row + 4, 200) - 1
+    # The hash and sorted indexes (and the number mask of the latter), no per-criterion entries
+    assert len(values.index_cache) == 3
+
+
+def test_first_error_is_row_major_with_unsorted_matches():
+    na = TokenError(TokenErrorTypes.NA, "")
+    ref = TokenError(TokenErrorTypes.REF, "")
+    with_errors = TokenArray.column([1, ref, 3, na])
+    keys = TokenArray.from_numbers([4, 3, 2, 1])
+    assert excel_sumifs(with_errors, keys, text(">0")) is ref
+    assert excel_averageifs(with_errors, keys, text("<>3")) is na
@@ -0,0 +1,159 @@
+import pytest
+
+from mvin import BaseToken, TokenBool, TokenNumber, TokenString, is_lazy, lazy
+from mvin.functions.excel_lib import DEFAULT_FUNCTIONS, excel_if
+from mvin.interpreter import get_interpreter
+from mvin.tracing import RecordingObserver
+
+
+class ManualToken(BaseToken):
+    def __init__(self, value, token_type, subtype) -> None:
+        super().__init__()
+        self._value = value
+        self._type = token_type
+        self._subtype = subtype
+
+
+def ref(name):
+    return ManualToken(name, "OPERAND", "RANGE")
+
+
+def call(name, *args):
+    tokens = [ManualToken(name, "FUNC", "OPEN")]
+    for index, arg in enumerate(args):
+        if index:
+            tokens.append(ManualToken(",", "SEP", "ARG"))
+        tokens.extend(arg if isinstance(arg, list) else [arg])
+    tokens.append(ManualToken(")", "FUNC", "CLOSE"))
+    return tokens
+
+
+def counting_functions(calls):
+    def probe(value):
+        calls.append(value.value)
+        return value
+
+    functions = dict(DEFAULT_FUNCTIONS)
+    functions["PROBE("] = ([None], probe)
+    return functions
+
+
+BACKENDS = ["compiled", "stack"]
+
+
+def run(tokens, inputs=None, backend="compiled", functions=DEFAULT_FUNCTIONS):
+    interpreter = get_interpreter(tokens, proposed_functions=functions, backend=backend)
+    assert interpreter is not None
+    return interpreter(inputs or {})
+
+
+@pytest.mark.parametrize(
+    "condition, expected",
+    [
+        (TokenBool(True), "yes"),
+        (TokenBool(False), "no"),
+        (TokenNumber(2), "yes"),
+        (TokenNumber(0), "no"),
+        (TokenString("true"), "yes"),
+    ],
+)
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_if_selects_branch(condition, expected, backend):
+    tokens = call("IF(", ref("A1"), TokenString("yes"), TokenString("no"))
+    assert run(tokens, {"A1": condition}, backend) == expected
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_if_defaults_and_errors(backend):
+    assert run(call("IF(", ref("A1"), TokenNumber(1)), {"A1": TokenBool(False)}, backend) is False
+    assert run(call("IF(", ref("A1"), TokenString("x")), {"A1": TokenString("maybe")}, backend) == "#VALUE!"
+    divide = [TokenNumber(1), ManualToken("/", "OPERATOR-INFIX", ""), TokenNumber(0)]
+    assert run(call("IF(", divide, TokenNumber(1), TokenNumber(2)), {}, backend) == "#DIV/0!"
+
+
+def test_untaken_branches_are_not_evaluated():
+    calls = []
+    functions = counting_functions(calls)
+    tokens = call(
+        "IF(",
+        ref("A1"),
+        call("PROBE(", TokenString("true branch")),
+        call("PROBE(", TokenString("false branch")),
+    )
+    interpreter = get_interpreter(tokens, proposed_functions=functions)
+    assert interpreter is not None
+    assert interpreter({"A1": TokenBool(True)}) == "true branch"
+    assert interpreter({"A1": TokenBool(False)}) == "false branch"
+    assert calls == ["true branch", "false branch"]
+
+
+def test_and_or_short_circuit():
+    calls = []
+    functions = counting_functions(calls)
+    probe = call("PROBE(", TokenBool(True))
+    and_run = get_interpreter(call("AND(", ref("A1"), probe), proposed_functions=functions)
+    or_run = get_interpreter(call("OR(", ref("A1"), probe), proposed_functions=functions)
+    assert and_run is not None and or_run is not None
+
+    assert and_run({"A1": TokenBool(False)}) is False
+    assert or_run({"A1": TokenBool(True)}) is True
+    assert calls == []
+    assert and_run({"A1": TokenNumber(1)}) is True
+    assert or_run({"A1": TokenNumber(0)}) is True
+    assert calls == [True, True]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_and_or_values(backend):
+    args = [ref("A1"), ref("A2"), ref("A3")]
+    inputs = {"A1": TokenBool(True), "A2": TokenNumber(3), "A3": TokenString("FALSE")}
+    assert run(call("AND(", *args), inputs, backend) is False
+    assert run(call("OR(", *args), inputs, backend) is True
+    assert run(call("AND(", ref("A1")), {"A1": TokenString("x")}, backend) == "#VALUE!"
+    assert run(call("OR("), {}, backend) == "#VALUE!"
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_iferror(backend):
+    tokens = call("IFERROR(", call("SEARCH(", TokenString("z"), ref("A1")), TokenString("missing"))
+    assert run(tokens, {"A1": TokenString("abc")}, backend) == "missing"
+    assert run(tokens, {"A1": TokenString("xyz")}, backend) == 3
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_choose(backend):
+    tokens = call("CHOOSE(", ref("A1"), TokenString("a"), TokenString("b"), TokenString("c"))
+    assert run(tokens, {"A1": TokenNumber(2)}, backend) == "b"
+    assert run(tokens, {"A1": TokenNumber(3.7)}, backend) == "c"
+    assert run(tokens, {"A1": TokenNumber(4)}, backend) == "#VALUE!"
+    assert run(tokens, {"A1": TokenString("1")}, backend) == "#VALUE!"
+
+
+def test_choose_evaluates_only_the_chosen_value():
+    calls = []
+    functions = counting_functions(calls)
+    tokens = call("CHOOSE(", ref("A1"), call("PROBE(", TokenNumber(1)), call("PROBE(", TokenNumber(2)))
+    interpreter = get_interpreter(tokens, proposed_functions=functions)
+    assert interpreter is not None
+    assert interpreter({"A1": TokenNumber(2)}) == 2
+    assert calls == [2]
+
+
+def test_custom_lazy_function_and_tracing():
+    @lazy
+    def first_non_empty(context, *args):
+        for arg in args:
+            value = arg(context)
+            if value is not None:
+                return value
+        return TokenNumber(0)
+
+    assert is_lazy(first_non_empty) and is_lazy(excel_if)
+    functions = dict(DEFAULT_FUNCTIONS)
+    functions["COALESCE("] = (None, first_non_empty)
+    tokens = call("COALESCE(", ref("A1"), TokenNumber(7))
+    observer = RecordingObserver()
+    interpreter = get_interpreter(tokens, proposed_functions=functions, observer=observer)
+    assert interpreter is not None
+    assert interpreter({"A1": TokenNumber(3)}) == 3
+    assert [event.name for event in observer.events if event.kind == "function"] == ["COALESCE("]
@@ -0,0 +1,169 @@
+import pytest
+
+from mvin import (
+    TOKEN_EMPTY,
+    TOKEN_FALSE,
+    TOKEN_TRUE,
+    BaseToken,
+    TokenArray,
+    TokenError,
+    TokenErrorTypes,
+    TokenNumber,
+    TokenString,
+)
+from mvin.functions.excel_lib import (
+    excel_hlookup,
+    excel_index,
+    excel_match,
+    excel_vlookup,
+    excel_xlookup,
+)
+from mvin.interpreter import get_interpreter
+
+
+class ManualToken(BaseToken):
+    def __init__(self, value, token_type, subtype) -> None:
+        super().__init__()
+        self._value = value
+        self._type = token_type
+        self._subtype = subtype
+
+
+TABLE = TokenArray.from_values(
+    [
+        [10, "ten", "a"],
+        [20, "twenty", "b"],
+        [20, "twenty again", "c"],
+        [40, "forty", "d"],
+        ["apple", "fruit", "e"],
+    ]
+)
+NUMBERS = TokenArray.column([1, 3, 5, 7, 7, 9])
+N = TokenNumber
+
+
+def test_vlookup_exact_and_approximate():
+    assert excel_vlookup(N(20), TABLE, N(2), TOKEN_FALSE).value == "twenty"
+    assert excel_vlookup(TokenString("APPLE"), TABLE, N(3), TOKEN_FALSE).value == "e"
+    assert excel_vlookup(TokenString("app*"), TABLE, N(2), TOKEN_FALSE).value == "fruit"
+    assert excel_vlookup(N(25), TABLE, N(2), TOKEN_FALSE).value == "#N/A"
+    # approximate: largest value <= lookup value, last of equal values
+    assert excel_vlookup(N(25), TABLE, N(2), TOKEN_TRUE).value == "twenty again"
+    assert excel_vlookup(N(25), TABLE, N(2), None).value == "#N/A"  # empty: FALSE
+    assert excel_vlookup(N(100), TABLE, N(2), TokenNumber(1)).value == "forty"
+    assert excel_vlookup(N(5), TABLE, N(2), TOKEN_TRUE).value == "#N/A"
+
+
+def test_vlookup_argument_errors():
+    na = TokenError(TokenErrorTypes.NA, "")
+    assert excel_vlookup(na, TABLE, N(2), TOKEN_FALSE) is na
+    assert excel_vlookup(TOKEN_EMPTY, TABLE, N(2), TOKEN_FALSE).value == "#N/A"
+    assert excel_vlookup(N(10), TABLE, N(4), TOKEN_FALSE).value == "#REF!"
+    assert excel_vlookup(N(10), TABLE, N(0), TOKEN_FALSE).value == "#VALUE!"
+    assert excel_vlookup(N(10), TABLE, TokenString("x"), TOKEN_FALSE).value == "#VALUE!"
+    assert excel_vlookup(N(10), TABLE, N(1), TokenString("maybe")).value == "#VALUE!"
+    assert excel_vlookup(TABLE, TABLE, N(1), TOKEN_FALSE).value == 10  # first cell of a range
+    assert excel_vlookup(N(10), TABLE, N(2), na) is na
+
+
+def test_hlookup():
+    rows = TokenArray.from_values([["a", "b", "c"], [1, 2, 3]])
+    assert excel_hlookup(TokenString("b"), rows, N(2), TOKEN_FALSE).value == 2
+    assert excel_hlookup(TokenString("bb"), rows, N(2), TOKEN_TRUE).value == 2
+    assert excel_hlookup(TokenString("b"), rows, N(3), TOKEN_FALSE).value == "#REF!"
+
+
+def test_match_types():
+    assert excel_match(N(7), NUMBERS, N(0)).value == 4
+    assert excel_match(N(8), NUMBERS, N(1)).value == 5
+    assert excel_match(N(0), NUMBERS, N(1)).value == "#N/A"
+    descending = TokenArray.from_values([[9, 7, 5, 3]])
+    assert excel_match(N(6), descending, N(-1)).value == 2
+    assert excel_match(N(10), descending, N(-1)).value == "#N/A"
+    assert excel_match(N(1), TABLE, N(0)).value == "#N/A"  # not a vector
+    assert excel_match(N(1), NUMBERS, TokenString("x")).value == "#VALUE!"
+
+
+def test_xlookup_exact_mode_matches_wildcard_characters_literally():
+    keys = TokenArray.column(["abc", "a*", "x~y", "xy", "a?"])
+    values = TokenArray.column([1, 2, 3, 4, 5])
+    assert excel_xlookup(TokenString("a*"), keys, values, None, N(0), N(1)).value == 2
+    assert excel_xlookup(TokenString("a*"), keys, values, None, N(2), N(1)).value == 1
+    assert excel_xlookup(TokenString("x~y"), keys, values, None, N(0), N(1)).value == 3
+    assert excel_xlookup(TokenString("x~~y"), keys, values, None, N(2), N(1)).value == 3
+    assert excel_xlookup(TokenString("x~y"), keys, values, None, N(2), N(1)).value == 4
+    assert excel_xlookup(TokenString("a~?"), keys, values, None, N(0), N(1)).value == "#N/A"
+    assert excel_xlookup(TokenString("a~?"), keys, values, None, N(2), N(1)).value == 5
+    # VLOOKUP and MATCH keep wildcards in exact mode
+    assert excel_match(TokenString("a*"), keys, N(0)).value == 1
+
+
+def test_xlookup_modes():
+    keys = TokenArray.column(["b", "a", "c", "a"])
+    values = TokenArray.from_values([[1, "one"], [2, "two"], [3, "three"], [4, "four"]])
+    assert excel_xlookup(TokenString("a"), keys, values, None, N(0), N(1)).value == [[2.0, "two"]]
+    last = excel_xlookup(TokenString("a"), keys, TokenArray.column([1, 2, 3, 4]), None, N(0), N(-1))
+    assert last.value == 4
+    assert excel_xlookup(TokenString("z"), keys, keys, TokenString("none"), N(0), N(1)).value == "none"
+    assert excel_xlookup(TokenString("z"), keys, keys, TOKEN_EMPTY, N(0), N(1)).value == "#N/A"
+    assert excel_xlookup(TokenString("?"), keys, keys, None, N(2), N(1)).value == "b"
+
+    numbers = TokenArray.column([10, 20, 30])
+    labels = TokenArray.column(["x", "y", "z"])
+    assert excel_xlookup(N(25), numbers, labels, None, N(-1), N(1)).value == "y"
+    assert excel_xlookup(N(25), numbers, labels, None, N(1), N(2)).value == "z"
+    assert excel_xlookup(N(35), numbers, labels, None, N(1), N(1)).value == "#N/A"
+
+    row_keys = TokenArray.from_values([["x", "y"]])
+    table = TokenArray.from_values([[1, 2], [3, 4]])
+    assert excel_xlookup(TokenString("y"), row_keys, table, None, N(0), N(1)).value == [[2.0], [4.0]]
+
+
+def test_xlookup_argument_errors():
+    keys = TokenArray.column(["a", "b"])
+    assert excel_xlookup(N(1), TABLE, keys, None, N(0), N(1)).value == "#VALUE!"
+    assert excel_xlookup(N(1), keys, NUMBERS, None, N(0), N(1)).value == "#VALUE!"
+    assert excel_xlookup(N(1), keys, keys, None, N(3), N(1)).value == "#VALUE!"
+    assert excel_xlookup(N(1), keys, keys, None, TokenString("x"), N(1)).value == "#VALUE!"
+    assert excel_xlookup(N(1), keys, keys, None, N(0), TokenString("x")).value == "#VALUE!"
+
+
+def test_index():
+    assert excel_index(TABLE, N(2), N(2)).value == "twenty"
+    assert excel_index(NUMBERS, N(3), TOKEN_EMPTY).value == 5
+    assert excel_index(TokenArray.from_values([[1, 2, 3]]), N(3), TOKEN_EMPTY).value == 3
+    assert excel_index(TABLE, N(1), N(0)).value == [[10.0, "ten", "a"]]
+    assert excel_index(TABLE, N(0), N(3)).value == [["a"], ["b"], ["c"], ["d"], ["e"]]
+    assert excel_index(TABLE, N(0), N(0)) is TABLE
+    assert excel_index(TABLE, N(6), N(1)).value == "#REF!"
+    assert excel_index(TABLE, N(-1), N(1)).value == "#VALUE!"
+    assert excel_index(TABLE, N(1), TokenString("x")).value == "#VALUE!"
+    assert excel_index(TABLE, TokenString("x"), N(1)).value == "#VALUE!"
+
+
+def test_lookup_indexes_are_cached_and_invalidated():
+    table = TokenArray.from_values([[key, key * 2] for key in range(1000)])
+    assert excel_vlookup(N(500), table, N(2), TOKEN_FALSE).value == 1000
+    index = table.index_cache[("lookup", 0, 0, False)]
+    assert excel_vlookup(N(501), table, N(2), TOKEN_FALSE).value == 1002
+    assert table.index_cache[("lookup", 0, 0, False)] is index
+
+    table.set(500, 0, -1)
+    assert table.index_cache == {}
+    assert excel_vlookup(N(500), table, N(2), TOKEN_FALSE).value == "#N/A"
+
+
+@pytest.mark.parametrize("backend", ["compiled", "stack"])
+def test_lookup_defaults_through_interpreter(backend):
+    tokens = [
+        ManualToken("VLOOKUP(", "FUNC", "OPEN"),
+        N(25),
+        ManualToken(",", "SEP", "ARG"),
+        ManualToken("A1:C5", "OPERAND", "RANGE"),
+        ManualToken(",", "SEP", "ARG"),
+        N(2),
+        ManualToken(")", "FUNC", "CLOSE"),
+    ]
+    run = get_interpreter(tokens, backend=backend)
+    assert run is not None
+    assert run({"A1:C5": TABLE}) == "twenty again"
@@ -1,5 +1,17 @@
-from mvin import BaseToken, TokenBool, TokenError, TokenErrorTypes, TokenNumber, TokenString
-from mvin.functions.excel_lib import excel_search
+import pytest
+
+from mvin import (
+    BaseToken,
+    TokenBool,
+    TokenError,
+    TokenErrorTypes,
+    TokenNumber,
+    TokenString,
+    get_specializer,
+)
+from mvin.functions.excel_lib import _search_matcher, excel_find, excel_search
+from mvin.profiling import ProfileStats
+from mvin.tokenizer import get_interpreter_from_string
 
 
 class ManualToken(BaseToken):
@@ -60,6 +72,18 @@ def test_search_find_text_unsupported_subtype():
     assert result.value == TokenErrorTypes.VALUE.value
 
 
+@pytest.mark.parametrize("func", [excel_search, excel_find])
+def test_within_text_error_wins_over_find_text_error(func):
+    find_text = TokenError(TokenErrorTypes.NA, "bad find text")
+    within_text = TokenError(TokenErrorTypes.REF, "bad within text")
+    assert func(find_text, within_text, TokenNumber(1)) is within_text
+    assert func(find_text, None, TokenNumber(1)).value == TokenErrorTypes.VALUE.value
+    # A constant find_text is only checked at build time, the within_text error still wins
+    name = "SEARCH" if func is excel_search else "FIND"
+    run = get_interpreter_from_string(f'={name}("a", A1)')
+    assert run({"A1": within_text}) == "#REF!"
+
+
 def test_search_start_num_error_passthrough():
     start_num = TokenError(TokenErrorTypes.VALUE, "bad start")
     result = excel_search(TokenString("a"), TokenString("abc"), start_num)
@@ -70,3 +94,80 @@ def test_search_start_num_rejects_non_integer_number():
     result = excel_search(TokenString("a"), TokenString("abc"), TokenNumber(1.5))
     assert isinstance(result, TokenError)
     assert result.value == TokenErrorTypes.VALUE.value
+
+
+def test_search_is_case_insensitive_and_find_is_not():
+    assert excel_search(TokenString("QUICK"), TokenString("the quick fox"), TokenNumber(1)).value == 5
+    assert excel_find(TokenString("quick"), TokenString("the quick fox"), TokenNumber(1)).value == 5
+    result = excel_find(TokenString("QUICK"), TokenString("the quick fox"), TokenNumber(1))
+    assert isinstance(result, TokenError)
+    assert result.value == TokenErrorTypes.VALUE.value
+
+
+@pytest.mark.parametrize(
+    "pattern, text, start, expected",
+    [
+        ("q?ick", "The Quick fox", 1, 5),
+        ("b*n", "the brown fox", 1, 5),
+        ("*fox", "the fox", 3, 3),
+        ("~*", "a*b", 1, 2),
+        ("~?", "why? not", 1, 4),
+        ("a~", "ba~", 1, 2),
+        ("o", "foo boo", 4, 6),
+        ("", "abc", 3, 3),
+        ("GROSS", "Straße ist groß", 1, None),
+        ("GROẞ", "Straße ist groß", 1, 12),
+        ("ist", "Straße ist groß", 1, 8),
+    ],
+)
+def test_search_wildcards_and_positions(pattern, text, start, expected):
+    result = excel_search(TokenString(pattern), TokenString(text), TokenNumber(start))
+    if expected is None:
+        assert isinstance(result, TokenError)
+    else:
+        assert result.value == expected
+
+
+@pytest.mark.parametrize(
+    "pattern, text, expected",
+    [
+        ("*", "a*b", 2),
+        ("?", "why? not", 4),
+        ("~", "ba~", 3),
+        ("a*", "abc", None),
+    ],
+)
+def test_find_matches_wildcard_characters_literally(pattern, text, expected):
+    result = excel_find(TokenString(pattern), TokenString(text), TokenNumber(1))
+    if expected is None:
+        assert isinstance(result, TokenError)
+    else:
+        assert result.value == expected
+
+
+@pytest.mark.parametrize("name", ["SEARCH", "FIND"])
+def test_constant_pattern_is_compiled_once(name):
+    formula = f'={name}("br?wn", A1) & {name}(B1, A1)'
+    run = get_interpreter_from_string(formula)
+    stack = get_interpreter_from_string(formula, backend="stack")
+    rows = [("the br?wn fox", "fox"), ("THE BROWN FOX", "fox"), ("brawn", "x")]
+    before = _search_matcher.cache_info()
+    results = [run({"A1": TokenString(a), "B1": TokenString(b)}) for a, b in rows]
+    after = _search_matcher.cache_info()
+    assert results == [stack({"A1": TokenString(a), "B1": TokenString(b)}) for a, b in rows]
+    if name == "SEARCH":
+        # Only the dynamic pattern goes through the LRU, once per evaluation
+        assert after.hits + after.misses - before.hits - before.misses == len(rows)
+        assert results == ["511", "511", "#VALUE!"]
+    else:
+        assert results == ["511", "#VALUE!", "#VALUE!"]
+
+
+def test_specialized_search_is_profiled_under_its_name():
+    stats = ProfileStats()
+    run = get_interpreter_from_string('=SEARCH("x", A1)', profile=stats)
+    assert run({"A1": TokenString("abx")}) == 3
+    assert stats.functions["SEARCH("].calls == 1
+    assert get_specializer(excel_search) is not None
+    assert get_specializer(excel_search)((None, None, TokenNumber(1))) is None
+    assert get_specializer(excel_find)((TokenError(TokenErrorTypes.NA, ""), None, None)) is None
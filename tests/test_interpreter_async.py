@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from mvin import TokenNumber, TokenString
+from mvin.tokenizer import get_interpreter_from_string
+
+
+class FakeProvider:
+    """Async data source that answers after a delay and records the lookups."""
+
+    def __init__(self, values, delay=0.01):
+        self.values = values
+        self.delay = delay
+        self.requested = []
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, ref):
+        self.requested.append(ref)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if ref not in self.values:
+                raise LookupError(f"no data for {ref}")
+            return self.values[ref]
+        finally:
+            self.active -= 1
+
+
+@pytest.mark.parametrize("backend", ["compiled", "stack"])
+def test_evaluate_async_resolves_providers_concurrently(backend):
+    provider = FakeProvider({"A1": TokenNumber(2), "B1": TokenNumber(5), "C1": TokenNumber(1)})
+    run = get_interpreter_from_string("=SUM(A1, B1) * C1", backend=backend)
+    inputs = {"A1": provider, "B1": provider, "C1": provider, "Z9": provider}
+
+    assert asyncio.run(run.evaluate_async(inputs)) == 7
+    assert sorted(provider.requested) == ["A1", "B1", "C1"]  # only the formula's inputs
+    assert provider.max_active == 3
+
+
+def test_evaluate_async_accepts_tokens_awaitables_and_plain_callables():
+    async def fetch(value):
+        await asyncio.sleep(0)
+        return TokenString(value)
+
+    async def main():
+        run = get_interpreter_from_string('=A1 & "-" & B1 & "-" & C1')
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        loop.call_soon(future.set_result, TokenString("c"))
+        inputs = {"A1": TokenString("a"), "B1": fetch("b"), "C1": future}
+        first = await run.evaluate_async(inputs)
+        second = await run.evaluate_async({**inputs, "B1": lambda ref: TokenString(ref)})
+        return first, second
+
+    assert asyncio.run(main()) == ("a-b-c", "a-B1-c")
+
+
+def test_evaluate_async_runs_many_formulas_in_one_loop():
+    provider = FakeProvider({f"A{i}": TokenNumber(i) for i in range(20)})
+    runs = [get_interpreter_from_string(f"=A{i} * 2") for i in range(20)]
+
+    async def main():
+        return await asyncio.gather(
+            *[run.evaluate_async({f"A{i}": provider}) for i, run in enumerate(runs)]
+        )
+
+    assert asyncio.run(main()) == [i * 2 for i in range(20)]
+    assert provider.max_active == 20
+
+
+def test_evaluate_async_propagates_provider_errors_and_missing_inputs():
+    run = get_interpreter_from_string("=A1 + B1")
+    with pytest.raises(LookupError, match="B1"):
+        asyncio.run(run.evaluate_async({"A1": TokenNumber(1), "B1": FakeProvider({})}))
+    with pytest.raises(KeyError):
+        asyncio.run(run.evaluate_async({"A1": TokenNumber(1)}))
@@ -0,0 +1,88 @@
+import pytest  # required for pytest.raises
+
+from mvin import BaseToken, TokenError, TokenErrorTypes, TokenNumber, TokenString
+from mvin.interpreter import get_interpreter
+
+
+class ManualToken(BaseToken):
+    def __init__(self, value, token_type, subtype) -> None:
+        super().__init__()
+        self._value = value
+        self._type = token_type
+        self._subtype = subtype
+
+
+def test_evaluate_batch_matches_per_row_calls():
+    tokens = [
+        ManualToken("A1", "OPERAND", "RANGE"),
+        ManualToken("*", "OPERATOR-INFIX", ""),
+        TokenNumber(2),
+        ManualToken(">", "OPERATOR-INFIX", ""),
+        ManualToken("B1", "OPERAND", "RANGE"),
+    ]
+    a_column = [TokenNumber(value) for value in range(10)]
+    b_column = [TokenNumber(5) for _ in range(10)]
+    for backend in ("compiled", "stack"):
+        run = get_interpreter(tokens, backend=backend)
+        assert run is not None
+        results = run.evaluate_batch({"A1": a_column, "B1": b_column})
+        assert [result.value for result in results] == [
+            run({"A1": a, "B1": b}) for a, b in zip(a_column, b_column)
+        ]
+        assert all(result.subtype == "NUMBER" for result in results)
+
+
+def test_evaluate_batch_bad_row_becomes_error_token():
+    tokens = [
+        ManualToken("LEN(", "FUNC", "OPEN"),
+        ManualToken("A1", "OPERAND", "RANGE"),
+        ManualToken(")", "FUNC", "CLOSE"),
+    ]
+    run = get_interpreter(tokens)
+    assert run is not None
+    results = run.evaluate_batch({"A1": [TokenString("ab"), "not a token", TokenString("abcd")]})
+    assert results[0].value == 2
+    assert isinstance(results[1], TokenError)
+    assert results[1].value == TokenErrorTypes.VALUE.value
+    assert results[2].value == 4
+
+
+def test_evaluate_batch_missing_column_is_ref_error_per_row():
+    tokens = [
+        ManualToken("A1", "OPERAND", "RANGE"),
+        ManualToken("+", "OPERATOR-INFIX", ""),
+        ManualToken("B1", "OPERAND", "RANGE"),
+    ]
+    run = get_interpreter(tokens)
+    assert run is not None
+    results = run.evaluate_batch({"A1": [TokenNumber(1), TokenNumber(2)]})
+    assert len(results) == 2
+    assert all(isinstance(result, TokenError) for result in results)
+    assert results[0].value == TokenErrorTypes.REF.value
+    assert "B1" in results[0].message
+
+
+def test_evaluate_batch_rejects_ragged_columns():
+    run = get_interpreter([ManualToken("A1", "OPERAND", "RANGE")])
+    assert run is not None
+    with pytest.raises(ValueError):
+        run.evaluate_batch({"A1": [TokenNumber(1)], "B1": []})
+
+
+def test_evaluate_batch_empty_columns():
+    run = get_interpreter([TokenNumber(1)])
+    assert run is not None
+    assert run.evaluate_batch({}) == []
+
+
+def test_evaluate_batch_returns_tokens_so_error_text_is_not_an_error():
+    tokens = [
+        ManualToken("A1", "OPERAND", "RANGE"),
+        ManualToken("&", "OPERATOR-INFIX", ""),
+        TokenString(""),
+    ]
+    run = get_interpreter(tokens)
+    assert run is not None
+    results = run.evaluate_batch({"A1": [TokenString("#N/A"), TokenError(TokenErrorTypes.NA, "")]})
+    assert [result.value for result in results] == ["#N/A", "#N/A"]
+    assert [result.subtype for result in results] == ["TEXT", "ERROR"]
@@ -0,0 +1,103 @@
+import pytest  # required for pytest.raises
+
+from mvin import BaseToken, TokenBool, TokenNumber, TokenString
+from mvin.functions.excel_lib import DEFAULT_FUNCTIONS
+from mvin.interpreter import InterpreterCache, get_interpreter
+
+
+class ManualToken(BaseToken):
+    def __init__(self, value, token_type, subtype) -> None:
+        super().__init__()
+        self._value = value
+        self._type = token_type
+        self._subtype = subtype
+
+
+def formula(limit):
+    return [
+        ManualToken("A1", "OPERAND", "RANGE"),
+        ManualToken(">", "OPERATOR-INFIX", ""),
+        TokenNumber(limit),
+    ]
+
+
+def test_cache_reuses_interpreter_for_identical_tokens():
+    cache = InterpreterCache(maxsize=8)
+    first = get_interpreter(formula(10), cache=cache)
+    second = get_interpreter(formula(10), cache=cache)
+    assert first is not None
+    assert first is second
+    assert second({"A1": TokenNumber(11)})
+    info = cache.info()
+    assert (info.hits, info.misses, info.maxsize, info.currsize) == (1, 1, 8, 1)
+
+
+def test_cache_distinguishes_values_subtypes_and_backends():
+    cache = InterpreterCache()
+    assert get_interpreter(formula(10), cache=cache) is not get_interpreter(
+        formula(11), cache=cache
+    )
+    as_int = cache.get_interpreter([TokenNumber(1)])
+    as_float = cache.get_interpreter([TokenNumber(1.0)])
+    as_bool = cache.get_interpreter([TokenBool(True)])
+    assert as_int is not as_float and as_int is not as_bool
+    assert cache.get_interpreter(formula(10), backend="stack").backend == "stack"
+    assert cache.misses == 6
+    assert cache.hits == 0
+
+
+def test_cache_keys_on_function_map_identity():
+    cache = InterpreterCache()
+    tokens = [
+        ManualToken("LEN(", "FUNC", "OPEN"),
+        TokenString("abc"),
+        ManualToken(")", "FUNC", "CLOSE"),
+    ]
+    custom_functions = dict(DEFAULT_FUNCTIONS)
+    default_run = cache.get_interpreter(tokens)
+    custom_run = cache.get_interpreter(tokens, proposed_functions=custom_functions)
+    assert default_run is not custom_run
+    assert cache.get_interpreter(tokens, proposed_functions=custom_functions) is custom_run
+
+
+def test_cache_evicts_least_recently_used():
+    cache = InterpreterCache(maxsize=2)
+    run_1 = cache.get_interpreter(formula(1))
+    cache.get_interpreter(formula(2))
+    assert cache.get_interpreter(formula(1)) is run_1  # 1 is now the most recent
+    cache.get_interpreter(formula(3))  # evicts 2
+    assert len(cache) == 2
+    assert cache.get_interpreter(formula(1)) is run_1
+    misses = cache.misses
+    cache.get_interpreter(formula(2))
+    assert cache.misses == misses + 1
+
+
+def test_cache_unhashable_values_are_compiled_without_caching():
+    cache = InterpreterCache()
+    tokens = [ManualToken(["not", "hashable"], "OPERAND", "TEXT")]
+    run = cache.get_interpreter(tokens)
+    assert run is not None
+    assert run({}) == ["not", "hashable"]
+    assert len(cache) == 0
+    assert cache.misses == 1
+
+
+def test_cache_does_not_store_syntax_errors():
+    cache = InterpreterCache()
+    tokens = [ManualToken("(", "PAREN", "OPEN")]
+    for _ in range(2):
+        with pytest.raises(SyntaxError):
+            cache.get_interpreter(tokens)
+    assert len(cache) == 0
+
+
+def test_cache_clear_and_invalid_size():
+    cache = InterpreterCache()
+    cache.get_interpreter(formula(1))
+    cache.get_interpreter(formula(1))
+    cache.clear()
+    assert cache.info() == (0, 0, 1024, 0)
+    assert cache.get_interpreter(None) is None  # pyright: ignore
+    with pytest.raises(ValueError):
+        InterpreterCache(maxsize=0)
@@ -0,0 +1,218 @@
+import pytest  # required for pytest.raises
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from mvin import BaseToken, TokenBool, TokenError, TokenErrorTypes, TokenNumber, TokenString
+from mvin.interpreter import get_interpreter
+
+
+class ManualToken(BaseToken):
+    def __init__(self, value, token_type, subtype) -> None:
+        super().__init__()
+        self._value = value
+        self._type = token_type
+        self._subtype = subtype
+
+
+def ref(name):
+    return ManualToken(name, "OPERAND", "RANGE")
+
+
+def op(value):
+    return ManualToken(value, "OPERATOR-INFIX", "")
+
+
+def prefix(value):
+    return ManualToken(value, "OPERATOR-PREFIX", "")
+
+
+def func(name):
+    return ManualToken(name, "FUNC", "OPEN")
+
+
+def close():
+    return ManualToken(")", "FUNC", "CLOSE")
+
+
+def sep():
+    return ManualToken(",", "SEP", "ARG")
+
+
+def both_backends(tokens, **kwargs):
+    compiled = get_interpreter(tokens, **kwargs)
+    stack = get_interpreter(tokens, backend="stack", **kwargs)
+    assert compiled is not None and stack is not None
+    return compiled, stack
+
+
+FORMULAS = [
+    [TokenNumber(1), op("+"), TokenNumber(2), op("*"), TokenNumber(3)],
+    [ref("A1"), op(">"), TokenNumber(10), op("*"), TokenNumber(1000)],
+    [ref("A1"), op("/"), ref("B1")],
+    [ref("A1"), op("&"), TokenString("x"), op("="), TokenString("1x")],
+    [prefix("-"), ref("A1"), op("^"), TokenNumber(2)],
+    [prefix("+"), ref("B1")],
+    [prefix("-"), TokenString("x")],
+    [prefix("-"), TokenError(TokenErrorTypes.NA, "na")],
+    [
+        func("NOT("),
+        func("ISERROR("),
+        func("SEARCH("),
+        TokenString("b"),
+        sep(),
+        ref("A1"),
+        op("&"),
+        TokenString("abc"),
+        close(),
+        close(),
+        close(),
+    ],
+    [func("LEFT("), ref("A1"), op("&"), TokenString("hello"), sep(), TokenNumber(3), close()],
+    [func("RIGHT("), TokenString("hello"), close()],
+    [func("LEN("), ref("A1"), close(), op("<>"), ref("B1")],
+]
+
+
+@pytest.mark.parametrize("tokens", FORMULAS)
+@pytest.mark.parametrize(
+    "inputs",
+    [
+        {"A1": TokenNumber(5), "B1": TokenNumber(0)},
+        {"A1": TokenNumber(20000), "B1": TokenNumber(4)},
+        {"A1": TokenString("1"), "B1": TokenBool(False)},
+        {"A1": TokenError(TokenErrorTypes.REF, "ref"), "B1": TokenNumber(2)},
+    ],
+)
+def test_compiled_matches_stack_backend(tokens, inputs):
+    compiled, stack = both_backends(tokens)
+    assert compiled.backend == "compiled"
+    assert stack.backend == "stack"
+    assert compiled.inputs == stack.inputs
+    assert compiled(inputs) == stack(inputs)
+
+
+@settings(max_examples=75, deadline=None)
+@given(
+    a=st.integers(min_value=-1_000, max_value=1_000),
+    b=st.integers(min_value=-1_000, max_value=1_000),
+    c=st.integers(min_value=-1_000, max_value=1_000),
+    operators=st.lists(st.sampled_from(["+", "-", "*", "/", "<", ">=", "=", "&"]), min_size=2, max_size=2),
+)
+def test_property_compiled_matches_stack_backend(a, b, c, operators):
+    tokens = [
+        ref("A1"),
+        op(operators[0]),
+        prefix("-"),
+        TokenNumber(b),
+        op(operators[1]),
+        ref("C1"),
+    ]
+    compiled, stack = both_backends(tokens)
+    inputs = {"A1": TokenNumber(a), "C1": TokenNumber(c)}
+    assert compiled(inputs) == stack(inputs)
+
+
+def test_compiled_missing_input_raises_key_error():
+    run = get_interpreter([ref("F7"), op("+"), TokenNumber(1)])
+    assert run is not None
+    with pytest.raises(KeyError) as exc_info:
+        run({})
+    assert "F7" in str(exc_info.value)
+
+
+def test_compiled_accepts_none_inputs():
+    run = get_interpreter([TokenNumber(1), op("+"), TokenNumber(2)])
+    assert run is not None
+    assert run() == 3
+
+
+def test_compiled_resolves_operators_ahead_of_time():
+    calls = []
+
+    def add(a, b):
+        calls.append((a.value, b.value))
+        return TokenNumber(a.value + b.value)
+
+    run = get_interpreter([ref("A1"), op("+"), TokenNumber(2)], registered_ops={"+": add})
+    assert run is not None
+    assert run.backend == "compiled"
+    assert run({"A1": TokenNumber(1)}) == 3
+    assert calls == [(1, 2)]
+
+
+def test_compiled_variadic_function_call():
+    def concat_all(*args):
+        return TokenString("".join(str(arg.value) for arg in args))
+
+    tokens = [func("CAT(")]
+    for index in range(5):
+        if index:
+            tokens.append(sep())
+        tokens.append(TokenNumber(index))
+    tokens.append(close())
+    run = get_interpreter(tokens, proposed_functions={"CAT(": (None, concat_all)})
+    assert run is not None
+    assert run.backend == "compiled"
+    assert run({}) == "01234"
+
+
+def test_compiled_zero_arg_function_call():
+    run = get_interpreter(
+        [func("ONE("), close()],
+        proposed_functions={"ONE(": (None, lambda: TokenNumber(1))},
+    )
+    assert run is not None
+    assert run.backend == "compiled"
+    assert run({}) == 1
+
+
+def test_compiled_function_returning_none_raises_like_stack():
+    compiled, stack = both_backends(
+        [func("NOTHING("), TokenNumber(1), close()],
+        proposed_functions={"NOTHING(": ([None], lambda value: None)},
+    )
+    assert compiled.backend == "compiled"
+    for run in (compiled, stack):
+        with pytest.raises(ValueError) as exc_info:
+            run({})
+        assert str(exc_info.value) == "Formula evaluation error: too many values remaining."
+
+
+@pytest.mark.parametrize(
+    "tokens, message",
+    [
+        ([TokenNumber(0), TokenNumber(1)], "Formula evaluation error: too many values remaining."),
+        ([TokenNumber(0), op("+")], "Not enough values for operation '+'."),
+        (
+            [func("SEARCH("), TokenNumber(1), sep(), sep(), close()],
+            "Missing required argument at 1 for function `SEARCH(`",
+        ),
+    ],
+)
+def test_malformed_programs_fall_back_to_stack_backend(tokens, message):
+    run = get_interpreter(tokens)
+    assert run is not None
+    assert run.backend == "stack"
+    with pytest.raises(ValueError) as exc_info:
+        run({})
+    assert str(exc_info.value) == message
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        get_interpreter([TokenNumber(1)], backend="jit")
+
+
+def test_deeply_nested_programs_fall_back_to_stack_backend():
+    tokens = [ref("A0")]
+    for index in range(1, 1500):
+        tokens += [op("+"), ref(f"A{index}")]
+    inputs = {f"A{index}": TokenNumber(index) for index in range(1500)}
+
+    run = get_interpreter(tokens)
+    assert run.backend == "stack"
+    assert run(inputs) == sum(range(1500))
+
+    shallow = get_interpreter(tokens[:101])
+    assert shallow.backend == "compiled"
+    assert shallow(inputs) == sum(range(51))
@@ -0,0 +1,140 @@
+import threading
+
+import pytest
+
+from mvin import REGISTERED_OPS, TokenNumber, TokenString, pure, volatile
+from mvin.functions.excel_lib import DEFAULT_FUNCTIONS, excel_len
+from mvin.interpreter import (
+    _CALL,
+    _INFIX,
+    _PREFIX,
+    _SHARED,
+    _infix_to_rpn,
+    _rpn_to_tree,
+    _share_subexpressions,
+)
+from mvin.tokenizer import get_interpreter_from_string, tokenize
+from mvin.tracing import RecordingObserver
+
+
+def make_functions(calls):
+    @pure
+    def pure_len(text):
+        calls.append("PURE_LEN")
+        return excel_len(text)
+
+    @volatile
+    def volatile_len(text):
+        calls.append("VOLATILE_LEN")
+        return excel_len(text)
+
+    functions = dict(DEFAULT_FUNCTIONS)
+    functions["PURE_LEN("] = ([None], pure_len)
+    functions["VOLATILE_LEN("] = ([None], volatile_len)
+    return functions
+
+
+def shared_nodes(formula):
+    rpn, _ = _infix_to_rpn(tokenize(formula), DEFAULT_FUNCTIONS)
+    tree = _rpn_to_tree(rpn, DEFAULT_FUNCTIONS, REGISTERED_OPS)
+    tree, count = _share_subexpressions(tree, DEFAULT_FUNCTIONS, REGISTERED_OPS)
+    found = []
+
+    def walk(node):
+        if node[0] == _SHARED:
+            found.append(node[1])
+            walk(node[2])
+        elif node[0] == _CALL:
+            for arg in node[2]:
+                walk(arg)
+        elif node[0] in (_INFIX, _PREFIX):
+            for child in node[2:]:
+                walk(child)
+
+    walk(tree)
+    return count, sorted(found)
+
+
+def test_repeated_pure_subtrees_are_shared():
+    assert shared_nodes("=IF(LEN(A1) > 3, LEFT(A1, LEN(A1) - 1), A1)") == (1, [0, 0])
+    # The repeated SUM(...) is shared as a whole; LEN(A1) only occurs inside it
+    assert shared_nodes("=SUM(C1, LEN(A1)) * SUM(C1, LEN(A1)) + LEN(B1)") == (1, [0, 0])
+    # Operators alone, constants and distinct inputs are not shared
+    assert shared_nodes("=A1 * 2 + A1 * 2") == (0, [])
+    assert shared_nodes('=LEN("abc") + LEN(A1) + LEN(B1)') == (0, [])
+
+
+def test_pure_function_runs_once_per_evaluation():
+    calls = []
+    run = get_interpreter_from_string(
+        "=PURE_LEN(A1) + PURE_LEN(A1) * PURE_LEN(A1)", make_functions(calls)
+    )
+    assert run({"A1": TokenString("abc")}) == 12
+    assert calls == ["PURE_LEN"]
+    assert run({"A1": TokenString("abcd")}) == 20  # no result leaks between evaluations
+    assert run.call(TokenString("ab")) == 6
+    assert calls == ["PURE_LEN"] * 3
+
+
+def test_volatile_and_unoptimized_calls_are_repeated():
+    calls = []
+    functions = make_functions(calls)
+    volatile_run = get_interpreter_from_string("=VOLATILE_LEN(A1) + VOLATILE_LEN(A1)", functions)
+    assert volatile_run({"A1": TokenString("abc")}) == 6
+    assert calls == ["VOLATILE_LEN"] * 2
+
+    calls.clear()
+    formula = "=PURE_LEN(A1) + PURE_LEN(A1)"
+    assert get_interpreter_from_string(formula, functions, optimize=False)(
+        {"A1": TokenString("abc")}
+    ) == 6
+    assert get_interpreter_from_string(formula, functions, observer=RecordingObserver())(
+        {"A1": TokenString("abc")}
+    ) == 6
+    assert calls == ["PURE_LEN"] * 4
+
+
+def test_shared_subtree_in_untaken_branch_is_not_computed():
+    calls = []
+    run = get_interpreter_from_string(
+        "=IF(A1 > 0, 1, PURE_LEN(B1) + PURE_LEN(B1))", make_functions(calls)
+    )
+    assert run({"A1": TokenNumber(1), "B1": TokenString("abc")}) == 1
+    assert calls == []
+    assert run({"A1": TokenNumber(0), "B1": TokenString("abc")}) == 6
+    assert calls == ["PURE_LEN"]
+
+
+@pytest.mark.parametrize(
+    "formula",
+    [
+        '=IF(ISERROR(SEARCH("x", A1)), 0, SEARCH("x", A1) + LEN(A1) - SEARCH("x", A1))',
+        "=IF(LEN(A1) > 3, LEFT(A1, LEN(A1) - 1), A1) & LEFT(A1, LEN(A1) - 1)",
+        "=MAX(SUM(B1, LEN(A1)) * SUM(B1, LEN(A1)), SUM(B1, LEN(A1)) + LEN(A1))",
+    ],
+)
+def test_shared_results_match_stack_backend(formula):
+    run = get_interpreter_from_string(formula)
+    stack = get_interpreter_from_string(formula, backend="stack")
+    for text in ["ab", "abcdx", "xyz", "no match here"]:
+        inputs = {"A1": TokenString(text), "B1": TokenNumber(2)}
+        assert run(inputs) == stack(inputs)
+
+
+def test_shared_results_are_per_thread():
+    run = get_interpreter_from_string("=LEN(A1) * 10 + LEN(A1)")
+    errors = []
+
+    def worker(length):
+        inputs = {"A1": TokenString("x" * length)}
+        for _ in range(2000):
+            if run(inputs) != length * 11:
+                errors.append(length)
+                return
+
+    threads = [threading.Thread(target=worker, args=(length,)) for length in range(1, 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
@@ -0,0 +1,157 @@
+import pytest  # required for pytest.raises
+
+from mvin import BaseToken, TokenNumber, TokenString, is_pure, pure, volatile
+from mvin.functions.excel_lib import DEFAULT_FUNCTIONS, excel_len
+from mvin.interpreter import get_interpreter
+
+
+class ManualToken(BaseToken):
+    def __init__(self, value, token_type, subtype) -> None:
+        super().__init__()
+        self._value = value
+        self._type = token_type
+        self._subtype = subtype
+
+
+def counting_ops(calls):
+    def multiply(a, b):
+        calls.append("*")
+        return TokenNumber(a.value * b.value)
+
+    def greater(a, b):
+        calls.append(">")
+        return TokenNumber(a.value > b.value)
+
+    return {"*": multiply, ">": greater}
+
+
+def test_operator_subexpression_is_folded_at_compile_time():
+    calls = []
+    tokens = [
+        ManualToken("A1", "OPERAND", "RANGE"),
+        ManualToken(">", "OPERATOR-INFIX", ""),
+        TokenNumber(10),
+        ManualToken("*", "OPERATOR-INFIX", ""),
+        TokenNumber(1000),
+    ]
+    run = get_interpreter(tokens, registered_ops=counting_ops(calls))
+    assert run is not None
+    assert calls == ["*"]  # 10*1000 evaluated once while compiling
+
+    calls.clear()
+    assert run({"A1": TokenNumber(20000)})
+    assert not run({"A1": TokenNumber(1)})
+    assert calls == [">", ">"]
+
+
+def test_optimize_false_keeps_subexpression():
+    calls = []
+    tokens = [TokenNumber(10), ManualToken("*", "OPERATOR-INFIX", ""), TokenNumber(2)]
+    run = get_interpreter(tokens, registered_ops=counting_ops(calls), optimize=False)
+    assert run is not None
+    assert calls == []
+    assert run({}) == 20
+    assert calls == ["*"]
+
+
+def make_functions(calls):
+    @pure
+    def pure_len(text):
+        calls.append("PURE_LEN")
+        return excel_len(text)
+
+    @volatile
+    def now():
+        calls.append("NOW")
+        return TokenNumber(45000)
+
+    def unmarked(value):
+        calls.append("UNMARKED")
+        return value
+
+    functions = dict(DEFAULT_FUNCTIONS)
+    functions["PURE_LEN("] = ([None], pure_len)
+    functions["NOW("] = (None, now)
+    functions["UNMARKED("] = ([None], unmarked)
+    return functions
+
+
+def call(name, *args):
+    tokens = [ManualToken(name, "FUNC", "OPEN")]
+    for index, arg in enumerate(args):
+        if index:
+            tokens.append(ManualToken(",", "SEP", "ARG"))
+        tokens.append(arg)
+    tokens.append(ManualToken(")", "FUNC", "CLOSE"))
+    return tokens
+
+
+def test_only_pure_functions_are_folded():
+    calls = []
+    functions = make_functions(calls)
+
+    folded = get_interpreter(call("PURE_LEN(", TokenString("abc")), proposed_functions=functions)
+    volatile_run = get_interpreter(call("NOW("), proposed_functions=functions)
+    unmarked_run = get_interpreter(call("UNMARKED(", TokenNumber(1)), proposed_functions=functions)
+    assert folded is not None and volatile_run is not None and unmarked_run is not None
+    assert calls == ["PURE_LEN"]
+
+    calls.clear()
+    assert folded({}) == 3
+    assert volatile_run({}) == 45000
+    assert unmarked_run({}) == 1
+    assert calls == ["NOW", "UNMARKED"]
+
+
+def test_builtin_functions_are_pure_and_fold_nested_calls():
+    assert is_pure(excel_len)
+    assert not is_pure(lambda: None)
+    assert is_pure(lambda: None, default=True)
+    tokens = [
+        ManualToken("LEN(", "FUNC", "OPEN"),
+        ManualToken("LEFT(", "FUNC", "OPEN"),
+        TokenString("hello"),
+        ManualToken(",", "SEP", "ARG"),
+        TokenNumber(2),
+        ManualToken(")", "FUNC", "CLOSE"),
+        ManualToken(")", "FUNC", "CLOSE"),
+    ]
+    run = get_interpreter(tokens)
+    assert run is not None
+    assert run({}) == 2
+
+
+def test_failing_constant_subexpression_is_not_folded():
+    calls = []
+
+    def explode(a, b):
+        calls.append("boom")
+        raise RuntimeError("evaluated lazily")
+
+    tokens = [TokenNumber(1), ManualToken("+", "OPERATOR-INFIX", ""), TokenNumber(2)]
+    run = get_interpreter(tokens, registered_ops={"+": explode})
+    assert run is not None
+    assert calls == ["boom"]
+    with pytest.raises(RuntimeError):
+        run({})
+    assert calls == ["boom", "boom"]
+
+
+def test_folded_results_match_unoptimized_results():
+    tokens = [
+        ManualToken("-", "OPERATOR-PREFIX", ""),
+        TokenNumber(2),
+        ManualToken("^", "OPERATOR-INFIX", ""),
+        TokenNumber(2),
+        ManualToken("&", "OPERATOR-INFIX", ""),
+        ManualToken("SEARCH(", "FUNC", "OPEN"),
+        TokenString("B"),
+        ManualToken(",", "SEP", "ARG"),
+        TokenString("abc"),
+        ManualToken(")", "FUNC", "CLOSE"),
+    ]
+    optimized = get_interpreter(tokens)
+    plain = get_interpreter(tokens, optimize=False)
+    stack = get_interpreter(tokens, backend="stack")
+    assert optimized is not None and plain is not None and stack is not None
+    assert optimized({}) == plain({}) == stack({}) == "-42"
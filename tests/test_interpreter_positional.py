@@ -0,0 +1,70 @@
+import pytest
+
+from mvin import TokenError, TokenNumber, TokenString
+from mvin.profiling import ProfileStats
+from mvin.tokenizer import get_interpreter_from_string
+from mvin.tracing import RecordingObserver
+
+FORMULA = '=IF(B1 > A1, A1 & "-" & B1, LEFT(C1, A1)) & A1'
+
+
+def values(a, b, c="hello"):
+    return TokenNumber(a), TokenNumber(b), TokenString(c)
+
+
+@pytest.mark.parametrize("backend", ["compiled", "stack"])
+def test_input_order_follows_first_appearance(backend):
+    run = get_interpreter_from_string(FORMULA, backend=backend)
+    assert run.input_order == ("B1", "A1", "C1")
+    assert set(run.input_order) == run.inputs
+    assert get_interpreter_from_string("=1 + 2").input_order == ()
+
+
+@pytest.mark.parametrize("backend", ["compiled", "stack"])
+def test_call_matches_dict_evaluation(backend):
+    run = get_interpreter_from_string(FORMULA, backend=backend)
+    for a, b in [(1, 2), (3, 2), (2, 2)]:
+        b1, a1, c1 = values(b, a)
+        expected = run({"A1": a1, "B1": b1, "C1": c1})
+        assert run.call(b1, a1, c1) == expected
+        assert run.call_tuple((b1, a1, c1)) == expected
+        assert run.call_tuple([b1, a1, c1]) == expected
+    assert get_interpreter_from_string("=1 + 2", backend=backend).call() == 3
+
+
+@pytest.mark.parametrize("backend", ["compiled", "stack"])
+def test_call_rejects_wrong_number_of_values(backend):
+    run = get_interpreter_from_string("=A1 + B1", backend=backend)
+    with pytest.raises(TypeError, match="Expected 2 input values"):
+        run.call(TokenNumber(1))
+    with pytest.raises(TypeError):
+        run.call_tuple(values(1, 2))
+
+
+def test_call_keeps_observer_and_profile():
+    observer = RecordingObserver()
+    stats = ProfileStats()
+    formula = "=SUM(A1, B1) * 2"
+    traced = get_interpreter_from_string(formula, observer=observer)
+    assert traced.call(TokenNumber(1), TokenNumber(2)) == 6
+    assert [event.kind for event in observer.events][-1] == "result"
+
+    profiled = get_interpreter_from_string(formula, profile=stats)
+    assert profiled.call(TokenNumber(1), TokenNumber(2)) == 6
+    assert stats.functions["SUM("].calls == 1
+
+
+@pytest.mark.parametrize("backend", ["compiled", "stack"])
+def test_evaluate_batch_binds_rows_positionally(backend):
+    run = get_interpreter_from_string("=A1 / B1", backend=backend)
+    columns = {
+        "B1": [TokenNumber(2), TokenNumber(0), TokenNumber(4)],
+        "A1": [TokenNumber(1), TokenNumber(1), TokenNumber(2)],
+        "Z9": [TokenNumber(0)] * 3,
+    }
+    results = run.evaluate_batch(columns)
+    assert [result.value for result in results] == [0.5, "#DIV/0!", 0.5]
+    assert [result.subtype for result in results] == ["NUMBER", "ERROR", "NUMBER"]
+    # A missing input column still reports #REF! per row
+    missing = run.evaluate_batch({"A1": [TokenNumber(1)]})
+    assert isinstance(missing[0], TokenError) and missing[0].value == "#REF!"
@@ -0,0 +1,144 @@
+import itertools
+
+import pytest
+
+from mvin import (
+    REGISTERED_OPS,
+    TOKEN_EMPTY,
+    TokenArray,
+    TokenBool,
+    TokenError,
+    TokenErrorTypes,
+    TokenNumber,
+    TokenString,
+    pure,
+)
+from mvin.functions.excel_lib import DEFAULT_FUNCTIONS
+from mvin.profiling import ProfileStats
+from mvin.raw import RawError, box, unbox
+from mvin.tokenizer import get_interpreter_from_string
+from mvin.tracing import RecordingObserver
+
+NA = RawError.of(TokenErrorTypes.NA)
+VALUES = [0, 1, 2.5, -3, True, False, "abc", "", None, NA]
+FORMULAS = [
+    "=A1 + B1 * 2 - A1 ^ 2",
+    "=A1 / B1",
+    "=(A1 > B1) + 1",
+    "=-(A1 <= B1)",
+    "=(A1 >= B1) & A1 & B1",
+    "=A1 = B1",
+    "=A1 <> B1",
+    "=(A1 < B1) = 1",
+    "=-A1 + +B1",
+    '=IF(A1 > B1, A1, B1) & "!"',
+    "=IFERROR(A1 / B1, LEN(A1))",
+    "=SUM(A1, B1, 3) * COUNT(A1, B1)",
+    "=AND(A1, B1)",
+    '=LEFT(A1, 2) & SEARCH("b", A1)',
+    "=A1",
+    "=CHOOSE(2, A1, B1)",
+]
+
+
+def token_result(run, raw_inputs):
+    try:
+        return run({key: box(value) for key, value in raw_inputs.items()})
+    except Exception as e:
+        return type(e)
+
+
+def raw_result(run, raw_inputs):
+    try:
+        return run.evaluate_raw(raw_inputs)
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize("backend", ["compiled", "stack"])
+@pytest.mark.parametrize("formula", FORMULAS)
+def test_raw_results_match_token_path(formula, backend):
+    run = get_interpreter_from_string(formula, backend=backend)
+    for a, b in itertools.product(VALUES, repeat=2):
+        inputs = {"A1": a, "B1": b}
+        expected = token_result(run, inputs)
+        result = raw_result(run, inputs)
+        assert result == expected, (a, b)
+        assert type(result) is type(expected) or isinstance(result, RawError), (a, b)
+
+
+def test_raw_errors_are_compact_and_equal_to_error_codes():
+    run = get_interpreter_from_string("=A1 / B1")
+    result = run.evaluate_raw({"A1": 1, "B1": 0})
+    assert isinstance(result, RawError) and result == "#DIV/0!"
+    assert result is RawError.of(TokenErrorTypes.ZERO_DIV)
+    assert result.error_type is TokenErrorTypes.ZERO_DIV
+    assert repr(result) == "RawError('#DIV/0!')"
+    assert run.evaluate_raw({"A1": NA, "B1": 1}) is NA
+    assert get_interpreter_from_string('=A1 & "x"').evaluate_raw({"A1": 1.5}) == "1.5x"
+
+
+def test_raw_comparison_results_stay_numbers():
+    assert get_interpreter_from_string("=A1 > 1").evaluate_raw({"A1": 2}) is True
+    assert get_interpreter_from_string("=(A1 > 1) * 5").evaluate_raw({"A1": 2}) == 5
+    # A logical input is not a number
+    assert get_interpreter_from_string("=A1 * 5").evaluate_raw({"A1": True}) == "#NUM!"
+
+
+def test_raw_inputs_accept_tokens_and_report_missing_keys():
+    run = get_interpreter_from_string("=SUM(R1) + A1")
+    assert run.evaluate_raw({"R1": TokenArray.column([1, 2, 3]), "A1": TokenNumber(4)}) == 10
+    assert get_interpreter_from_string("=A1").evaluate_raw({"A1": None}) is None
+    with pytest.raises(KeyError, match="A1"):
+        run.evaluate_raw({"R1": TokenArray.column([1])})
+    assert get_interpreter_from_string("=1 + 2").evaluate_raw() == 3
+
+
+def test_raw_mode_with_custom_ops_profile_and_observer():
+    ops = dict(REGISTERED_OPS)
+    ops["+"] = lambda a, b: TokenNumber(a.value * 10 + b.value)
+    stats = ProfileStats()
+    for kwargs in ({"registered_ops": ops}, {"profile": stats}, {"observer": RecordingObserver()}):
+        run = get_interpreter_from_string("=A1 + B1 * 2", **kwargs)
+        expected = run({"A1": TokenNumber(1), "B1": TokenNumber(2)})
+        assert run.evaluate_raw({"A1": 1, "B1": 2}) == expected
+    assert stats.operators["+"].calls == 2
+
+
+def test_raw_mode_with_shared_subexpressions_and_missing_results():
+    calls = []
+
+    @pure
+    def twice(value):
+        calls.append(value.value)
+        return TokenNumber(value.value * 2)
+
+    def nothing(value):
+        return None
+
+    functions = dict(DEFAULT_FUNCTIONS)
+    functions["TWICE("] = ([None], twice)
+    functions["NOTHING("] = ([None], nothing)
+    run = get_interpreter_from_string("=TWICE(A1) + TWICE(A1)", functions)
+    assert run.evaluate_raw({"A1": 3}) == 12
+    assert calls == [3]
+    with pytest.raises(ValueError):
+        get_interpreter_from_string("=NOTHING(A1)", functions).evaluate_raw({"A1": 1})
+
+
+def test_box_and_unbox_round_trip():
+    tokens = [
+        TokenNumber(3),
+        TokenNumber(2.5),
+        TokenString("x"),
+        TokenBool(True),
+        TOKEN_EMPTY,
+        TokenError(TokenErrorTypes.REF, "message"),
+    ]
+    assert [unbox(token) for token in tokens] == [3, 2.5, "x", True, None, "#REF!"]
+    for token in tokens:
+        boxed = box(unbox(token))
+        assert (boxed.type, boxed.subtype, boxed.value) == (token.type, token.subtype, token.value)
+    array = TokenArray.column([1])
+    assert unbox(array) is array and box(array) is array
+    assert box(unbox(None)) is None
@@ -0,0 +1,105 @@
+import pickle
+
+import pytest
+
+from mvin import REGISTERED_OPS, BaseToken, FunctionRegistry, TokenNumber, TokenString, parallel
+from mvin.engine import Engine
+from mvin.functions.excel_lib import DEFAULT_FUNCTIONS
+from mvin.interpreter import get_interpreter
+from mvin.parallel import ParallelCalculator
+
+
+class ManualToken(BaseToken):
+    def __init__(self, value, token_type, subtype) -> None:
+        super().__init__()
+        self._value = value
+        self._type = token_type
+        self._subtype = subtype
+
+
+def ref(name):
+    return ManualToken(name, "OPERAND", "RANGE")
+
+
+def op(value):
+    return ManualToken(value, "OPERATOR-INFIX", "")
+
+
+def build_engine(blocks):
+    engine = Engine()
+    for block in range(blocks):
+        engine.set_formula(f"B{block}", [ref(f"A{block}"), op("*"), TokenNumber(2)])
+        engine.set_formula(f"C{block}", [ref(f"B{block}"), op("+"), ref(f"A{block}")])
+        engine.set_formula(f"D{block}", [ref(f"C{block}"), op("&"), TokenString("!")])
+    return engine
+
+
+def test_components_are_weakly_connected_subgraphs():
+    engine = build_engine(3)
+    engine.set_formula("E0", [ref("D0"), op("&"), ref("D1")])  # joins blocks 0 and 1
+    assert engine.components() == [
+        ["B0", "C0", "D0", "B1", "C1", "D1", "E0"],
+        ["B2", "C2", "D2"],
+    ]
+    assert engine.source("B0")[0].value == "A0"
+    with pytest.raises(KeyError):
+        engine.source("A0")
+
+
+def test_parallel_results_match_engine():
+    engine = build_engine(10)
+    inputs = {f"A{block}": TokenNumber(block) for block in range(10)}
+    expected = {key: token.value for key, token in engine.calculate(inputs).items()}
+    with ParallelCalculator(engine, max_workers=2) as calculator:
+        for _ in range(2):  # workers compile once and serve every calculation
+            results = calculator.calculate(inputs)
+            assert {key: token.value for key, token in results.items()} == expected
+        # Without inputs, the values the engine got from `calculate` are used
+        assert calculator.calculate()["B3"].value == 6
+
+        engine.set_value("A3", TokenNumber(10))
+        assert calculator.calculate()["B3"].value == 20
+        assert calculator.calculate({"A3": TokenNumber(1)})["B3"].value == 2
+        assert engine.value("A3").value == 10  # inputs are not stored in the engine
+
+    with ParallelCalculator(build_engine(1), max_workers=1) as calculator:
+        assert calculator.calculate()["B0"].value == "#REF!"
+
+
+def test_parallel_requires_token_sources():
+    engine = Engine()
+    engine.set_formula("B1", get_interpreter([ref("A1")]))
+    with pytest.raises(ValueError, match="registered as an interpreter"):
+        ParallelCalculator(engine, max_workers=1)
+    with pytest.raises(ValueError):
+        ParallelCalculator(build_engine(1), max_workers=0)
+
+
+def test_registries_get_a_new_version_when_unpickled():
+    registry = FunctionRegistry(DEFAULT_FUNCTIONS)
+    copy = pickle.loads(pickle.dumps(registry))
+    assert list(copy) == list(registry)
+    assert all(copy[name][1] is registry[name][1] for name in registry)
+    assert copy.version != registry.version
+
+
+def test_parallel_workers_load_programs_from_cache_dir(tmp_path):
+    engine = build_engine(4)
+    inputs = {f"A{block}": TokenNumber(block) for block in range(4)}
+    expected = {key: token.value for key, token in engine.calculate(inputs).items()}
+    for _ in range(2):  # the second calculator loads what the first one stored
+        with ParallelCalculator(engine, max_workers=1, cache_dir=tmp_path) as calculator:
+            results = calculator.calculate(inputs)
+        assert {key: token.value for key, token in results.items()} == expected
+    assert len(list(tmp_path.glob("*.mvin"))) == 12  # one program per formula
+
+
+def test_workers_compile_chunks_on_first_use():
+    chunks = [
+        [("B1", [ref("A1"), op("*"), TokenNumber(2)])],
+        [("B2", [ref("A2"), op("+"), TokenNumber(1)])],
+    ]
+    parallel._init_worker(chunks, DEFAULT_FUNCTIONS, REGISTERED_OPS)
+    assert parallel._worker_chunks == {}
+    assert parallel._evaluate_chunk(1, {"A2": TokenNumber(4)})[0][1].value == 5
+    assert list(parallel._worker_chunks) == [1]
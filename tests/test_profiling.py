@@ -0,0 +1,113 @@
+import json
+import pickle
+
+import pytest
+
+from mvin import REGISTERED_OPS, TokenNumber, TokenString, lazy, volatile
+from mvin.functions.excel_lib import DEFAULT_FUNCTIONS
+from mvin.interpreter import InterpreterCache, get_interpreter
+from mvin.profiling import ProfileEntry, ProfileStats
+from mvin.tokenizer import get_interpreter_from_string, tokenize
+
+FORMULA = '=IF(A1 > 2, SUM(A1, B1) * 2, LEN("abc") + A1)'
+
+
+def run_rows(run, rows):
+    for value in range(rows):
+        run({"A1": TokenNumber(value), "B1": TokenNumber(1)})
+
+
+@pytest.mark.parametrize("backend", ["compiled", "stack"])
+def test_profile_counts_operators_and_functions(backend):
+    stats = ProfileStats()
+    run = get_interpreter_from_string(FORMULA, backend=backend, profile=stats)
+    run_rows(run, 5)  # A1 = 0..4: two rows take the SUM branch
+
+    # The stack machine evaluates both branches and folds no constants
+    expected = {"compiled": (2, 3, 0), "stack": (5, 5, 5)}[backend]
+    calls = {name: entry.calls for name, entry in stats.functions.items()}
+    assert (calls.pop("SUM("), stats.operators["+"].calls, calls.pop("LEN(", 0)) == expected
+    assert calls == {"IF(": 5}
+    assert stats.operators[">"].calls == 5
+    assert stats.operators["*"].calls == expected[0]
+    assert all(entry.total_ns > 0 for entry in stats.operators.values())
+
+
+@pytest.mark.parametrize("backend", ["compiled", "stack"])
+def test_profile_counts_prefix_operators_and_division_by_zero(backend):
+    stats = ProfileStats()
+    run = get_interpreter_from_string("=-A1/B1 + +B1", backend=backend, profile=stats)
+    for b1 in (2, 0, 0):
+        expected = run({"A1": TokenNumber(4), "B1": TokenNumber(b1)})
+        assert run.evaluate_raw({"A1": 4, "B1": b1}) == expected
+    assert run({"A1": TokenNumber(4), "B1": TokenNumber(0)}) == "#DIV/0!"
+
+    calls = {name: entry.calls for name, entry in stats.operators.items()}
+    assert calls == {"u-": 7, "/": 7, "u+": 7, "+": 7}
+
+
+def test_profile_skips_folded_constants_and_keeps_marks():
+    stats = ProfileStats()
+    run = get_interpreter_from_string("=LEN(\"abc\") + A1", profile=stats)
+    assert run({"A1": TokenNumber(1)}) == 4
+    assert stats.functions == {}  # LEN("abc") was folded at compile time
+    assert stats.operators == {"+": ProfileEntry(1, stats.operators["+"].total_ns)}
+
+    calls = []
+
+    @volatile
+    @lazy
+    def first(context, a, b):
+        calls.append(1)
+        return a(context)
+
+    functions = dict(DEFAULT_FUNCTIONS, **{"FIRST(": (None, first)})
+    run = get_interpreter_from_string(
+        "=FIRST(1, 1/0)", functions, REGISTERED_OPS, profile=stats
+    )
+    assert run({}) == 1  # still lazy: the division is never evaluated
+    assert stats.functions["FIRST("].calls == 1
+    assert "/" not in stats.operators
+
+
+def test_profile_off_adds_nothing():
+    stats = ProfileStats()
+    get_interpreter_from_string(FORMULA, profile=stats)
+    run = get_interpreter_from_string(FORMULA)
+    run_rows(run, 3)
+    assert stats.functions == {} and stats.operators == {}
+
+
+def test_profile_merge_reset_and_serialization():
+    first, second = ProfileStats(), ProfileStats()
+    run_rows(get_interpreter_from_string(FORMULA, profile=first), 4)
+    run_rows(get_interpreter_from_string("=A1 & B1", profile=second), 2)
+
+    restored = pickle.loads(pickle.dumps(second))
+    assert restored.as_dict() == second.as_dict()
+    from_json = ProfileStats.from_dict(json.loads(json.dumps(first.as_dict())))
+    assert from_json.as_dict() == first.as_dict()
+
+    merged = ProfileStats().merge(from_json, restored)
+    assert merged.operators["&"].calls == 2
+    assert merged.operators[">"].calls == 4
+    assert merged.functions["IF("].total_ns == first.functions["IF("].total_ns
+
+    report = merged.report(limit=2).splitlines()
+    assert report[0].split() == ["kind", "name", "calls", "total", "ms", "mean", "us"]
+    assert len(report) == 3
+    assert "ProfileStats(operators=" in repr(merged)
+
+    merged.reset()
+    assert merged.as_dict() == {"operators": {}, "functions": {}}
+
+
+def test_profiled_interpreters_are_cached_per_stats():
+    cache = InterpreterCache()
+    stats = ProfileStats()
+    tokens = tokenize("=A1 & \"!\"")
+    profiled = get_interpreter(tokens, cache=cache, profile=stats)
+    assert get_interpreter(tokens, cache=cache, profile=stats) is profiled
+    assert get_interpreter(tokens, cache=cache) is not profiled
+    assert profiled({"A1": TokenString("hi")}) == "hi!"
+    assert stats.operators["&"].calls == 1
@@ -0,0 +1,154 @@
+import marshal
+
+import pytest
+
+from mvin import (
+    TOKEN_EMPTY,
+    FunctionRegistry,
+    TokenArray,
+    TokenError,
+    TokenErrorTypes,
+    TokenNumber,
+    pure,
+)
+from mvin.functions.excel_lib import DEFAULT_FUNCTIONS
+from mvin.interpreter import get_interpreter
+from mvin.program import FORMAT_VERSION, ProgramCache, dumps, loads
+from mvin.tokenizer import tokenize
+
+FORMULAS = [
+    "=A1 + 2 * B1",
+    '=IF(A1 > 2, LEFT("abcdef", A1), -B1) & "!"',
+    "=VLOOKUP(A1, B1, 1)",
+    "=SUM(A1, , 3) / -#DIV/0!",
+    "=AND(TRUE, A1 <> B1)",
+]
+INPUTS = {"A1": TokenNumber(3), "B1": TokenNumber(4)}
+
+
+def evaluate(run):
+    try:
+        return run(dict(INPUTS))
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize("formula", FORMULAS)
+@pytest.mark.parametrize("backend", ["compiled", "stack"])
+def test_round_trip_matches_get_interpreter(formula, backend):
+    tokens = tokenize(formula)
+    data = dumps(tokens)
+    assert isinstance(data, bytes)
+    run = loads(data, backend=backend)
+    expected = get_interpreter(tokens, backend=backend)
+    assert run.inputs == expected.inputs
+    assert run.backend == expected.backend
+    assert evaluate(run) == evaluate(expected)
+
+
+def test_program_layout():
+    magic, version, code, constants, inputs, names = marshal.loads(
+        dumps(tokenize('=IF(B1 > 1, A1 & "x", A1)'))
+    )
+    assert (magic, version) == ("mvin-program", FORMAT_VERSION)
+    assert inputs == ("A1", "B1")  # one slot per distinct reference
+    assert names == (">", "&", "IF(")  # in RPN order
+    assert constants == (("NUMBER", 1), ("TEXT", "x"))
+    assert code.count(2) >= 3  # three _OP_REF instructions
+
+
+def test_constants_round_trip():
+    run = loads(dumps(tokenize("=IFERROR(#N/A, A1)")))
+    assert run({"A1": TOKEN_EMPTY}) is None
+    error = TokenError(TokenErrorTypes.NUM, "custom")
+    run = loads(dumps([error]))
+    assert run.evaluate_token({}).message == "custom"
+    with pytest.raises(ValueError, match="cannot be serialized"):
+        dumps([TokenArray.column([1, 2])])
+
+
+def test_functions_are_resolved_on_load():
+    @pure
+    def double(a):
+        return TokenNumber(a.value * 2)
+
+    functions = FunctionRegistry.of(DEFAULT_FUNCTIONS).register("DOUBLE(", None, double)
+    data = dumps(tokenize("=DOUBLE(A1) + 1"), functions)
+    assert loads(data, functions)({"A1": TokenNumber(4)}) == 9
+
+    replaced = functions.register("DOUBLE(", None, lambda a: TokenNumber(a.value * 3))
+    assert loads(data, replaced)({"A1": TokenNumber(4)}) == 13
+    with pytest.raises(ValueError, match="Unsupported function `DOUBLE\\(`"):
+        loads(data)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"not a program",
+        marshal.dumps(("mvin-program", FORMAT_VERSION + 1, (), (), (), ())),
+        marshal.dumps(("mvin-program", FORMAT_VERSION, (9, 0), (), (), ())),
+        marshal.dumps(("mvin-program", FORMAT_VERSION, (0, 3), (), (), ())),
+        marshal.dumps(("mvin-program", FORMAT_VERSION, (0, 0), (("ARRAY", 1),), (), ())),
+    ],
+)
+def test_invalid_programs(data):
+    with pytest.raises(ValueError):
+        loads(data)
+
+
+def test_loads_rejects_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown backend"):
+        loads(dumps(tokenize("=1")), backend="jit")
+
+
+def test_program_cache_skips_parsing(tmp_path, monkeypatch):
+    cache = ProgramCache(tmp_path / "programs")
+    run = cache.get_interpreter("=A1 * 2")
+    assert run({"A1": TokenNumber(4)}) == 8
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    # A new cache on the same directory (e.g. after a restart) never tokenizes or parses
+    import mvin.program
+
+    def fail(*args, **kwargs):
+        raise AssertionError("parsed again")
+
+    monkeypatch.setattr(mvin.program, "tokenize", fail)
+    monkeypatch.setattr(mvin.program, "_infix_to_rpn", fail)
+    restarted = ProgramCache(cache.directory)
+    assert restarted.get_interpreter("=A1 * 2")({"A1": TokenNumber(5)}) == 10
+    assert (restarted.hits, restarted.misses) == (1, 0)
+
+
+def test_program_cache_keys(tmp_path):
+    cache = ProgramCache(tmp_path)
+    tokens = tokenize("=A1 + 1")
+    assert cache.path(tokens) == cache.path(tokenize("=A1 + 1"))
+    assert cache.path(tokens) != cache.path("=A1 + 1")
+    assert cache.path(tokens) != cache.path(tokenize("=A1 + 1.0"))
+
+    functions = FunctionRegistry.of(DEFAULT_FUNCTIONS).register("IF(", [None, None, None], None)
+    assert cache.path(tokens, functions) != cache.path(tokens)
+
+    cache.get_interpreter(tokens)
+    assert cache.get_interpreter(tokens)({"A1": TokenNumber(1)}) == 2
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_program_cache_rewrites_invalid_files(tmp_path):
+    cache = ProgramCache(tmp_path)
+    with open(cache.path("=1 + 1"), "wb") as file:
+        file.write(b"truncated")
+    assert cache.get_interpreter("=1 + 1")({}) == 2
+    assert cache.misses == 1
+    assert cache.get_interpreter("=1 + 1")({}) == 2
+    assert cache.hits == 1
+
+    with pytest.raises(SyntaxError):
+        cache.get_interpreter("=(1")
+    assert [path.suffix for path in tmp_path.iterdir()] == [".mvin"]
+
+    cache.clear()
+    assert list(tmp_path.iterdir()) == []
+    assert (cache.hits, cache.misses) == (0, 0)
@@ -0,0 +1,95 @@
+import pytest
+
+from mvin import TokenNumber, TokenString
+from mvin.providers import InputProvider, LazyInputs, MappingProvider, prefetch
+from mvin.tokenizer import get_interpreter_from_string
+
+
+class CountingProvider(InputProvider):
+    """Provider over a dict that records every get/get_many call."""
+
+    def __init__(self, values):
+        self.values = values
+        self.gets = []
+        self.bulk = []
+
+    def get(self, ref):
+        self.gets.append(ref)
+        return self.values[ref]
+
+
+class BulkProvider(CountingProvider):
+    def get_many(self, refs):
+        self.bulk.append(list(refs))
+        return {ref: self.values[ref] for ref in self.bulk[-1] if ref in self.values}
+
+
+VALUES = {
+    "A1": TokenNumber(5),
+    "B1": TokenString("big"),
+    "C1": TokenString("small"),
+    "D1": TokenNumber(2),
+}
+
+
+def test_lazy_inputs_fetch_only_reached_references():
+    provider = CountingProvider(VALUES)
+    run = get_interpreter_from_string("=IF(A1 > 3, B1, C1) & A1 * D1")
+    assert run(LazyInputs(provider)) == "big10"
+    assert sorted(provider.gets) == ["A1", "B1", "D1"]  # C1 is in the untaken branch
+
+    provider.gets.clear()
+    run_or = get_interpreter_from_string("=OR(A1 > 3, D1 > 3)")
+    assert run_or(LazyInputs(provider)) is True
+    assert provider.gets == ["A1"]
+
+
+@pytest.mark.parametrize("backend", ["compiled", "stack"])
+def test_lazy_inputs_memoize_within_an_evaluation(backend):
+    provider = CountingProvider(VALUES)
+    run = get_interpreter_from_string("=A1 + A1 * A1 + D1", backend=backend)
+    inputs = LazyInputs(provider)
+    assert run(inputs) == 32
+    assert sorted(provider.gets) == ["A1", "D1"]
+    assert sorted(inputs) == ["A1", "D1"] and len(inputs) == 2
+    assert "fetched=['A1', 'D1']" in repr(inputs)
+
+
+@pytest.mark.parametrize("backend", ["compiled", "stack"])
+def test_lazy_inputs_report_missing_references(backend):
+    run = get_interpreter_from_string("=A1 + Z9", backend=backend)
+    with pytest.raises(KeyError, match="Z9"):
+        run(LazyInputs(MappingProvider(VALUES)))
+    assert run.evaluate_batch({"A1": [TokenNumber(1)]})[0].value == "#REF!"
+
+
+def test_prefetch_issues_one_get_many_for_a_batch():
+    provider = BulkProvider(VALUES)
+    runs = [
+        get_interpreter_from_string("=A1 * D1"),
+        get_interpreter_from_string("=B1 & C1"),
+        get_interpreter_from_string("=A1 + 1"),
+    ]
+    inputs = prefetch(runs, provider)
+    assert provider.bulk == [["A1", "B1", "C1", "D1"]]
+    assert provider.gets == []
+    assert [run(inputs) for run in runs] == [10, "bigsmall", 6]
+    assert prefetch([get_interpreter_from_string("=1")], provider) == {}
+    assert len(provider.bulk) == 1
+
+
+def test_default_get_many_uses_get_and_skips_missing():
+    provider = CountingProvider(VALUES)
+    assert provider.get_many(["A1", "Z9"]) == {"A1": VALUES["A1"]}
+    assert MappingProvider(VALUES).get_many(["D1", "Z9"]) == {"D1": VALUES["D1"]}
+
+
+def test_providers_without_get_cannot_be_instantiated():
+    class Incomplete(InputProvider):
+        def get_many(self, refs):
+            return {}
+
+    with pytest.raises(TypeError):
+        InputProvider()
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,111 @@
+from mvin import (
+    REGISTERED_OPS,
+    BaseToken,
+    FunctionRegistry,
+    OperatorRegistry,
+    RegistryDict,
+    TokenNumber,
+    TokenOperator,
+    register_op,
+)
+from mvin.functions.excel_lib import DEFAULT_FUNCTIONS
+from mvin.interpreter import InterpreterCache, get_interpreter
+
+
+class ManualToken(BaseToken):
+    def __init__(self, value, token_type, subtype) -> None:
+        super().__init__()
+        self._value = value
+        self._type = token_type
+        self._subtype = subtype
+
+
+def inc(value):
+    return TokenNumber(value.value + 1)
+
+
+INC_TOKENS = [
+    ManualToken("INC(", "FUNC", "OPEN"),
+    TokenNumber(1),
+    ManualToken(")", "FUNC", "CLOSE"),
+]
+
+
+def test_registry_snapshots_are_immutable_and_versioned():
+    base = FunctionRegistry(DEFAULT_FUNCTIONS)
+    extended = base.register("INC(", [None], inc)
+    assert "INC(" not in base
+    assert "INC(" in extended
+    assert extended.version > base.version
+    assert extended["INC("] == ((None,), inc)
+    assert len(extended.without("INC(")) == len(base)
+    assert list(base) == list(DEFAULT_FUNCTIONS)
+    assert repr(base).startswith("FunctionRegistry<v:")
+
+
+def test_registry_of_shares_snapshots_by_reference():
+    registry = OperatorRegistry(REGISTERED_OPS)
+    assert OperatorRegistry.of(registry) is registry
+    assert OperatorRegistry.of(REGISTERED_OPS) is OperatorRegistry.of(REGISTERED_OPS)
+    assert FunctionRegistry.of(DEFAULT_FUNCTIONS) is FunctionRegistry.of(DEFAULT_FUNCTIONS)
+    plain = dict(REGISTERED_OPS)
+    assert OperatorRegistry.of(plain) is not OperatorRegistry.of(plain)
+
+
+def test_registry_dict_mutations_produce_new_snapshots():
+    functions = RegistryDict(DEFAULT_FUNCTIONS)
+    mutations = [
+        lambda d: d.__setitem__("INC(", ([None], inc)),
+        lambda d: d.__delitem__("INC("),
+        lambda d: d.update({"INC(": ([None], inc)}),
+        lambda d: d.pop("INC("),
+        lambda d: d.setdefault("INC(", ([None], inc)),
+        lambda d: d.__ior__({"DEC(": ([None], inc)}),
+        lambda d: d.popitem(),
+        lambda d: d.clear(),
+    ]
+    for mutate in mutations:
+        before = FunctionRegistry.of(functions)
+        mutate(functions)
+        after = FunctionRegistry.of(functions)
+        assert after is not before
+        assert after.version > before.version
+        assert dict(after) == {k: (v[0] and tuple(v[0]), v[1]) for k, v in functions.items()}
+
+
+def test_interpreter_accepts_function_registry():
+    registry = FunctionRegistry(DEFAULT_FUNCTIONS).register("INC(", [None], inc)
+    run = get_interpreter(INC_TOKENS, proposed_functions=registry)
+    assert run is not None
+    assert run({}) == 2
+
+
+def test_register_op_produces_new_operator_snapshot():
+    before = OperatorRegistry.of(REGISTERED_OPS)
+    try:
+
+        @register_op("%%")
+        def excel_op_mod(a, b):
+            return TokenNumber(a.value % b.value)
+
+        after = OperatorRegistry.of(REGISTERED_OPS)
+        assert after is not before
+        assert after["%%"] is excel_op_mod
+    finally:
+        del REGISTERED_OPS["%%"]
+    assert "%%" not in OperatorRegistry.of(REGISTERED_OPS)
+
+
+def test_cache_sees_registry_dict_changes():
+    cache = InterpreterCache()
+    functions = RegistryDict({"INC(": ([None], inc)})
+    first = cache.get_interpreter(INC_TOKENS, proposed_functions=functions)
+    assert cache.get_interpreter(INC_TOKENS, proposed_functions=functions) is first
+
+    functions["INC("] = ([None], lambda value: TokenNumber(value.value + 100))
+    second = cache.get_interpreter(INC_TOKENS, proposed_functions=functions)
+    assert second is not first
+    assert second is not None and second({}) == 101
+
+    tokens = [TokenNumber(1), TokenOperator("+"), TokenNumber(2)]
+    assert cache.get_interpreter(tokens) is cache.get_interpreter(tokens)
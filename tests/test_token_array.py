@@ -0,0 +1,103 @@
+import pickle
+from array import array
+
+import pytest
+
+from mvin import (
+    TOKEN_EMPTY,
+    BaseToken,
+    TokenArray,
+    TokenBool,
+    TokenError,
+    TokenErrorTypes,
+    TokenNumber,
+    TokenString,
+)
+from mvin.interpreter import get_interpreter
+
+
+class ManualToken(BaseToken):
+    def __init__(self, value, token_type, subtype) -> None:
+        super().__init__()
+        self._value = value
+        self._type = token_type
+        self._subtype = subtype
+
+
+def test_array_storage_is_compact():
+    error = TokenError(TokenErrorTypes.NA, "missing")
+    values = TokenArray.from_values([[1, "a", True], [None, error, 2.5]])
+    assert values.type == "OPERAND" and values.subtype == "ARRAY"
+    assert values.shape == (2, 3) and len(values) == 6
+    assert values.numbers.tolist() == [1.0, 0.0, 0.0, 0.0, 0.0, 2.5]
+    assert values.kinds == bytes(
+        [TokenArray.NUMBER, TokenArray.TEXT, TokenArray.LOGICAL, TokenArray.EMPTY]
+        + [TokenArray.ERROR, TokenArray.NUMBER]
+    )
+    assert values.count(TokenArray.NUMBER) == 2
+    assert values.value == [[1.0, "a", True], [None, "#N/A", 2.5]]
+    assert values.token(1, 1) is error
+    assert values.token(0, 2) is TokenBool.of(True)
+    assert values.token(1, 0) is TOKEN_EMPTY
+    assert [token.value for token in values.tokens()][:2] == [1.0, "a"]
+    with pytest.raises(TypeError):
+        values.numbers[0] = 5.0  # the numeric view is read-only
+    assert repr(values) == "Token<v:2x3 t:OPERAND s:ARRAY >"
+
+
+def test_array_constructors():
+    column = TokenArray.column([TokenNumber(1), TokenString("x"), TOKEN_EMPTY])
+    assert column.shape == (3, 1)
+    assert column.value == [[1.0], ["x"], [None]]
+
+    numbers = TokenArray.from_numbers(range(6), cols=2)
+    assert numbers.shape == (3, 2)
+    assert numbers.count(TokenArray.NUMBER) == 6
+    assert TokenArray(0, 0).value == [] and TokenArray(2, 0).value == [[], []]
+
+    with pytest.raises(ValueError):
+        TokenArray.from_numbers([1, 2, 3], cols=2)
+    with pytest.raises(ValueError):
+        TokenArray.from_values([[1, 2], [3]])
+    with pytest.raises(ValueError):
+        TokenArray.from_values([[object()]])
+    with pytest.raises(ValueError):
+        TokenArray.from_values([[column]])
+    with pytest.raises(ValueError):
+        TokenArray(2, 2, array("d", [1.0]))
+    with pytest.raises(ValueError):
+        TokenArray(-1, 2)
+
+
+def test_set_bumps_version_and_clears_index_cache():
+    values = TokenArray.from_numbers([1, 2, 3])
+    values.index_cache["sorted"] = [1, 2, 3]
+    values.set(1, 0, "two")
+    assert values.version == 1
+    assert values.index_cache == {}
+    assert values.value == [[1.0], ["two"], [3.0]]
+    values.set(1, 0, 2)
+    assert values.token(1).value == 2.0 and values.count(TokenArray.TEXT) == 0
+    with pytest.raises(IndexError):
+        values.set(3, 0, 1)
+
+
+def test_arrays_flow_through_the_interpreter_and_pickle():
+    values = TokenArray.column([1, "a"])
+    tokens = [ManualToken("A1:A2", "OPERAND", "RANGE")]
+    for backend in ("compiled", "stack"):
+        run = get_interpreter(tokens, backend=backend)
+        assert run is not None
+        assert run({"A1:A2": values}) == [[1.0], ["a"]]
+        assert run.evaluate_token({"A1:A2": values}) is values
+
+    len_tokens = [
+        ManualToken("LEN(", "FUNC", "OPEN"),
+        ManualToken("A1:A2", "OPERAND", "RANGE"),
+        ManualToken(")", "FUNC", "CLOSE"),
+    ]
+    run = get_interpreter(len_tokens)
+    assert run is not None and run({"A1:A2": values}) == "#VALUE!"
+
+    copy = pickle.loads(pickle.dumps(values))
+    assert copy.value == values.value and copy.shape == values.shape
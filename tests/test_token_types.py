@@ -1,4 +1,20 @@
-from mvin import TokenEmpty, TokenParen
+import pickle
+
+from mvin import (
+    TOKEN_EMPTY,
+    TOKEN_FALSE,
+    TOKEN_TRUE,
+    BaseToken,
+    TokenBool,
+    TokenEmpty,
+    TokenError,
+    TokenErrorTypes,
+    TokenFunc,
+    TokenNumber,
+    TokenOperator,
+    TokenParen,
+    TokenString,
+)
 
 
 def test_token_paren_and_empty():
@@ -17,3 +33,47 @@ def test_token_paren_and_empty():
     assert empty.value is None
     assert empty.type == "OPERAND"
     assert empty.subtype == "EMPTY"
+
+
+def test_builtin_tokens_are_slotted():
+    for token in (
+        TokenBool(True),
+        TokenString("x"),
+        TokenNumber(1),
+        TokenFunc("LEN("),
+        TokenOperator("+"),
+        TokenParen("OPEN"),
+        TokenEmpty(),
+        TokenError(TokenErrorTypes.NA, "missing"),
+    ):
+        assert not hasattr(token, "__dict__")
+
+
+def test_shared_singletons():
+    assert TokenBool.of(True) is TOKEN_TRUE
+    assert TokenBool.of(0) is TOKEN_FALSE
+    assert TOKEN_TRUE.value is True and TOKEN_TRUE.subtype == "LOGICAL"
+    assert TOKEN_EMPTY.subtype == "EMPTY" and TOKEN_EMPTY.value is None
+    na = TokenError.of(TokenErrorTypes.NA)
+    assert na is TokenError.of(TokenErrorTypes.NA)
+    assert na.value == "#N/A" and na.message == ""
+
+
+def test_custom_subclass_keeps_instance_dict():
+    class ManualToken(BaseToken):
+        def __init__(self, value) -> None:
+            super().__init__()
+            self._value = value
+            self._type = "OPERAND"
+            self._subtype = "RANGE"
+            self.extra = "allowed"
+
+    token = ManualToken("A1")
+    assert (token.value, token.type, token.subtype, token.extra) == ("A1", "OPERAND", "RANGE", "allowed")
+
+
+def test_tokens_pickle_roundtrip():
+    for token in (TokenNumber(3), TokenError(TokenErrorTypes.REF, "ref"), TokenParen("CLOSE")):
+        copy = pickle.loads(pickle.dumps(token))
+        assert (copy.type, copy.subtype, copy.value) == (token.type, token.subtype, token.value)
+    assert pickle.loads(pickle.dumps(TokenError(TokenErrorTypes.REF, "ref"))).message == "ref"
@@ -0,0 +1,177 @@
+import pytest
+
+from mvin import (
+    TOKEN_FALSE,
+    TOKEN_TRUE,
+    TokenError,
+    TokenErrorTypes,
+    TokenFunc,
+    TokenFuncClose,
+    TokenNumber,
+    TokenOperator,
+    TokenParen,
+    TokenReference,
+    TokenSeparator,
+    TokenString,
+)
+from mvin.interpreter import InterpreterCache, get_interpreter
+from mvin.tokenizer import get_interpreter_from_string, tokenize
+
+
+def shapes(formula):
+    return [(token.type, token.subtype, token.value) for token in tokenize(formula)]
+
+
+def test_tokenize_function_call_shapes():
+    assert shapes("=SUM(A1:B2, -C1) * 2") == [
+        ("FUNC", "OPEN", "SUM("),
+        ("OPERAND", "RANGE", "A1:B2"),
+        ("SEP", "ARG", ","),
+        ("OPERATOR-PREFIX", "", "-"),
+        ("OPERAND", "RANGE", "C1"),
+        ("FUNC", "CLOSE", ")"),
+        ("OPERATOR-INFIX", "", "*"),
+        ("OPERAND", "NUMBER", 2),
+    ]
+
+
+def test_tokenize_literals():
+    assert shapes('=IF(a1>=$B$2,"say ""hi""",false)') == [
+        ("FUNC", "OPEN", "IF("),
+        ("OPERAND", "RANGE", "a1"),
+        ("OPERATOR-INFIX", "", ">="),
+        ("OPERAND", "RANGE", "$B$2"),
+        ("SEP", "ARG", ","),
+        ("OPERAND", "TEXT", 'say "hi"'),
+        ("SEP", "ARG", ","),
+        ("OPERAND", "LOGICAL", False),
+        ("FUNC", "CLOSE", ")"),
+    ]
+    tokens = tokenize("=1.5e3 + .5 + 10 & TRUE & #DIV/0!")
+    assert [token.value for token in tokens[::2]] == [1500.0, 0.5, 10, True, "#DIV/0!"]
+    assert tokens[6] is TOKEN_TRUE
+    assert tokens[8] is TokenError.of(TokenErrorTypes.ZERO_DIV)
+
+
+@pytest.mark.parametrize(
+    "reference",
+    [
+        "A1",
+        "$A$1:$B$10",
+        "Sheet1!A1",
+        "'My ''quoted'' sheet'!A:A",
+        "[1]Sheet1!B2",
+        "1:3",
+        "$C:$D",
+        "Total_Sales",
+        "Table1[[#This Row],[Amount]]",
+    ],
+)
+def test_tokenize_references(reference):
+    assert shapes(f"={reference}+1") == [
+        ("OPERAND", "RANGE", reference),
+        ("OPERATOR-INFIX", "", "+"),
+        ("OPERAND", "NUMBER", 1),
+    ]
+
+
+def test_tokenize_prefix_and_parentheses():
+    assert shapes("-(1+2)^-A1<>+3") == [
+        ("OPERATOR-PREFIX", "", "-"),
+        ("OPERATOR-INFIX", "OPEN", "("),
+        ("OPERAND", "NUMBER", 1),
+        ("OPERATOR-INFIX", "", "+"),
+        ("OPERAND", "NUMBER", 2),
+        ("OPERATOR-INFIX", "CLOSE", ")"),
+        ("OPERATOR-INFIX", "", "^"),
+        ("OPERATOR-PREFIX", "", "-"),
+        ("OPERAND", "RANGE", "A1"),
+        ("OPERATOR-INFIX", "", "<>"),
+        ("OPERATOR-PREFIX", "", "+"),
+        ("OPERAND", "NUMBER", 3),
+    ]
+
+
+def test_tokenize_closes_function_calls_only():
+    assert [token.type for token in tokenize("=ABS((1))+(ABS(2))")] == [
+        "FUNC",
+        "OPERATOR-INFIX",
+        "OPERAND",
+        "OPERATOR-INFIX",
+        "FUNC",
+        "OPERATOR-INFIX",
+        "OPERATOR-INFIX",
+        "FUNC",
+        "OPERAND",
+        "FUNC",
+        "OPERATOR-INFIX",
+    ]
+
+
+def test_tokenize_normalizes_function_names():
+    assert tokenize("=_xlfn.xlookup(1,A:A,B:B)")[0].value == "XLOOKUP("
+    assert tokenize("=sum()")[0].value == "SUM("
+
+
+@pytest.mark.parametrize("formula", ['="open', "={1,2}", "=10%", "=1 ; 2"])
+def test_tokenize_rejects_unsupported_input(formula):
+    with pytest.raises(SyntaxError):
+        tokenize(formula)
+
+
+def test_get_interpreter_from_string():
+    run = get_interpreter_from_string('=IF(A1>2, A1*-2, "small")')
+    assert run.inputs == {"A1"}
+    assert run({"A1": TokenNumber(3)}) == -6
+    assert run({"A1": TokenNumber(1)}) == "small"
+    assert get_interpreter_from_string("SUM(1, 2, 3) / 2")({}) == 3
+
+
+def test_get_interpreter_from_string_matches_hand_built_tokens():
+    formula = '=LEFT("n=" & A1 / 4, 4) & " " & (B1 = "x")'
+    hand_built = [
+        TokenFunc("LEFT("),
+        TokenString("n="),
+        TokenOperator("&"),
+        TokenReference("A1"),
+        TokenOperator("/"),
+        TokenNumber(4),
+        TokenSeparator(),
+        TokenNumber(4),
+        TokenFuncClose(),
+        TokenOperator("&"),
+        TokenString(" "),
+        TokenOperator("&"),
+        TokenParen("OPEN"),
+        TokenReference("B1"),
+        TokenOperator("="),
+        TokenString("x"),
+        TokenParen("CLOSE"),
+    ]
+    inputs = {"A1": TokenNumber(10), "B1": TokenString("x")}
+    expected = get_interpreter(hand_built, backend="stack")(inputs)
+    assert expected == "n=2. True"
+    assert get_interpreter_from_string(formula)(inputs) == expected
+    assert get_interpreter(tokenize(formula), backend="stack")(inputs) == expected
+
+
+def test_get_interpreter_from_string_uses_cache():
+    cache = InterpreterCache()
+    first = get_interpreter_from_string("=A1+1", cache=cache)
+    assert get_interpreter_from_string("A1 + 1", cache=cache) is first
+    assert cache.info().hits == 1
+
+
+def test_get_interpreter_from_string_reports_parse_errors():
+    with pytest.raises(SyntaxError):
+        get_interpreter_from_string("=(1+2")
+    with pytest.raises(SyntaxError):
+        get_interpreter_from_string("=NOPE(1)")
+    assert get_interpreter_from_string("=FALSE")({}) is TOKEN_FALSE.value
+
+
+@pytest.mark.parametrize("backend", ["compiled", "stack"])
+def test_parenthesized_function_arguments(backend):
+    run = get_interpreter_from_string("=MAX(0, MIN(100, (A1 - B1) / B1 * 100))", backend=backend)
+    assert run({"A1": TokenNumber(3), "B1": TokenNumber(2)}) == 50
+    assert get_interpreter_from_string("=SUM((1), (2 + 3))", backend=backend)({}) == 6
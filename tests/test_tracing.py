@@ -0,0 +1,77 @@
+import logging
+
+import pytest
+
+from mvin import BaseToken, TokenNumber, TokenString
+from mvin.interpreter import InterpreterCache, get_interpreter
+from mvin.tracing import LoggingObserver, RecordingObserver, TraceObserver
+
+
+class ManualToken(BaseToken):
+    def __init__(self, value, token_type, subtype) -> None:
+        super().__init__()
+        self._value = value
+        self._type = token_type
+        self._subtype = subtype
+
+
+TOKENS = [
+    ManualToken("-", "OPERATOR-PREFIX", ""),
+    ManualToken("LEN(", "FUNC", "OPEN"),
+    ManualToken("A1", "OPERAND", "RANGE"),
+    ManualToken(")", "FUNC", "CLOSE"),
+    ManualToken("/", "OPERATOR-INFIX", ""),
+    TokenNumber(0),
+]
+
+
+@pytest.mark.parametrize("backend", ["compiled", "stack"])
+def test_recording_observer_receives_structured_events(backend):
+    observer = RecordingObserver()
+    run = get_interpreter(TOKENS, backend=backend, observer=observer)
+    assert run is not None
+    assert run.backend == backend
+
+    token_events = [event for event in observer.events if event.kind == "token"]
+    assert [event.args[0] for event in token_events] == TOKENS
+    assert [event.name for event in token_events] == [str(i) for i in range(len(TOKENS))]
+
+    observer.events.clear()
+    assert run({"A1": TokenString("abc")}) == "#DIV/0!"
+    kinds = [(event.kind, event.name) for event in observer.events]
+    assert kinds == [("function", "LEN("), ("op", "u-"), ("op", "/"), ("result", "")]
+    assert observer.events[0].result.value == 3
+    assert observer.events[1].result.value == -3
+    assert observer.events[-1].result.value == "#DIV/0!"
+
+
+def test_compiled_and_stack_traces_match():
+    tokens = [TokenNumber(1), ManualToken("+", "OPERATOR-INFIX", ""), TokenNumber(2)]
+    traces = []
+    for backend in ("compiled", "stack"):
+        observer = RecordingObserver()
+        run = get_interpreter(tokens, backend=backend, observer=observer)
+        assert run is not None and run({}) == 3
+        traces.append([(e.kind, e.name, [a.value for a in e.args]) for e in observer.events])
+    assert traces[0] == traces[1]
+
+
+def test_logging_observer_writes_debug_records(caplog):
+    logger = logging.getLogger("mvin.test")
+    run = get_interpreter(TOKENS, observer=LoggingObserver(logger))
+    assert run is not None
+    with caplog.at_level(logging.DEBUG, logger="mvin.test"):
+        run({"A1": TokenString("abc")})
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("called LEN(" in message for message in messages)
+    assert any("applied op /" in message for message in messages)
+    assert any("result" in message for message in messages)
+    assert LoggingObserver().logger.name == "mvin"
+
+
+def test_base_observer_is_a_no_op_and_cache_keeps_observers_apart():
+    cache = InterpreterCache()
+    untraced = get_interpreter(TOKENS, cache=cache)
+    traced = get_interpreter(TOKENS, cache=cache, observer=TraceObserver())
+    assert untraced is not traced
+    assert traced is not None and traced({"A1": TokenString("")}) == "#DIV/0!"